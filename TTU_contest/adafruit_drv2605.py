@@ -2,6 +2,11 @@ from micropython import const
 
 from machine import I2C
 
+try:
+    from typing import Union
+except ImportError:
+    pass
+
 _DRV2605_ADDR = const(0x5A)
 _DRV2605_REG_STATUS = const(0x00)
 _DRV2605_REG_MODE = const(0x01)
@@ -34,6 +39,7 @@ _DRV2605_REG_CONTROL3 = const(0x1D)
 _DRV2605_REG_CONTROL4 = const(0x1E)
 _DRV2605_REG_VBAT = const(0x21)
 _DRV2605_REG_LRARESON = const(0x22)
+_DRV2605_REG_COUNT = const(0x23)
 
 # User-facing mode value constants:
 MODE_INTTRIG = 0x00
@@ -68,44 +74,134 @@ class DRV2605:
     def __init__(self, i2c: I2C, address: int = _DRV2605_ADDR) -> None:
         self._device = i2c
         self._address = address
+        # Shadow of the whole register file (0x00-0x22), filled with a single
+        # burst read. Reads of registers the chip never changes on its own are
+        # served from RAM; every write goes through the shadow.
+        self._regs = bytearray(_DRV2605_REG_COUNT)
+        self._stale = False
+        # Waveform slots 1-8 followed by GO, written as one auto-increment block.
+        self._seq = bytearray(9)
+        self._seq_views = [memoryview(self._seq)[lo:] for lo in range(9)]
+        self._seq_known = False
+        self.refresh()
         # Check chip ID is 3 or 7 (DRV2605 or DRV2605L).
-        status = self._read_u8(_DRV2605_REG_STATUS)
-        device_id = (status >> 5) & 0x07
+        device_id = (self._regs[_DRV2605_REG_STATUS] >> 5) & 0x07
         if device_id not in (3, 7):
             raise RuntimeError("Failed to find DRV2605, check wiring!")
-        # Configure registers to initialize chip.
-        self._write_u8(_DRV2605_REG_MODE, 0x00)  # out of standby
-        self._write_u8(_DRV2605_REG_RTPIN, 0x00)  # no real-time-playback
-        self._write_u8(_DRV2605_REG_WAVESEQ1, 1)  # strong click
-        self._write_u8(_DRV2605_REG_WAVESEQ2, 0)
-        self._write_u8(_DRV2605_REG_OVERDRIVE, 0)  # no overdrive
-        self._write_u8(_DRV2605_REG_SUSTAINPOS, 0)
-        self._write_u8(_DRV2605_REG_SUSTAINNEG, 0)
-        self._write_u8(_DRV2605_REG_BREAK, 0)
-        self._write_u8(_DRV2605_REG_AUDIOMAX, 0x64)
-        # Set ERM open-loop mode.
-        self.use_ERM()
-        # turn on ERM_OPEN_LOOP
-        control3 = self._read_u8(_DRV2605_REG_CONTROL3)
-        self._write_u8(_DRV2605_REG_CONTROL3, control3 | 0x20)
-        # Default to internal trigger mode and TS2200 A library.
-        self.mode = MODE_INTTRIG
-        self.library = LIBRARY_TS2200A
+        # Configure registers to initialize chip, batching contiguous ranges:
+        # out of standby in internal trigger mode, no real-time-playback,
+        # TS2200 A library and a single strong click in the sequence.
+        self._write_block(
+            _DRV2605_REG_MODE, (MODE_INTTRIG, 0x00, LIBRARY_TS2200A, 1, 0)
+        )
+        # No overdrive, sustain or break time; audio max level 0x64.
+        regs = self._regs
+        self._write_block(
+            _DRV2605_REG_OVERDRIVE,
+            (
+                0,
+                0,
+                0,
+                0,
+                regs[_DRV2605_REG_AUDIOCTRL],
+                regs[_DRV2605_REG_AUDIOLVL],
+                0x64,
+            ),
+        )
+        # Set ERM (FEEDBACK bit 7 clear) and turn on ERM_OPEN_LOOP (CONTROL3).
+        self._write_block(
+            _DRV2605_REG_FEEDBACK,
+            (
+                regs[_DRV2605_REG_FEEDBACK] & 0x7F,
+                regs[_DRV2605_REG_CONTROL1],
+                regs[_DRV2605_REG_CONTROL2],
+                regs[_DRV2605_REG_CONTROL3] | 0x20,
+            ),
+        )
         self._sequence = _DRV2605_Sequence(self)
 
+    def refresh(self) -> None:
+        """Re-read the whole register file into the shadow cache in one
+        transaction. Called automatically after auto-calibration or
+        diagnostics, which update registers on the chip."""
+        self._device.readfrom_mem_into(self._address, 0x00, self._regs)
+        self._stale = False
+        self._seq_known = False
+
     def _read_u8(self, address: int) -> int:
         # Read an 8-bit unsigned value from the specified 8-bit address.
-        self._device.readfrom_mem_into(self._address, address, self._BUFFER)
-        return self._BUFFER[0]
+        # STATUS, GO, VBAT and LRARESON change on the chip, so always hit the bus.
+        if (
+            address == _DRV2605_REG_STATUS
+            or address == _DRV2605_REG_GO
+            or address >= _DRV2605_REG_VBAT
+        ):
+            self._device.readfrom_mem_into(self._address, address, self._BUFFER)
+            return self._BUFFER[0]
+        if self._stale:
+            self.refresh()
+        return self._regs[address]
 
     def _write_u8(self, address: int, val: int) -> None:
         # Write an 8-bit unsigned value to the specified 8-bit address.
         self._BUFFER[0] = val & 0xFF
         self._device.writeto_mem(self._address, address, self._BUFFER)
+        self._regs[address] = self._BUFFER[0]
+        if _DRV2605_REG_WAVESEQ1 <= address <= _DRV2605_REG_WAVESEQ8:
+            self._seq[address - _DRV2605_REG_WAVESEQ1] = self._BUFFER[0]
+
+    def _write_block(self, address: int, values) -> None:
+        # Write consecutive registers starting at address in one transaction.
+        buf = bytes(values)
+        self._device.writeto_mem(self._address, address, buf)
+        self._regs[address : address + len(buf)] = buf
+        self._seq_known = False
+
+    def play_sequence(self, effects) -> None:
+        """Load a whole waveform sequence and start playback in a single I2C
+        transaction. Only the slots from the first one that differs from the
+        last sequence written through here are sent, followed by GO; an
+        unchanged sequence costs a GO write alone.
+
+        :param effects: Up to 8 slots, each an effect ID (0-123), a raw pause
+            byte (bit 7 set), an :class:`~Effect` or a :class:`~Pause`. Missing
+            slots are filled with 0, which ends the sequence.
+        """
+        n = len(effects)
+        if n > 8:
+            raise ValueError("Sequence must have at most 8 slots!")
+        seq = self._seq
+        regs = self._regs
+        lo = 8
+        for i in range(8):
+            v = effects[i] if i < n else 0
+            if not isinstance(v, int):
+                v = v.raw_value
+            elif not 0 <= v <= 0xFF or v & 0x80 == 0 and v > 123:
+                raise ValueError("Effect ID must be a value within 0-123!")
+            if seq[i] != v or not self._seq_known:
+                seq[i] = v
+                regs[_DRV2605_REG_WAVESEQ1 + i] = v
+                if i < lo:
+                    lo = i
+        seq[8] = 1
+        try:
+            self._device.writeto_mem(
+                self._address, _DRV2605_REG_WAVESEQ1 + lo, self._seq_views[lo]
+            )
+        except OSError:
+            # The chip may hold anything now; re-read before trusting the shadow.
+            self._stale = True
+            self._seq_known = False
+            raise
+        self._seq_known = True
 
     def play(self) -> None:
         """Play back the select effect(s) on the motor."""
         self._write_u8(_DRV2605_REG_GO, 1)
+        # Auto-calibration and diagnostics write their results back to the chip.
+        if self._regs[_DRV2605_REG_MODE] & 0x07 >= MODE_DIAGNOS:
+            self._stale = True
 
     def stop(self) -> None:
         """Stop vibrating the motor."""
@@ -0,0 +1,74 @@
+import math
+
+# Mahony 四元數姿態濾波：陀螺儀積分 + 加速度計 PI 回授修正
+# 沒有磁力計，所以 yaw 只靠 (已扣偏差的) 陀螺儀積分
+# 軸向沿用 mpu6050.py 的習慣：pitch 是繞 X 軸、roll 是繞 Y 軸
+class Mahony:
+    def __init__(self, kp=1.0, ki=0.02):
+        self.kp, self.ki = kp, ki
+        self.q0, self.q1, self.q2, self.q3 = 1.0, 0.0, 0.0, 0.0
+        self._ix = self._iy = self._iz = 0.0
+
+    def reset(self):
+        self.q0, self.q1, self.q2, self.q3 = 1.0, 0.0, 0.0, 0.0
+        self._ix = self._iy = self._iz = 0.0
+
+    def update(self, gx, gy, gz, ax, ay, az, dt):
+        # g*：rad/s；a*：任意單位 (只用方向)
+        q0, q1, q2, q3 = self.q0, self.q1, self.q2, self.q3
+        n = ax * ax + ay * ay + az * az
+        if n > 0:
+            n = 1.0 / math.sqrt(n)
+            ax *= n
+            ay *= n
+            az *= n
+            # 目前姿態下預估的重力方向，與量到的方向做外積得到誤差
+            vx = 2 * (q1 * q3 - q0 * q2)
+            vy = 2 * (q0 * q1 + q2 * q3)
+            vz = q0 * q0 - q1 * q1 - q2 * q2 + q3 * q3
+            ex = ay * vz - az * vy
+            ey = az * vx - ax * vz
+            ez = ax * vy - ay * vx
+            if self.ki > 0:
+                k = self.ki * dt
+                self._ix += ex * k
+                self._iy += ey * k
+                self._iz += ez * k
+                gx += self._ix
+                gy += self._iy
+                gz += self._iz
+            gx += self.kp * ex
+            gy += self.kp * ey
+            gz += self.kp * ez
+        h = 0.5 * dt
+        gx *= h
+        gy *= h
+        gz *= h
+        self.q0 = q0 - q1 * gx - q2 * gy - q3 * gz
+        self.q1 = q1 + q0 * gx + q2 * gz - q3 * gy
+        self.q2 = q2 + q0 * gy - q1 * gz + q3 * gx
+        self.q3 = q3 + q0 * gz + q1 * gy - q2 * gx
+        n = 1.0 / math.sqrt(self.q0 * self.q0 + self.q1 * self.q1 + self.q2 * self.q2 + self.q3 * self.q3)
+        self.q0 *= n
+        self.q1 *= n
+        self.q2 *= n
+        self.q3 *= n
+
+    @property
+    def pitch(self):
+        # 繞 X 軸
+        q0, q1, q2, q3 = self.q0, self.q1, self.q2, self.q3
+        return math.atan2(2 * (q0 * q1 + q2 * q3), 1 - 2 * (q1 * q1 + q2 * q2))
+
+    @property
+    def roll(self):
+        # 繞 Y 軸
+        s = 2 * (self.q0 * self.q2 - self.q3 * self.q1)
+        if s > 1: s = 1
+        elif s < -1: s = -1
+        return math.asin(s)
+
+    @property
+    def yaw(self):
+        q0, q1, q2, q3 = self.q0, self.q1, self.q2, self.q3
+        return math.atan2(2 * (q0 * q3 + q1 * q2), 1 - 2 * (q2 * q2 + q3 * q3))
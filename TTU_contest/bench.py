@@ -0,0 +1,1429 @@
+# 主機端基準測試：python bench.py [名稱 ...]
+# 在 CPython 上以 host_fakes 取代硬體 (rp2 / machine / I2C 裝置與時鐘)
+import sys
+import time
+import math
+import struct
+import gc
+
+import host_fakes
+host_fakes.install()
+from host_fakes import make_frame
+
+def _alloc_probe():
+    # MicroPython: gc.mem_alloc() 的差值；CPython: tracemalloc 的峰值
+    if hasattr(gc, 'mem_alloc'):
+        gc.collect()
+        gc.disable()
+        start = gc.mem_alloc()
+        def done():
+            used = gc.mem_alloc() - start
+            gc.enable()
+            return used
+        return done
+    import tracemalloc
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    def done():
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+        return peak
+    return done
+
+def _retained(fn, n, files, churn=True):
+    # 穩定狀態下呼叫 fn() n 次之後多留下來的記憶體 (bytes)，應該是 0
+    # MicroPython: 關掉 GC 的 mem_alloc 差值 (任何配置都算)；CPython: files 裡的程式碼留下的 tracemalloc 配置
+    # (CPython 的整數本來就會暫時配置，只看留下來的；假硬體的 feed 等不在 files 裡的不算)
+    # churn=False：MicroPython 上也只看 gc.collect() 之後留下來的 (用於本來就會產生浮點物件的路徑)
+    if hasattr(gc, 'mem_alloc'):
+        if not churn:
+            for _ in range(10): fn()
+            gc.collect()
+            start = gc.mem_alloc()
+            for _ in range(n): fn()
+            gc.collect()
+            return gc.mem_alloc() - start
+        done = _alloc_probe()
+        for _ in range(n): fn()
+        return done()
+    import tracemalloc
+    flt = [tracemalloc.Filter(True, '*' + f) for f in files]
+    tracemalloc.start()
+    # 先跑幾次：計數器等屬性換成追蹤中配置的整數，之後同樣數量的物件只是互相取代
+    for _ in range(10): fn()
+    s0 = tracemalloc.take_snapshot().filter_traces(flt)
+    for _ in range(n): fn()
+    s1 = tracemalloc.take_snapshot().filter_traces(flt)
+    tracemalloc.stop()
+    return sum(st.size_diff for st in s1.compare_to(s0, 'filename'))
+
+# CPython 的整數與 tracemalloc 本身都會配置記憶體，只有 mem_alloc 的數字能代表板子上的情況
+_ALLOC_KIND = 'mem_alloc' if hasattr(gc, 'mem_alloc') else 'tracemalloc peak'
+
+def _report(name, frames, us, alloc):
+    print("%-24s %8.1f us/frame  %6.1f B/frame (%s)" % (name, us / frames, alloc / frames, _ALLOC_KIND))
+
+def bench_parser(frames=2000):
+    from ld2450 import LD2450_PIO
+    radar = LD2450_PIO(sm_id=0, pin_rx=1)
+    frame = make_frame([(-1200, 2500, -35, 360), (300, 900, 12, 320), (0, 0)])
+    # 暖機：讓環形緩衝區與傾斜補償快取進入穩定狀態
+    for _ in range(10):
+        radar.sm.feed(frame)
+        radar.parse()
+    us = alloc = 0
+    for _ in range(frames):
+        radar.sm.feed(frame)
+        done = _alloc_probe()
+        t0 = time.ticks_us()
+        n = radar.parse()
+        us += time.ticks_diff(time.ticks_us(), t0)
+        alloc += done()
+        assert n is None or n == 2
+    # 30 bytes 的封包跨越 32-bit 字組邊界，所以少數呼叫只拿到半個封包
+    t = radar.targets
+    assert len(t) == 2 and (t.x(0), t.y(0), t.speed(0), t.resolution(0)) == (-1200, 2500, -35, 360)
+    assert (t.x(1), t.y(1), t.speed(1), t.resolution(1)) == (300, 900, 12, 320)
+    _report("ld2450 parse", frames, us, alloc)
+    # 零配置：穩定狀態下 parse() 不留下任何物件 (板子上以 mem_alloc 量，必須剛好是 0)
+    def step():
+        radar.sm.feed(frame)
+        radar.parse()
+    kept = _retained(step, 1024, ('ld2450.py', 'geometry.py'))     # 環形緩衝區的位置每 512 個封包回到原處
+    assert kept == 0, kept
+
+def bench_stream(rounds=200):
+    # 模擬錄下來的位元組流，並在其中插入雜訊、壞結尾與佇列溢位
+    from ld2450 import LD2450_PIO
+    radar = LD2450_PIO(sm_id=1, pin_rx=2)
+    good = [make_frame([(i * 10 - 1000, 500 + i), (0, 0), (0, 0)]) for i in range(6)]
+    bad_tail = good[0][:28] + b'\x00\x00'
+    garbage = b'\x13\xAA\xFF\x00\x55\xCC'
+    frames = us = 0
+    for r in range(rounds):
+        # 每回合 216 bytes (剛好 54 個字組)：3 個好封包、雜訊、1 個壞結尾封包、再 3 個好封包
+        stream = good[0] + good[1] + good[2] + garbage + bad_tail + good[3] + good[4] + good[5]
+        radar.sm.feed(stream)
+        t0 = time.ticks_us()
+        radar.poll()
+        last_t = None
+        while True:
+            n = radar.next_frame()
+            if n is None: break
+            assert n == 1 and radar.targets.y(0) == 500 + frames % 6
+            # 同一次搬移中的封包，抵達時間必須依序遞增
+            if last_t is not None: assert time.ticks_diff(radar.frame_time, last_t) > 0
+            last_t = radar.frame_time
+            frames += 1
+        us += time.ticks_diff(time.ticks_us(), t0)
+    assert radar.decoded == frames == rounds * 6
+    assert radar.tail_err == rounds and radar.resyncs == rounds
+    assert radar.dropped == 0 and radar.overrun == 0
+    # 不取出封包時，佇列滿了要丟最舊的
+    for _ in range(2):
+        radar.sm.feed(good[0] * 6)
+        radar.poll()
+    assert radar.dropped == 12 - 8
+    print("%-24s %8.1f us/frame  decoded=%d tail_err=%d resyncs=%d dropped=%d" % (
+        "ld2450 stream", us / frames, radar.decoded, radar.tail_err, radar.resyncs, radar.dropped))
+
+def _walk_trace(frames, speed=-800):
+    # 合成軌跡：一個以 speed mm/s 正面靠近的行人 + 兩個橫越的目標，每 100 ms 一個封包
+    trace = []
+    for f in range(frames):
+        t = f * 0.1
+        trace.append(make_frame([
+            (0, int(5000 + speed * (t % 5))),
+            (int(-2000 + 600 * (t % 6)), 2500),
+            (int(1800 - 400 * (t % 8)), 1500 + f % 3 * 40),
+        ]))
+    return trace
+
+def bench_tracker(frames=500):
+    from ld2450 import LD2450_PIO
+    from tracker import Tracker
+    radar = LD2450_PIO(sm_id=2, pin_rx=3)
+    trace = _walk_trace(frames)
+    for n_tracks in (3, 6, 12):
+        trk = Tracker(max_tracks=n_tracks)
+        us = 0
+        for f, frame in enumerate(trace):
+            radar.sm.feed(frame + frame[:2])    # 補齊 32 bytes，讓每次都剛好一個封包
+            radar.poll()
+            radar.next_frame()
+            t0 = time.ticks_us()
+            trk.update(radar.targets, f * 100000)
+            trk.sectors()
+            us += time.ticks_diff(time.ticks_us(), t0)
+            if n_tracks == 6 and f % 50 == 30:
+                # 正前方物體以 0.8 m/s 靠近：碰撞時間應接近 距離 / 速度
+                d = 5000 - 800 * ((f * 0.1) % 5)
+                assert abs(trk.ttc[1] - d / 800) < 0.5, (trk.ttc[1], d / 800)
+        print("%-24s %8.1f us/frame  (3 targets x %d tracks)" % ("tracker", us / frames, n_tracks))
+
+def _sector_float(x, y):
+    # 原本 logic_timer_callback 的浮點判斷，作為對照
+    angle1 = 180 - math.degrees(math.atan2(x, y))
+    if 15 < angle1 <= 165: return 0
+    if 195 <= angle1 < 345: return 2
+    return 1
+
+def bench_geometry(points=20000):
+    import random
+    from geometry import sector, bucket, limits_sq, sin_q, cos_q, Q
+    rnd = random.Random(1)
+    pts = [(rnd.randint(-6000, 6000), rnd.randint(-6000, 6000)) for _ in range(points)]
+    lim2 = limits_sq((3000, 6000))
+    # 等價性：方向邊界 ±0.01° 以外必須完全一致，距離等級必須完全一致
+    edge = 0
+    for x, y in pts:
+        a = math.degrees(math.atan2(x, y))
+        if min(abs(abs(a) - 15), abs(abs(a) - 165)) > 0.01:
+            assert sector(x, y) == _sector_float(x, y), (x, y)
+        else: edge += 1
+        d = math.sqrt(x * x + y * y) / 10.0
+        assert bucket(x * x + y * y, lim2) == (0 if d < 300 else 1 if d < 600 else 2)
+    # 查表誤差：0.25° 一格，最差約 0.125° 的角度誤差
+    err = max(abs(sin_q(a) / (1 << Q) - math.sin(a)) + abs(cos_q(a) / (1 << Q) - math.cos(a))
+              for a in (i * 0.001 - 1.5 for i in range(3001)))
+    assert err < 0.005, err
+    # 計時的迴圈把結果累加起來並互相比對，避免只是量到沒用到的運算
+    t0 = time.ticks_us()
+    sum_float = 0
+    for x, y in pts:
+        s = _sector_float(x, y)
+        d = math.sqrt(x * x + y * y) / 10.0
+        sum_float += s * 3 + (0 if d < 300 else 1 if d < 600 else 2)
+    us_float = time.ticks_diff(time.ticks_us(), t0)
+    t0 = time.ticks_us()
+    sum_int = 0
+    for x, y in pts:
+        sum_int += sector(x, y) * 3 + bucket(x * x + y * y, lim2)
+    us_int = time.ticks_diff(time.ticks_us(), t0)
+    # 只有方向邊界 ±0.01° 內的點可能不同 (每點最多差 2 個方向)
+    assert abs(sum_float - sum_int) <= 6 * edge, (sum_float, sum_int, edge)
+    print("%-24s %8.2f us/target float  %6.2f us/target int  (trig LUT err %.4f)" % (
+        "geometry", us_float / points, us_int / points, err))
+
+def _imu_burst(f):
+    # 合成 MPU6050 資料：靜止時加速度約 1 g，加上緩慢的俯仰擺動
+    ay = int(1500 * math.sin(f * 0.05))
+    gx = int(300 * math.cos(f * 0.05))
+    return struct.pack('>hhhhhhh', 0, ay, 16384, 0, gx, 0, 0)
+
+def _record_walk(path, ticks, fifo_rate=0):
+    # 在假硬體上以 _walk_trace 錄一段行走到 path，回傳 Recorder
+    # fifo_rate：與 main.py 一樣用 IMU 的內建 FIFO，每個週期推入 fifo_rate / 10 筆點頭的樣本
+    from capture import Recorder
+    from ld2450 import LD2450_PIO
+    from mpu6050 import MPU6050
+    from navigator import Navigator
+    mpu = host_fakes.FakeMPU6050()
+    host_fakes.I2C.devices[(0, 0x68)] = mpu
+    host_fakes.set_time_us(0)     # 與 replay() 一樣從虛擬時鐘 0 建立，第一筆 IMU 的 dt 才會相同
+    radar, imu = LD2450_PIO(sm_id=0, pin_rx=1), MPU6050(i2c_bus=0, sda=4, scl=5, fifo_rate=fifo_rate)
+    nav = Navigator(radar, imu)
+    rec = Recorder(path, imu=imu)
+    radar.rec = imu.rec = nav.rec = rec
+    trace = _walk_trace(ticks)
+    lsb = 131.0 / 0.01745
+    for f in range(ticks):
+        host_fakes.set_time_us(f * 100000)
+        radar.sm.feed(trace[f])
+        if fifo_rate:
+            for k in range(imu.fifo_rate // 10):
+                t = f * 0.1 + k / imu.fifo_rate
+                ang, w = 0.4 * math.sin(2 * math.pi * t), 0.8 * math.pi * math.cos(2 * math.pi * t)
+                mpu.push_sample(0, int(16384 * math.sin(ang)), int(16384 * math.cos(ang)), int(w * lsb), 0, 0)
+        else: mpu.push(_imu_burst(f))
+        nav.step()
+        rec.flush()
+    rec.flush(force=True)
+    rec.close()
+    host_fakes.set_time_us(None)
+    return rec
+
+def bench_replay(ticks=3000):
+    # 先在假硬體上錄一段 5 分鐘的行走，再用 replay.py 重播並比對觸覺輸出
+    import os
+    import tempfile
+    from capture import read_header
+    from replay import replay
+    path = os.path.join(tempfile.mkdtemp(), 'walk.bin')
+    rec = _record_walk(path, ticks)
+    s = replay(path)
+    assert s['match'] > 0 and s['mismatch'] == s['extra'] == s['missing'] == 0, s
+    assert rec.lost == 0
+    print("%-24s %8.1f s recorded in %.2f s (%.0fx real time), %d bytes, %d haptic matches" % (
+        "replay", s['seconds'], s['wall'], s['speedup'], rec.written, s['match']))
+    # 與 main.py 一樣以 FIFO 錄製：回放依檔頭的取樣率重建相同的姿態
+    path = os.path.join(tempfile.mkdtemp(), 'nod.bin')
+    rec = _record_walk(path, 600, fifo_rate=200)
+    s = replay(path)
+    assert s['match'] > 0 and s['mismatch'] == s['extra'] == s['missing'] == 0, s
+    assert rec.lost == 0 and read_header(path)['fifo_rate'] == 200
+
+def bench_dma(rounds=500):
+    # 同一段位元組流分別交給 PIO 與 DMA 後端，比較每個封包的 CPU 時間
+    # DMA 的搬移在硬體上不花 CPU，所以先讓假 DMA 搬完再開始計時
+    from ld2450 import LD2450_PIO, LD2450_DMA
+    trace = _walk_trace(6)
+    chunk = b''.join(trace[:4])           # 120 bytes = 30 個字組
+    for cls, sm_id in ((LD2450_PIO, 4), (LD2450_DMA, 5)):
+        radar = cls(sm_id=sm_id, pin_rx=6)
+        us = 0
+        for _ in range(rounds):
+            radar.sm.feed(chunk)
+            if cls is LD2450_DMA: radar.dma._run()
+            t0 = time.ticks_us()
+            radar.poll()
+            while radar.next_frame() is not None: pass
+            us += time.ticks_diff(time.ticks_us(), t0)
+        assert radar.decoded == rounds * 4 and radar.overrun == 0
+        print("%-24s %8.1f us/frame" % (cls.__name__ + " ingest", us / (rounds * 4)))
+    # 溢位偵測：一次超過環形緩衝區的資料，只保留最後 1024 bytes 並記錄遺失量
+    radar.sm.feed(chunk * 10)
+    radar.poll()
+    assert radar.overrun == 1200 - 1024 and radar.dropped > 0
+    while radar.next_frame() is not None: assert radar.targets.y(0) > 0
+    # 傳輸次數用完時要重新啟動，留在 FIFO 的字組接著搬
+    radar.dma._count = radar._left = 10
+    radar.sm.feed(chunk)
+    n0 = radar.decoded
+    radar.poll()
+    assert radar.rearms == 1 and radar.dma.count == 0x3FFFFFFF - 20
+    radar.poll()
+    assert radar.decoded - n0 == 4
+
+def bench_backends(seconds=20, fps=10):
+    # 每個後端各跑 seconds 秒的雷達流量 (每秒 fps 個封包、每 100 ms poll 一次)
+    # 以 profile 模式累計的 CPU 時間換算成「每秒流量花多少 CPU」
+    from ld2450 import LD2450_PIO, LD2450_DMA, LD2450_UART
+    trace = _walk_trace(seconds * fps)
+    per_tick = fps // 10 or 1
+    for name, make in (('pio', lambda: LD2450_PIO(sm_id=6, pin_rx=7)),
+                       ('dma', lambda: LD2450_DMA(sm_id=7, pin_rx=8)),
+                       ('uart', lambda: LD2450_UART(uart_id=1, pin_rx=9, pin_tx=8))):
+        radar = make()
+        radar.profile = True
+        for f, frame in enumerate(trace):
+            if name == 'uart': radar.uart.feed(frame)
+            else:
+                radar.sm.feed(frame)
+                if name == 'dma': radar.dma._run()
+            if f % per_tick == per_tick - 1:
+                radar.poll()
+                while radar.next_frame() is not None: pass
+        assert radar.decoded >= len(trace) - 1 and radar.overrun == 0
+        us = radar.cpu_us / seconds
+        print("%-24s %8.1f us CPU per second of traffic (%.3f%%)" % ("backend " + name, us, us / 10000))
+
+def bench_imu_fifo(ticks=50, rate=200):
+    # 點頭：俯仰角 0.4 sin(2π·1.5 t)，加速度計帶走路震動雜訊；比較單筆輪詢與 FIFO 逐筆融合的誤差
+    import random
+    from mpu6050 import MPU6050
+    lsb = 131.0 / 0.01745                  # 陀螺儀 LSB per rad/s
+    w0 = 2 * math.pi * 1.5
+    results = {}
+    for mode in (0, rate):
+        rnd = random.Random(2)
+        mpu = host_fakes.FakeMPU6050()
+        host_fakes.I2C.devices[(0, 0x68)] = mpu
+        host_fakes.set_time_us(0)              # 建構時就用虛擬時鐘，第一筆的 dt 才不會受前面的測試影響
+        imu = MPU6050(i2c_bus=0, sda=4, scl=5, fifo_rate=mode)
+        err = us = 0
+        for tick in range(ticks):
+            for k in range(rate // 10):
+                t = tick * 0.1 + (k + 1) / rate
+                ang, w = 0.4 * math.sin(w0 * t), 0.4 * w0 * math.cos(w0 * t)
+                ax = rnd.randint(-2000, 2000)
+                ay = int(16384 * math.sin(ang)) + rnd.randint(-2000, 2000)
+                az = int(16384 * math.cos(ang)) + rnd.randint(-2000, 2000)
+                mpu.push_sample(ax, ay, az, int(w * lsb), 0, 0)
+            mpu.push(struct.pack('>hhhhhhh', ax, ay, az, 0, int(w * lsb), 0, 0))
+            host_fakes.set_time_us(int((tick + 1) * 100000))
+            t0 = time.perf_counter()
+            p, r = imu.get_fusion_data()
+            us += (time.perf_counter() - t0) * 1e6
+            err += abs(p - ang)
+        results[mode] = err / ticks
+        print("%-24s %8.1f us/tick  mean pitch error %.3f rad  samples=%d" % (
+            "imu " + ("fifo %d Hz" % mode if mode else "poll"), us / ticks, err / ticks, imu.samples))
+    host_fakes.set_time_us(None)
+    assert results[rate] < results[0]
+    # FIFO 溢位：超過 1024 bytes 必須清空重來，之後恢復正常
+    for _ in range(100): mpu.push_sample(0, 0, 16384, 0, 0, 0)
+    imu.get_fusion_data()
+    assert imu.fifo_overflows == 1 and len(mpu.fifo) == 0
+    for _ in range(20): mpu.push_sample(0, 0, 16384, 0, 0, 0)
+    n0 = imu.samples
+    imu.get_fusion_data()
+    assert imu.samples - n0 == 20
+    # 溢位之後 FIFO 已被讀掉一部分 (數量不到 _FIFO_FULL，開頭也不在樣本邊界)：只能靠 INT_STATUS 的旗標發現
+    for _ in range(100): mpu.push_sample(0, 0, 16384, 0, 0, 0)
+    del mpu.fifo[:1000]
+    imu.get_fusion_data()
+    assert imu.fifo_overflows == 2 and len(mpu.fifo) == 0 and imu.samples - n0 == 20
+    # 校正期間 FIFO 照樣在填、會溢位：校正結束清空 FIFO 時旗標也要清掉，之後的資料不能被當成溢位丟掉
+    for _ in range(100): mpu.push_sample(0, 0, 16384, 0, 0, 0)
+    mpu.bursts.clear()
+    mpu.regs[0x3B:0x3B + 14] = struct.pack('>hhhhhhh', 0, 0, 16384, 0, 0, 0, 0)
+    assert imu.calibrate(n=5)
+    for _ in range(20): mpu.push_sample(0, 0, 16384, 0, 0, 0)
+    n0 = imu.samples
+    imu.get_fusion_data()
+    assert imu.fifo_overflows == 2 and imu.samples - n0 == 20
+
+def bench_imu_core(calls=5000):
+    # 融合核心：每秒可呼叫次數與每次呼叫配置的記憶體；另外驗證 I2C 出錯時保留上一次的角度
+    from mpu6050 import MPU6050
+    for mode in (0, 200):
+        mpu = host_fakes.FakeMPU6050()
+        host_fakes.I2C.devices[(0, 0x68)] = mpu
+        imu = MPU6050(i2c_bus=0, sda=4, scl=5, fifo_rate=mode)
+        mpu.regs[0x3B:0x3B + 14] = _imu_burst(10)
+        per = 20 if mode else 1              # FIFO 模式每次呼叫 20 筆 (100 ms @ 200 Hz)
+        samples = [_imu_burst(k)[:6] + _imu_burst(k)[8:] for k in range(per)]
+        us = alloc = 0
+        for _ in range(calls):
+            if mode:
+                for smp in samples: mpu.push_fifo(smp)
+            done = _alloc_probe()
+            t0 = time.ticks_us()
+            imu.update()
+            us += time.ticks_diff(time.ticks_us(), t0)
+            alloc += done()
+        # 浮點狀態在 MicroPython 上本來就會產生浮點物件 (定點路徑見 bench_fixed)，這裡只確認沒有留下任何配置
+        def call():
+            if mode:
+                for smp in samples: mpu.push_fifo(smp)
+            imu.update()
+        left = _retained(call, 1000, ('mpu6050.py',), churn=False)
+        print("%-24s %8.0f calls/s  %6.1f B/call (%s)  retained %d B  %d samples/call" % (
+            "imu core " + ("fifo" if mode else "poll"), calls * 1e6 / us, alloc / calls, _ALLOC_KIND, left, per))
+        assert left == 0, left
+    p = imu.pitch
+    mpu.fail = 3
+    for _ in range(3): imu.update()
+    assert imu.errors == 3 and imu.pitch == p
+
+def _ahrs_trace(seconds, rate, rnd):
+    # 合成行走：繞 X / Y 擺動 + 左右轉頭，每 20 秒停下 4 秒；陀螺儀帶偏差 (隨時間漂移) 與雜訊
+    # 回傳每筆 (ax, ay, az, gx, gy, gz) 與當下的真實 (pitch, roll, yaw)
+    lsb = 131.0 / 0.01745
+    out = []
+    tau = 0.0
+    for k in range(seconds * rate):
+        t = k / rate
+        move = 0.0 if t < 3 or t % 20 > 16 else 1.0
+        tau += move / rate
+        w1, w2, w3 = 2 * math.pi * 0.3, 2 * math.pi * 0.2, 2 * math.pi * 0.1
+        ph, th, ps = 0.25 * math.sin(w1 * tau), 0.15 * math.sin(w2 * tau + 1), 0.8 * math.sin(w3 * tau)
+        dph = move * 0.25 * w1 * math.cos(w1 * tau)
+        dth = move * 0.15 * w2 * math.cos(w2 * tau + 1)
+        dps = move * 0.8 * w3 * math.cos(w3 * tau)
+        # 尤拉角 (ZYX) 變化率 → 機體角速度；重力在機體座標的方向
+        p = dph - dps * math.sin(th)
+        q = dth * math.cos(ph) + dps * math.cos(th) * math.sin(ph)
+        r = -dth * math.sin(ph) + dps * math.cos(th) * math.cos(ph)
+        drift = 30 * t / seconds
+        g = [int(v * lsb + b + drift) + rnd.randint(-20, 20) for v, b in ((p, 180), (q, -120), (r, 90))]
+        n = 800 if move else 60
+        a = [int(16384 * v) + rnd.randint(-n, n) for v in
+             (-math.sin(th), math.cos(th) * math.sin(ph), math.cos(th) * math.cos(ph))]
+        out.append((a + g, (ph, th, ps)))
+    return out
+
+def bench_ahrs(seconds=60, rate=200):
+    # 互補濾波 (未校正 / 已校正) 與 Mahony 四元數濾波比較：角度誤差、yaw 漂移、每個 100 ms 週期的 CPU 時間
+    import os
+    import random
+    import tempfile
+    from mpu6050 import MPU6050
+    trace = _ahrs_trace(seconds, rate, random.Random(3))
+    per = rate // 10
+    results = {}
+    for name, ahrs, cal in (('comp raw', False, False), ('comp cal', False, True), ('mahony cal', True, True)):
+        rnd = random.Random(4)
+        mpu = host_fakes.FakeMPU6050()
+        host_fakes.I2C.devices[(0, 0x68)] = mpu
+        host_fakes.set_time_us(0)
+        imu = MPU6050(i2c_bus=0, sda=4, scl=5, fifo_rate=rate, ahrs=ahrs)
+        if cal:
+            for _ in range(200):
+                mpu.push(struct.pack('>hhhhhhh', 0, 0, 16384, 0, 180 + rnd.randint(-20, 20),
+                                     -120 + rnd.randint(-20, 20), 90 + rnd.randint(-20, 20)))
+            assert imu.calibrate()
+        se = ye = us = 0.0
+        ticks = 0
+        for k in range(0, len(trace), per):
+            for smp, truth in trace[k:k + per]: mpu.push_sample(*smp)
+            t0 = time.perf_counter()
+            imu.update()
+            us += (time.perf_counter() - t0) * 1e6
+            ticks += 1
+            ph, th, ps = truth
+            se += (imu.pitch - ph) ** 2 + (imu.roll - th) ** 2
+            if ahrs: ye = abs((imu.yaw - ps + math.pi) % (2 * math.pi) - math.pi)
+        rms = math.sqrt(se / (2 * ticks))
+        results[name] = (rms, ye, imu)
+        print("%-24s %8.1f us/tick (%.2f%% of 100 ms)  rms pitch/roll %.4f rad  yaw err %s  bias %s" % (
+            "ahrs " + name, us / ticks, us / ticks / 1000, rms, "%.3f rad" % ye if ahrs else "-",
+            "/".join("%.0f" % b for b in imu.bias)))
+    host_fakes.set_time_us(None)
+    assert results['comp cal'][0] < results['comp raw'][0]
+    assert results['mahony cal'][0] < results['comp raw'][0] and results['mahony cal'][1] < 0.1
+    # 靜止偵測要跟上偏差漂移 (結束時真實偏差為 210 / -90 / 120 LSB)
+    imu = results['mahony cal'][2]
+    assert all(abs(b - w) < 15 for b, w in zip(imu.bias, (210, -90, 120))), imu.bias
+    # 校正檔來回存取；壞掉的檔案不影響現有偏差
+    path = os.path.join(tempfile.mkdtemp(), 'imu_cal.json')
+    imu.save_calibration(path)
+    other = MPU6050(i2c_bus=0, sda=4, scl=5)
+    assert other.load_calibration(path) and other.bias == imu.bias
+    with open(path, 'w') as f: f.write('{')
+    assert not other.load_calibration(path) and other.bias == imu.bias
+    assert not other.load_calibration(path + '.missing')
+
+def bench_imu_irq(ticks=100, rate=200):
+    # 邏輯週期被其他工作拖延 0~15 ms；輪詢模式的 dt 跟著抖動，中斷模式用中斷時間戳所以不受影響
+    # 中斷後的 I2C 讀取也會延遲 0~2 ms (schedule 等主程式空檔)，但時間戳記在硬中斷當下
+    import random
+    from mpu6050 import MPU6050
+    lsb = 131.0 / 0.01745
+    w0 = 2 * math.pi * 1.5
+    def truth(t):
+        ang, w = 0.4 * math.sin(w0 * t), 0.4 * w0 * math.cos(w0 * t)
+        return ang, (0, int(16384 * math.sin(ang)), int(16384 * math.cos(ang)), int(w * lsb), 0, 0)
+    per = rate // 10
+    results = {}
+    for mode in ('poll', 'irq'):
+        rnd = random.Random(5)
+        mpu = host_fakes.FakeMPU6050()
+        host_fakes.I2C.devices[(0, 0x68)] = mpu
+        host_fakes.set_time_us(0)
+        if mode == 'irq':
+            imu = MPU6050(i2c_bus=0, sda=4, scl=5, int_pin=22, int_rate=rate)
+            mpu.int_pin = host_fakes.Pin.instances[22]
+        else: imu = MPU6050(i2c_bus=0, sda=4, scl=5)
+        err = us = 0.0
+        for tick in range(ticks):
+            if mode == 'irq':
+                for k in range(per):
+                    t = tick * 0.1 + (k + 1) / rate
+                    host_fakes.set_time_us(int(t * 1e6))
+                    mpu.push_ready(*truth(t)[1])
+                    host_fakes.set_time_us(int(t * 1e6) + rnd.randint(0, 2000))
+                    host_fakes.run_scheduled()
+            t = (tick + 1) * 0.1 + rnd.randint(0, 15000) / 1e6
+            host_fakes.set_time_us(int(t * 1e6))
+            if mode == 'poll':
+                ang, smp = truth(t)
+                mpu.push(struct.pack('>hhhhhhh', smp[0], smp[1], smp[2], 0, smp[3], 0, 0))
+            t0 = time.perf_counter()
+            imu.update()
+            us += (time.perf_counter() - t0) * 1e6
+            err += abs(imu.pitch - truth(imu.last_time / 1e6)[0])
+        results[mode] = err / ticks
+        print("%-24s %8.1f us/tick  mean pitch error %.4f rad  samples=%d missed=%d overrun=%d" % (
+            "imu " + mode + " (jittered)", us / ticks, err / ticks, imu.samples, imu.irq_missed, imu.overrun))
+    assert results['irq'] < results['poll']
+    assert imu.samples == ticks * per and imu.irq_missed == imu.overrun == 0
+    # 讀取來不及：三次中斷只讀到最後一筆，其餘記為 missed
+    # 硬中斷只在還沒排過時呼叫 schedule：連續 20 次中斷也只佔排程佇列一格
+    for k in range(20): mpu.push_ready(0, 0, 16384, 0, 0, 0)
+    assert len(host_fakes._scheduled) == 1
+    host_fakes.run_scheduled()
+    assert imu.irq_missed == 19
+    # 消費者太久沒來：環形緩衝區滿了之後的樣本丟棄並記為 overrun，已存的照樣融合
+    n0 = imu.samples
+    for k in range(40):
+        mpu.push_ready(0, 0, 16384, 0, 0, 0)
+        host_fakes.run_scheduled()
+    imu.update()
+    assert imu.overrun == 40 + 1 - 32 and imu.samples - n0 == 32
+    host_fakes.set_time_us(None)
+
+def bench_fixed(seconds=30, rate=200):
+    # 定點 (Q16) 與浮點互補濾波跑同一段 IMU 資料：角度差的上限、每次呼叫的時間與配置量
+    import random
+    from mpu6050 import MPU6050
+    from geometry import atan2_q, hypot_q, Tilt
+    trace = _ahrs_trace(seconds, rate, random.Random(6))
+    per = rate // 10
+    for mode in (0, rate):
+        imus, mpus = [], []
+        for fixed in (False, True):
+            mpu = host_fakes.FakeMPU6050()
+            host_fakes.I2C.devices[(0, 0x68)] = mpu
+            host_fakes.set_time_us(0)
+            imus.append(MPU6050(i2c_bus=0, sda=4, scl=5, fifo_rate=mode, fixed=fixed))
+            mpus.append(mpu)
+        us = [0, 0]
+        alloc = [0, 0]
+        worst = 0.0
+        for k in range(0, len(trace), per):
+            host_fakes.set_time_us(int((k + per) * 1e6 / rate))
+            for j in (0, 1):
+                if mode:
+                    for smp, _ in trace[k:k + per]: mpus[j].push_sample(*smp)
+                else:
+                    a, g = trace[k + per - 1][0][:3], trace[k + per - 1][0][3:]
+                    mpus[j].push(struct.pack('>hhhhhhh', *(a + [0] + g)))
+                host_fakes.I2C.devices[(0, 0x68)] = mpus[j]
+                # 配置量只量最後 10 個週期 (tracemalloc 會拖慢計時)
+                done = _alloc_probe() if k >= len(trace) - 10 * per else None
+                t0 = time.perf_counter()
+                imus[j].update()
+                us[j] += (time.perf_counter() - t0) * 1e6
+                if done is not None: alloc[j] += done()
+            worst = max(worst, abs(imus[0].pitch - imus[1].pitch), abs(imus[0].roll - imus[1].roll))
+        ticks = len(trace) // per
+        name = "fifo %d Hz" % mode if mode else "poll"
+        # 誤差上限 0.001 rad：反正切查表 < 5e-5 rad，其餘來自 Q15 的 (1 - alpha) 與 16 us 為單位的 dt
+        assert worst < 0.001, worst
+        # 定點路徑的讀取與融合完全不配置 (update() 最後換算 pitch / roll 的兩個浮點數除外，所以直接呼叫讀取函式)
+        # CPython 上浮點物件互相取代不會留下配置，另外以 settrace 確認 _fuse 沒有浮點數的區域變數
+        imu, mpu = imus[1], mpus[1]
+        host_fakes.I2C.devices[(0, 0x68)] = mpu
+        block = trace[-per:]
+        burst = struct.pack('>hhhhhhh', *(block[-1][0][:3] + [0] + block[-1][0][3:]))
+        def fuse():
+            if mode:
+                for smp, _ in block: mpu.push_sample(*smp)
+                imu._read_fifo()
+            else:
+                mpu.push(burst)
+                imu._read_one()
+        left = _retained(fuse, 1000, ('mpu6050.py',))
+        assert left == 0, left
+        floats = set()
+        def watch(fr, event, arg):
+            if fr.f_code.co_name != '_fuse': return None
+            def line(f, ev, a):
+                floats.update(k for k, v in f.f_locals.items() if isinstance(v, float))
+                return line
+            return line
+        sys.settrace(watch)
+        fuse()
+        sys.settrace(None)
+        print("%-24s %8.1f us/tick float  %6.1f us/tick fixed  %6.1f / %6.1f B/tick (%s)  fixed retained %d B  max diff %.5f rad" % (
+            "fixed " + name, us[0] / ticks, us[1] / ticks, alloc[0] / 10, alloc[1] / 10, _ALLOC_KIND, left, worst))
+        assert not floats, floats
+    # 大角速度 × 長間隔：陀螺儀滿刻度 (±250°/s) 時以 100 ms 輪詢、或停頓 1 s 後才讀，
+    # 定點路徑的乘積仍須小於 2^30 (板子上超過就變成 long 而配置記憶體)；CPython 上以 settrace 看 _fuse 的區域變數
+    peak = [0]
+    def watch(frame, event, arg):
+        if frame.f_code.co_name != '_fuse': return None
+        def line(f, ev, a):
+            for v in ('wx', 'wy'):
+                w = f.f_locals.get(v)
+                if w is not None and abs(w) > peak[0]: peak[0] = abs(w)
+            return line
+        return line
+    pair = []
+    for fixed in (False, True):
+        mpu = host_fakes.FakeMPU6050()
+        host_fakes.I2C.devices[(0, 0x68)] = mpu
+        host_fakes.set_time_us(0)
+        pair.append((mpu, MPU6050(i2c_bus=0, sda=4, scl=5, fixed=fixed)))
+    t = 0
+    for dt, g in ((100000, 32767), (100000, -32768), (1000000, 32767), (1000000, -32768)):
+        t += dt
+        host_fakes.set_time_us(t)
+        for mpu, imu in pair:
+            host_fakes.I2C.devices[(0, 0x68)] = mpu
+            mpu.push(struct.pack('>hhhhhhh', 0, 0, 16384, 0, g, g, 0))
+            sys.settrace(watch)
+            imu.update()
+            sys.settrace(None)
+        a, b = pair[0][1], pair[1][1]
+        assert abs(a.pitch - b.pitch) < 0.001 and abs(a.roll - b.roll) < 0.001, (dt, g, a.pitch, b.pitch)
+    print("%-24s max |gyro x dt| %d (< 2^30 = %d)" % ("fixed long dt", peak[0], 1 << 30))
+    assert 0 < peak[0] < 1 << 30, peak[0]
+    host_fakes.set_time_us(None)
+    # 幾何運算的定點版本
+    rnd = random.Random(7)
+    for _ in range(20000):
+        x, y = rnd.randint(-16383, 16383), rnd.randint(-16383, 16383)
+        if x or y: assert abs(atan2_q(y, x) / 65536 - math.atan2(y, x)) < 5e-5, (x, y)
+        x, y = rnd.randint(-11585, 11585), rnd.randint(-11585, 11585)
+        assert abs(hypot_q(x, y) - math.hypot(x, y)) <= 1, (x, y)
+    tf, tq = Tilt(tol=0), Tilt(tol=0, fixed=True)
+    for i in range(3001):
+        a = i * 0.001 - 1.5
+        tf.update(a, -a)
+        tq.update(int(a * 65536), int(-a * 65536))
+        # 兩者最多差一格查表 (0.25° ≈ 72 / 16384)
+        assert abs(tf.cp - tq.cp) <= 72 and abs(tf.sp - tq.sp) <= 72 and abs(tf.sr - tq.sr) <= 72
+
+def _nav_sequences(ticks, states=None):
+    # 以 _walk_trace 跑 Navigator，收集每次送給觸覺核心的序列 (states 不是 None 時也收集狀態編號)
+    from ld2450 import LD2450_PIO
+    from mpu6050 import MPU6050
+    from navigator import Navigator
+    mpu = host_fakes.FakeMPU6050()
+    host_fakes.I2C.devices[(0, 0x68)] = mpu
+    host_fakes.set_time_us(0)
+    nav = Navigator(LD2450_PIO(sm_id=11, pin_rx=1), MPU6050(i2c_bus=0, sda=4, scl=5))
+    trace = _walk_trace(ticks)
+    out = []
+    for f in range(ticks):
+        host_fakes.set_time_us(f * 100000)
+        nav.radar.sm.feed(trace[f])
+        mpu.push(_imu_burst(f))
+        if nav.step():
+            out.append(list(nav.seq))
+            if states is not None: states.append(nav.state)
+    host_fakes.set_time_us(None)
+    return out
+
+def bench_haptic_bus(ticks=3000):
+    # 原本逐格寫入 (8 次 + GO) 與快取後只寫變動區段的 I2C 位元組數 / transaction 數
+    from drv2605l import DRV2605L
+    seqs = _nav_sequences(ticks)
+    dev = host_fakes.RegDevice()
+    host_fakes.I2C.devices[(1, 0x5A)] = dev
+    i2c = host_fakes.I2C(1)
+    t0 = time.perf_counter()
+    for seq in seqs:
+        for i, eff in enumerate(seq): i2c.writeto_mem(0x5A, 0x04 + i, bytes([eff]))
+        i2c.writeto_mem(0x5A, 0x0C, b'\x01')
+    us_old = (time.perf_counter() - t0) * 1e6
+    old = (dev.bus_bytes, dev.transactions)
+    dev = host_fakes.RegDevice()
+    host_fakes.I2C.devices[(1, 0x5A)] = dev
+    drv = DRV2605L(i2c_bus=1, sda=14, scl=15)
+    dev.bus_bytes = dev.transactions = 0
+    us_new = 0.0
+    for seq in seqs:
+        t0 = time.perf_counter()
+        drv.play_sequence(seq)
+        us_new += (time.perf_counter() - t0) * 1e6
+        assert list(dev.regs[0x04:0x0C]) == seq
+    n = len(seqs)
+    assert dev.bus_bytes == drv.bus_bytes
+    print("%-24s %6.1f B/update %5.2f tx/update %5.1f us  ->  %5.1f B/update %5.2f tx/update %5.1f us  (%d updates, %.1fx fewer bytes)" % (
+        "haptic bus", old[0] / n, old[1] / n, us_old / n, dev.bus_bytes / n, dev.transactions / n, us_new / n, n,
+        old[0] / dev.bus_bytes))
+    # 寫入失敗後下一次要整段重寫，不能相信快取
+    dev.fail = 1
+    drv.play_sequence([16, 178, 16, 178, 16, 178, 0, 0])
+    drv.play_sequence([16, 178, 16, 178, 16, 178, 0, 0])
+    assert drv.last_bytes == 2 + 8 + 3 and list(dev.regs[0x04:0x0C]) == [16, 178, 16, 178, 16, 178, 0, 0]
+    drv.play_sequence([16, 178, 47, 178, 16, 178, 0, 0])
+    assert drv.last_bytes == 2 + 1 + 3
+
+def _time_to_feel(mode, appear, table=None):
+    # 行走中遠處 (5 m) 有物體，appear ms 時正前方突然出現 50 cm 的牆，模擬兩個核心的計時器 (10 ms 一格)
+    # 回傳從出現到馬達真的輸出近距離訊號的 ms，以及核心 1 的輸出物件
+    #   seq：原本的做法，每 20 ms 檢查、播放後鎖 1800 ms
+    #   sched：HapticScheduler，更緊急的序列搶先播放，其餘等 GO 位元清除
+    #   rtp：RTPStreamer 每 20 ms 更新振幅，達到近距離強度即算
+    from ld2450 import LD2450_PIO
+    from mpu6050 import MPU6050
+    from navigator import Navigator, CODES
+    from drv2605l import DRV2605L
+    from rtp import RTPStreamer
+    from haptic_sched import HapticScheduler
+    mpu = host_fakes.FakeMPU6050()
+    host_fakes.I2C.devices[(0, 0x68)] = mpu
+    dev = host_fakes.FakeDRV2605()
+    host_fakes.I2C.devices[(1, 0x5A)] = dev
+    host_fakes.set_time_us(0)
+    nav = Navigator(LD2450_PIO(sm_id=12, pin_rx=1), MPU6050(i2c_bus=0, sda=4, scl=5),
+                    rtp=table if mode == 'rtp' else None)
+    drv = DRV2605L(i2c_bus=1, sda=14, scl=15)
+    out = RTPStreamer(drv) if mode == 'rtp' else HapticScheduler(drv) if mode == 'sched' else drv
+    near = table.level(50) if table else 0
+    pending, fresh, busy_until, target = None, False, 0, 0
+    for t in range(0, appear + 3000, 10):
+        host_fakes.set_time_us(t * 1000)
+        if t % 100 == 0:
+            y = 500 if t >= appear else 5000
+            nav.radar.sm.feed(make_frame([(0, y)]) + b'\x00\x00')
+            mpu.push(_imu_burst(t // 100))
+            if nav.step():
+                if mode == 'sched': out.submit(nav.seq, nav.urgency, t * 1000)
+                pending, fresh = list(nav.seq), True
+            target = nav.amp
+        if t % 20 == 10:                   # 核心 1 的計時器與邏輯週期錯開半格
+            if mode == 'rtp':
+                out.tick(target)
+                if t >= appear and out.amp >= near: return t - appear, out
+                continue
+            if mode == 'sched': out.poll()
+            elif fresh and t >= busy_until:
+                drv.play_sequence(pending)
+                fresh, busy_until = False, t + 1800
+            if t >= appear and dev.regs[0x0C] & 1 and dev.regs[0x06] == CODES[0]: return t - appear, out
+    raise AssertionError(mode + " never signalled the obstacle")
+
+def _feel_report(lat):
+    for mode, v in lat.items():
+        v = sorted(v)
+        print("%-24s mean %6.0f ms  max %6.0f ms  time-to-feel (%d trials)" % (
+            "haptic " + mode, sum(v) / len(v), v[-1], len(v)))
+
+def bench_rtp(trials=9):
+    # 出現時間在 1.8 s 冷卻週期內平移 trials 次
+    from rtp import RTPTable
+    table = RTPTable()
+    # 查表單調：距離越近越強
+    assert all(table.level(d) >= table.level(d + 10) for d in range(0, 800, 10))
+    assert table.level(700) == 0 and table.level(300, ttc=0.2) > table.level(300)
+    lat = {'seq': [], 'rtp': []}
+    for k in range(trials):
+        for mode in lat: lat[mode].append(_time_to_feel(mode, 5000 + k * 200, table)[0])
+    host_fakes.set_time_us(None)
+    _feel_report(lat)
+    # RTP 只剩追蹤器確認 (2 個封包) 與 20 ms 的輸出週期
+    assert max(lat['rtp']) <= 120 and sum(lat['rtp']) < sum(lat['seq'])
+
+def bench_haptic_sched(trials=9):
+    # 同一個情境比較固定冷卻與搶先排程；假 DRV2605 依序列長度清除 GO 位元 (遠距離序列約 2.1 s)
+    lat = {'seq': [], 'sched': []}
+    pre = 0
+    for k in range(trials):
+        for mode in lat:
+            ms, out = _time_to_feel(mode, 5000 + k * 200)
+            lat[mode].append(ms)
+            if mode == 'sched':
+                pre += out.preemptions
+                st = out.stats()
+    host_fakes.set_time_us(None)
+    _feel_report(lat)
+    print("%-24s %d preemptions in %d trials; last run %s" % ("haptic sched stats", pre, trials, st))
+    # 近距離只等追蹤器確認與一次 20 ms 的輪詢
+    assert max(lat['sched']) <= 120 and pre >= trials
+
+def bench_patterns(ticks=20000):
+    # 每個週期重組序列 (原本的做法) 與查預先編好的表，只比較編碼這一步
+    import random
+    from patterns import PatternTable
+    from navigator import CODES
+    t0 = time.perf_counter()
+    table = PatternTable()
+    build_us = (time.perf_counter() - t0) * 1e6
+    assert table.size == 27
+    # 與原本逐格組出的序列完全相同
+    for l in range(3):
+        for c in range(3):
+            for r in range(3):
+                seq = [8, 178, 8, 178, 8, 178, 0, 0]
+                for i, b in enumerate((l, c, r)): seq[i * 2] = CODES[b]
+                s = table.state((l, c, r))
+                assert list(table.seqs[s]) == seq and table.urgency[s] == 2 - min(l, c, r)
+    rnd = random.Random(8)
+    states = [(rnd.randint(0, 2), rnd.randint(0, 2), rnd.randint(0, 2)) for _ in range(ticks)]
+    seq = [8, 178, 8, 178, 8, 178, 0, 0]
+    # 兩條路徑都把序列與緊急程度累加起來，最後必須相同
+    t0 = time.perf_counter()
+    sum_old = 0
+    for bs in states:
+        m = 2
+        for i in range(3):
+            b = bs[i]
+            seq[i * 2] = CODES[b]
+            if b < m: m = b
+        out = bytes(seq)               # 舊路徑在交給核心 1 前還要複製一次
+        sum_old += out[0] + out[2] + out[4] + 2 - m
+    us_old = (time.perf_counter() - t0) * 1e6
+    seqs, urg, lv = table.seqs, table.urgency, table.levels
+    t0 = time.perf_counter()
+    sum_new = 0
+    for bs in states:
+        s = 0
+        for i in range(3): s = s * lv + bs[i]
+        out = seqs[s]
+        sum_new += out[0] + out[2] + out[4] + urg[s]
+    us_new = (time.perf_counter() - t0) * 1e6
+    assert sum_old == sum_new, (sum_old, sum_new)
+    print("%-24s %8.2f us/tick rebuild  %6.2f us/tick lookup  (table of %d built in %.0f us)" % (
+        "patterns", us_old / ticks, us_new / ticks, table.size, build_us))
+    # 等級與方向數變多時表格跟著變大；放不進 8 格就拒絕
+    big = PatternTable(codes=(16, 47, 8, 1), sectors=4)
+    assert big.size == 256 and big.seqs[big.state((3, 3, 3, 0))][6] == 16
+    try:
+        PatternTable(sectors=5)
+        raise AssertionError("5 sectors with gaps cannot fit")
+    except ValueError: pass
+    assert PatternTable(sectors=5, gap=0).size == 243
+
+def bench_haptic_array(ticks=3000):
+    # 三顆 DRV2605L 接在 TCA9548A 的通道 0~2 (用還沒用過的匯流排 3)，與單一馬達依序播放比較
+    import random
+    from drv2605l import DRV2605L, DRV2605Array
+    from patterns import ArrayPatternTable
+    states = []
+    seqs = _nav_sequences(ticks, states)
+    table = ArrayPatternTable()
+    mux = host_fakes.FakeTCA9548A()
+    host_fakes.I2C.devices[(3, 0x70)] = mux
+    devs = [host_fakes.FakeDRV2605() for _ in range(3)]
+    for ch, dev in enumerate(devs): mux.channels[ch][0x5A] = dev
+    arr = DRV2605Array(i2c_bus=3, sda=14, scl=15)
+    # 初始化是一次廣播
+    assert arr.active and all(d.regs[0x01] == 0 and d.regs[0x03] == 1 for d in devs) and mux.selects == 1
+    rnd = random.Random(9)
+    prev = None
+    for _ in range(500):
+        s = rnd.randrange(table.size)
+        logs = [len(d.log) for d in devs]
+        arr.play_state(table, s)
+        for k, d in enumerate(devs):
+            assert bytes(d.regs[0x04:0x0C]) == table.seqs[s][k] and d.regs[0x0C] & 1, (s, k)
+            # 序列沒變的通道不寫、不重新觸發
+            if prev is not None and table.seqs[prev][k] == table.seqs[s][k]: assert len(d.log) == logs[k], (s, k)
+        prev = s
+    # 導航序列：單一馬達 (快取寫入) 與陣列的匯流排位元組
+    dev = host_fakes.RegDevice()
+    host_fakes.I2C.devices[(1, 0x5A)] = dev
+    drv = DRV2605L(i2c_bus=1, sda=14, scl=15)
+    drv.bus_bytes = 0
+    for seq in seqs: drv.play_sequence(seq)
+    arr.bus_bytes = 0
+    worst = 0
+    t0 = time.perf_counter()
+    for s in states:
+        arr.play_state(table, s)
+        if arr.last_bytes > worst: worst = arr.last_bytes
+    us = (time.perf_counter() - t0) * 1e6
+    n = len(states)
+    # 每個方向開始震動的時間：單一馬達要等前面的效果與 500 ms 暫停播完；陣列只差在 I2C 傳輸 (9 bit/byte @ 400 kHz)
+    seq_ms = (table.sectors - 1) * (host_fakes.FakeDRV2605.EFFECT_MS + 500) + drv.last_bytes * 9 / 400
+    arr_ms = worst * 9 / 400
+    print("%-24s %5.1f B/update single  %5.1f B/update array  %5.1f us/update  last sector starts %6.1f ms -> %5.2f ms (worst case)" % (
+        "haptic array", drv.bus_bytes / n, arr.bus_bytes / n, us / n, seq_ms, arr_ms))
+    # 同一等級的通道共用一次廣播：三個方向一樣時只寫一段 (遮罩沒變就不重選)；同一狀態再送一次什麼都不寫
+    arr.play_state(table, table.state((1, 1, 1)))
+    arr.play_state(table, table.state((0, 0, 0)))
+    logs = [len(d.log) for d in devs]
+    arr.play_state(table, table.state((0, 0, 0)))
+    assert arr.last_bytes == 0 and [len(d.log) for d in devs] == logs
+    sel = mux.selects
+    arr.play_state(table, table.state((1, 1, 1)))
+    assert arr.last_bytes == 2 + 9 and mux.selects == sel
+    # 寫入失敗的通道下次整段重寫，其餘沒變的通道不碰
+    devs[2].fail = 1
+    arr.play_state(table, table.state((1, 1, 2)))
+    arr.play_state(table, table.state((1, 1, 2)))
+    assert bytes(devs[2].regs[0x04:0x0C]) == table.seqs[table.state((1, 1, 2))][2] and arr._known == [True] * 3
+    assert arr.last_bytes == 2 + 9 and mux.mask == 1 << 2
+    # 指定觸發遮罩：沒變的通道只寫 GO，遮罩外的通道即使序列變了也不碰
+    s = table.state((1, 2, 0))
+    logs = [len(d.log) for d in devs]
+    arr.play(table.seqs[s], 0b001)
+    assert arr.last_bytes == 2 + 2 + 1 and [len(d.log) - n for d, n in zip(devs, logs)] == [1, 0, 0]
+    # ArrayScheduler：每 100 ms 送同一狀態，各通道播完才重播，不會從頭打斷；較緊急的通道立刻搶先
+    from haptic_sched import ArrayScheduler
+    host_fakes.set_time_us(0)
+    try:
+        sched = ArrayScheduler(arr)
+        s = table.state((2, 2, 2))
+        starts = [[] for _ in devs]
+        for tick in range(40):
+            t = tick * 100000
+            host_fakes.set_time_us(t)
+            sched.submit(table.seqs[s], table.urgencies[s], t)
+            logs = [len(d.log) for d in devs]
+            for sub in range(5):
+                host_fakes.set_time_us(t + sub * 20000)
+                sched.poll()
+            for k, d in enumerate(devs):
+                for e in d.log[logs[k]:]:
+                    if e[1] <= 0x0C < e[1] + len(e[2]) and e[2][0x0C - e[1]] & 1: starts[k].append(e[0])
+        # 每次重新觸發都在上一段序列播完之後
+        ms = sum(host_fakes.FakeDRV2605.EFFECT_MS for v in table.seqs[s][0] if v)
+        for st in starts:
+            assert len(st) > 1 and all(b - a >= ms * 1000 for a, b in zip(st, st[1:])), st
+        plays = sched.plays
+        s = table.state((0, 2, 2))
+        t = max(st[-1] for st in starts) + 10000    # 三個通道都還在播
+        host_fakes.set_time_us(t)
+        sched.submit(table.seqs[s], table.urgencies[s], t)
+        sched.poll()
+        assert sched.preemptions == 1 and sched.running[0] == table.levels - 1 and sched.plays == plays + 1
+        assert bytes(devs[0].regs[0x04:0x0C]) == table.seqs[s][0] and devs[0].regs[0x0C] & 1
+    finally:
+        host_fakes.set_time_us(None)
+
+def bench_adafruit_drv(ticks=3000):
+    # adafruit_drv2605：逐格 sequence[i] = ... + play() 與整段 play_sequence 的匯流排成本，並與 drv2605l 比較
+    import adafruit_drv2605 as ada
+    from drv2605l import DRV2605L
+    seqs = _nav_sequences(ticks)
+    dev = host_fakes.FakeDRV2605()
+    host_fakes.I2C.devices[(4, 0x5A)] = dev
+    drv = ada.DRV2605(host_fakes.I2C(4))
+    init = (dev.transactions, dev.bus_bytes)
+    # 初始化後的暫存器與原本逐一寫入的結果相同
+    assert list(dev.regs[0x01:0x06]) == [0, 0, 1, 1, 0] and dev.regs[0x13] == 0x64
+    assert dev.regs[0x1A] & 0x80 == 0 and dev.regs[0x1D] & 0x20
+    res = {}
+    for name in ('per-slot', 'bulk'):
+        dev.transactions = dev.bus_bytes = 0
+        t0 = time.perf_counter()
+        for seq in seqs:
+            if name == 'bulk': drv.play_sequence(seq)
+            else:
+                for i in range(8): drv.sequence[i] = ada.Pause((seq[i] & 0x7F) / 100) if seq[i] & 0x80 else ada.Effect(seq[i])
+                drv.play()
+            assert list(dev.regs[0x04:0x0C]) == seq and dev.regs[0x0C] & 1
+        res[name] = (dev.bus_bytes, dev.transactions, (time.perf_counter() - t0) * 1e6)
+    # 讀取由影子暫存器提供：不碰匯流排
+    tx = dev.transactions
+    assert drv.mode == ada.MODE_INTTRIG and drv.library == ada.LIBRARY_TS2200A and repr(drv.sequence)
+    assert dev.transactions == tx
+    dev = host_fakes.RegDevice()
+    host_fakes.I2C.devices[(1, 0x5A)] = dev
+    small = DRV2605L(i2c_bus=1, sda=14, scl=15)
+    small.bus_bytes = 0
+    for seq in seqs: small.play_sequence(seq)
+    n = len(seqs)
+    for name, (b, t, us) in res.items():
+        print("%-24s %6.1f B/update %5.2f tx/update %6.1f us/update" % ("adafruit " + name, b / n, t / n, us / n))
+    print("%-24s %6.1f B/update %5.2f tx/update (drv2605l)  init %d tx / %d B" % (
+        "adafruit vs minimal", small.bus_bytes / n, dev.transactions / n, init[0], init[1]))
+    # 一律一個 transaction (連同 GO)；代價是變動格之後的未變動格也要重送
+    assert res['bulk'][1] == n < dev.transactions and res['bulk'][0] < 1.2 * small.bus_bytes and init[0] == 4
+    # Effect / Pause 物件也可以直接放進序列；長度超過 8 格要拒絕
+    drv.play_sequence([ada.Effect(47), ada.Pause(0.5)])
+    assert list(host_fakes.I2C.devices[(4, 0x5A)].regs[0x04:0x07]) == [47, 178, 0]
+    try:
+        drv.play_sequence([1] * 9)
+        raise AssertionError("9 slots accepted")
+    except ValueError: pass
+
+def _exchange_stress(box, n, naive=False):
+    # 生產者執行緒連續發佈 (k, 3k, k ^ 0x5555, 7 - k)，消費者執行緒讀取並檢查四個欄位屬於同一筆
+    # naive：直接讀寫同一格，不用序號也不上鎖，作為對照
+    import threading
+    done = [False]
+    stats = {'reads': 0, 'torn': 0, 'regress': 0}
+    raw = box._bufs[0]
+    def producer():
+        for k in range(1, n + 1):
+            buf = raw if naive else box.begin()
+            buf[0] = k
+            buf[1] = 3 * k
+            buf[2] = k ^ 0x5555
+            buf[3] = 7 - k
+            if not naive: box.commit()
+            if k & 7 == 0: time.sleep(0)     # 讓出執行權，消費者才讀得到大部分的紀錄
+        done[0] = True
+    def consumer():
+        out = [0] * 4
+        last = 0
+        while not done[0]:
+            if naive:
+                for i in range(4): out[i] = raw[i]
+            elif not box.read(out): continue
+            k = out[0]
+            stats['reads'] += 1
+            if out[1] != 3 * k or out[2] != k ^ 0x5555 or out[3] != 7 - k: stats['torn'] += 1
+            if k < last: stats['regress'] += 1
+            last = k
+    ts = [threading.Thread(target=producer), threading.Thread(target=consumer)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return stats
+
+def bench_exchange(n=100000):
+    # 主機上的多執行緒壓力測試：縮短直譯器切換間隔，讓兩個執行緒在每幾個 bytecode 就交錯一次
+    from exchange import SeqBox, _MASK as _SEQ_MASK
+    old = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        naive = _exchange_stress(SeqBox(4), n // 10, naive=True)
+        box = SeqBox(4)
+        start = box._seq = box._last = (_SEQ_MASK + 1 - n) & ~1       # 壓力測試途中序號繞回
+        st = _exchange_stress(box, n)
+    finally:
+        sys.setswitchinterval(old)
+    print("%-24s %d reads, %d torn  ->  seqlock %d reads, %d torn, %d retries, %d missed (%d published)" % (
+        "core exchange", naive['reads'], naive['torn'], st['reads'], st['torn'], box.retries, box.missed, box.published))
+    assert st['torn'] == 0 and st['regress'] == 0 and box.published == n
+    assert box._seq == (start + 2 * n) & _SEQ_MASK and st['reads'] + box.missed == n
+    # 繞回時漏讀的筆數照算，序號維持 small int
+    out = [0] * 4
+    wrap = SeqBox(4)
+    wrap._seq = wrap._last = _SEQ_MASK - 3
+    for k in range(5): wrap.publish(k, 3 * k, k ^ 0x5555, 7 - k)
+    assert wrap.read(out) and out[0] == 4 and wrap.missed == 4 and wrap._seq == 6 and not wrap.read(out)
+    # 沒有新紀錄時不複製；每筆只讀到一次
+    out = [0] * 4
+    box.publish(1, 3, 1 ^ 0x5555, 6)
+    assert box.read(out) and out == [1, 3, 1 ^ 0x5555, 6] and not box.read(out)
+    # 決定性的重讀：複製到第 3 個欄位時生產者又發佈兩次 (第二次寫到正在讀的那一格)
+    class Racing(list):
+        def __setitem__(self, i, v):
+            list.__setitem__(self, i, v)
+            if i == 2 and self.k < 4:
+                self.k += 2
+                box.publish(self.k, 3 * self.k, self.k ^ 0x5555, 7 - self.k)
+                box.publish(self.k + 1, 3 * self.k + 3, (self.k + 1) ^ 0x5555, 6 - self.k)
+    out = Racing([0] * 4)
+    out.k = 0
+    box.publish(1, 3, 1 ^ 0x5555, 6)
+    r = box.retries
+    assert box.read(out) and box.retries > r and out[1] == 3 * out[0] and out[3] == 7 - out[0]
+
+def _runtime_host(seconds, stall_ms=0):
+    # 主機模式：與 main.py 相同的雷達 / IMU / 判定 / 觸覺任務跑在假硬體上 (真實時間)
+    # 另外兩個只在主機上的任務扮演感測器：每 100 ms 一個雷達封包、每 10 ms 一筆 IMU 資料
+    # stall_ms：另加一個每 500 ms 忙等 stall_ms 的任務，確認超時與抖動會被記錄
+    from array import array
+    from ld2450 import LD2450_PIO
+    from mpu6050 import MPU6050
+    from navigator import Navigator
+    from drv2605l import DRV2605L
+    from haptic_sched import HapticScheduler
+    from exchange import SeqBox
+    from runtime import Task, Runtime, nav_tasks, haptic_task, asyncio
+    mpu = host_fakes.FakeMPU6050()
+    host_fakes.I2C.devices[(0, 0x68)] = mpu
+    dev = host_fakes.FakeDRV2605()
+    host_fakes.I2C.devices[(1, 0x5A)] = dev
+    host_fakes.set_time_us(None)
+    nav = Navigator(LD2450_PIO(sm_id=13, pin_rx=1), MPU6050(i2c_bus=0, sda=4, scl=5))
+    box = SeqBox(3)
+    def publish():
+        msg = box.begin()
+        msg[0], msg[1], msg[2] = nav.state, nav.urgency, time.ticks_us()
+        box.commit()
+    trace = _walk_trace(int(seconds * 10) + 2)
+    n = [0, 0]
+    def radar_feed():
+        nav.radar.sm.feed(trace[n[0]] + b'\x00\x00')
+        n[0] += 1
+    def imu_feed():
+        mpu.push(_imu_burst(n[1] // 10))
+        n[1] += 1
+    sched = HapticScheduler(DRV2605L(i2c_bus=1, sda=14, scl=15))
+    tasks = nav_tasks(nav, publish) + [haptic_task(sched, box, nav.patterns, array('i', [0] * 3))]
+    feeders = [Task('radar feed', 100, radar_feed), Task('imu feed', 10, imu_feed)]
+    extra = []
+    if stall_ms:
+        def stall():
+            t0 = time.perf_counter()
+            while time.perf_counter() - t0 < stall_ms / 1000: pass
+        extra.append(Task('stall', 500, stall))
+    asyncio.run(Runtime(feeders + tasks + extra).run(int(seconds * 1000)))
+    return tasks, sched, Runtime(tasks)
+
+def bench_runtime(seconds=2.0):
+    tasks, sched, rt = _runtime_host(seconds)
+    print("%-24s %.1f s against fakes, %d haptic plays:" % ("asyncio runtime", seconds, sched.plays))
+    ok = rt.report()
+    # 各任務都按宣告的週期跑 (容許主機排程的誤差)，而且判定結果真的送到了觸覺任務
+    for t in tasks: assert t.runs >= seconds * 1000 / t.period_ms * 0.8, (t.name, t.runs)
+    assert sched.plays > 0
+    if not ok: print("%-24s deadline misses on this host (no assertion: real-time scheduling on a shared machine)" % "")
+    # 卡住事件迴圈 30 ms 的任務：10 ms 的 IMU 任務必定超時，抖動也會被記錄下來
+    tasks, sched, rt = _runtime_host(1.0, stall_ms=30)
+    imu = [t for t in tasks if t.name == 'imu'][0]
+    print("%-24s imu overruns %d, jitter max %d us with a 30 ms stall every 500 ms" % ("", imu.overruns, imu.jitter_max))
+    assert imu.jitter_max >= 15000 and not imu.met()
+
+def _run_virtual(tasks, ms):
+    # 以虛擬時鐘每 1 ms 檢查一次，到期的任務依列表順序執行 (與 asyncio 版本相同的 Task 物件與統計)
+    for t in range(ms):
+        host_fakes.set_time_us(t * 1000)
+        now = time.ticks_us()
+        for task in tasks:
+            if task._due is None or time.ticks_diff(now, task._due) >= 0: task._tick()
+
+def bench_latency(seconds=120):
+    # 行走軌跡以 LD2450_UART 送入 (抵達時間 = RXIDLE 中斷)，封包在 100 ms 週期的第 37 ms 抵達，
+    # 其餘與 main.py 相同：雷達 50 ms、IMU 10 ms、判定 100 ms、觸覺 20 ms；兩個核心的直方圖傾印後再解碼
+    from array import array
+    from ld2450 import LD2450_UART
+    from mpu6050 import MPU6050
+    from navigator import Navigator
+    from drv2605l import DRV2605L
+    from haptic_sched import HapticScheduler
+    from exchange import SeqBox
+    from runtime import Task, nav_tasks, haptic_task
+    from latency import LatencyHist, CORE0_STAGES, CORE1_STAGES, decode, percentile, report, dump_size
+    mpu = host_fakes.FakeMPU6050()
+    host_fakes.I2C.devices[(0, 0x68)] = mpu
+    dev = host_fakes.FakeDRV2605()
+    host_fakes.I2C.devices[(1, 0x5A)] = dev
+    host_fakes.set_time_us(0)
+    nav = Navigator(LD2450_UART(uart_id=1, pin_rx=5, pin_tx=4), MPU6050(i2c_bus=0, sda=4, scl=5))
+    lat0, lat1 = LatencyHist(0, CORE0_STAGES), LatencyHist(1, CORE1_STAGES)
+    nav.lat = lat0
+    box = SeqBox(3)
+    def publish():
+        msg = box.begin()
+        msg[0], msg[1], msg[2] = nav.state, nav.urgency, nav.frame_t
+        box.commit()
+    trace = _walk_trace(seconds * 10 + 1)
+    n = [0]
+    def radar_feed():
+        nav.radar.uart.feed(trace[n[0]])
+        mpu.push(_imu_burst(n[0]))
+        n[0] += 1
+    feed = Task('feed', 100, radar_feed)
+    feed._due = 37000
+    sched = HapticScheduler(DRV2605L(i2c_bus=1, sda=14, scl=15))
+    tasks = [feed] + nav_tasks(nav, publish) + [haptic_task(sched, box, nav.patterns, array('i', [0] * 3), hist=lat1)]
+    _run_virtual(tasks, seconds * 1000)
+    host_fakes.set_time_us(None)
+    data = b'>>> noise from the REPL\r\n' + lat0.dump() + b'\r\n' + lat1.dump()
+    assert len(lat0.dump()) == dump_size(2)
+    dumps = decode(data)
+    print("%-24s %d s virtual walk, %d B per core dump:" % ("latency", seconds, dump_size(2)))
+    report(dumps)
+    st = dict(dumps[0][1], **dumps[1][1])
+    # 解碼結果與裝置上的計數一致；每個階段的延遲依序累加
+    assert st['parse'][0] == lat0.count[0] and st['go'][0] == lat1.count[1] == sched.plays
+    p50 = [percentile(st[k][2], 50) for k in ('parse', 'decide', 'handoff', 'go')]
+    assert p50 == sorted(p50) and p50[0] == 13 and p50[1] == 63, p50
+
+def bench_pipeline(ticks=3000):
+    # 錄下來的行走以兩個執行緒跑兩核心管線 (replay.replay_pipeline)，逐封包的判定必須與單執行緒完全相同
+    import os
+    import tempfile
+    from replay import replay_pipeline
+    path = os.path.join(tempfile.mkdtemp(), 'walk.bin')
+    _record_walk(path, ticks)
+    s = replay_pipeline(path)
+    print("%-24s %d frames on 2 threads in %.2f s (1 thread %.2f s)  load core0 %.0f%%  core1 %.0f%%  dropped %d" % (
+        "two-core pipeline", s['frames'], s['wall'], s['ref_wall'], s['load0'] * 100, s['load1'] * 100, s['dropped']))
+    assert s['match'] and s['frames'] >= ticks - 1 and s['dropped'] == 0
+    # 裝置上佇列滿了丟掉新的封包並計數，已經在佇列裡的不受影響
+    from ld2450 import LD2450_PIO, FrameQueue
+    radar = LD2450_PIO(sm_id=15, pin_rx=1)
+    q = FrameQueue(slots=4)
+    trace = _walk_trace(6)
+    radar.sm.feed(b''.join(trace) + b'\x00' * 4)
+    radar.poll()
+    assert q.push_all(radar) == 4 and q.dropped == 2
+    ys = []
+    while q.pop() is not None: ys.append(q.targets.y(0))
+    assert ys == [5000, 4920, 4840, 4760], ys
+    # 累計數在 2^30 繞回時格子順序不變；slots 不是 2 的次方要拒絕
+    q._w = q._r = 0x3FFFFFFE
+    radar.sm.feed(b''.join(trace[:3]) + b'\x00' * 4)
+    radar.poll()
+    assert q.push_all(radar) == 3 and q._w == 1
+    ys = []
+    while q.pop() is not None: ys.append(q.targets.y(0))
+    assert ys == [5000, 4920, 4840], ys
+    try:
+        FrameQueue(slots=6)
+        raise AssertionError("6 slots accepted")
+    except ValueError: pass
+
+def _targets(pts):
+    # 直接填一份 ld2450.TargetTable (x, y mm)
+    from ld2450 import TargetTable
+    t = TargetTable()
+    for i, (x, y) in enumerate(pts):
+        t._d[i * 4], t._d[i * 4 + 1] = x, y
+    t._n = len(pts)
+    return t
+
+def bench_occupancy(frames=2000):
+    import random
+    from occupancy import PolarGrid
+    from tracker import FAR
+    rnd = random.Random(7)
+    pi_q = int(math.pi * 65536)
+    # 實際會用的格子大小：每格約 11° / 22° 與 19~38 cm
+    scene = [_targets([(rnd.randint(-3000, 3000), rnd.randint(300, 5800)) for _ in range(3)]) for _ in range(64)]
+    for na, nr in ((16, 16), (32, 24), (64, 32)):
+        g = PolarGrid(angle_bins=na, range_bins=nr)
+        for k in range(10): g.insert(scene[k])
+        ti = tr = tf = ts = 0
+        yaw = 0
+        for f in range(frames):
+            t = scene[f & 63]
+            yaw += 655                     # 每個封包 0.01 rad (Q16)
+            t0 = time.ticks_us()
+            g.insert(t)
+            t1 = time.ticks_us()
+            g.sectors()
+            t2 = time.ticks_us()
+            g.fade()
+            t3 = time.ticks_us()
+            g.rotate_to(yaw)
+            t4 = time.ticks_us()
+            ti += time.ticks_diff(t1, t0)
+            ts += time.ticks_diff(t2, t1)
+            tf += time.ticks_diff(t3, t2)
+            tr += time.ticks_diff(t4, t3)
+        # 配置量另外量 (tracemalloc 會拖慢計時)：四個步驟都不能留下配置；yaw 在 ±π 之間繞回
+        st = [0, yaw]
+        def frame():
+            f = st[0]
+            st[0] = (f + 1) & 63
+            y = st[1] + 6553
+            if y > pi_q: y -= 2 * pi_q
+            st[1] = y
+            g.insert(scene[f])
+            g.sectors()
+            g.fade()
+            g.rotate_to(y)
+        for _ in range(128): frame()     # yaw 先繞回一次，每條分支都走過 (CPython 的特化快取才會穩定)
+        left = _retained(frame, 1024, ('occupancy.py',))
+        assert left == 0, left
+        # CPython 上浮點物件互相取代不會留下配置：另外以 settrace 確認 insert / rotate_to 的區域變數都不是浮點數
+        floats = set()
+        def watch(fr, event, arg):
+            if fr.f_code.co_name not in ('insert', 'rotate_to') or not fr.f_code.co_filename.endswith('occupancy.py'):
+                return None
+            def line(f, ev, a):
+                floats.update(k for k, v in f.f_locals.items() if isinstance(v, float))
+                return line
+            return line
+        sys.settrace(watch)
+        for _ in range(64): frame()
+        sys.settrace(None)
+        assert not floats, floats
+        print("%-24s insert %5.1f  sectors %6.1f  fade %6.1f  rotate %4.1f us/frame  %4d B grid  retained %d B" % (
+            "occupancy %dx%d" % (na, nr), ti / frames, ts / frames, tf / frames, tr / frames, len(g.cells), left))
+    # 雷達斷續：正前方 2 m 的物體每個封包只有 60% 被偵測到，單一封包的最近距離常常變成 FAR，格子要撐住
+    g = PolarGrid()
+    obj, empty = _targets([(0, 2000)]), _targets([])
+    raw_miss = grid_miss = 0
+    for f in range(500):
+        t = obj if rnd.random() < 0.6 else empty
+        g.insert(t)
+        g.sectors()
+        g.fade()
+        if f < 10: continue
+        if len(t) == 0: raw_miss += 1
+        if g.dist[1] >= FAR: grid_miss += 1
+        else: assert abs(g.dist[1] - 200) <= 13, g.dist[1]
+    print("%-24s center lost in %d / 490 frames (single frame %d)" % ("occupancy dropout", grid_miss, raw_miss))
+    assert grid_miss * 10 < raw_miss
+    # 物體消失後數個週期內淡出
+    for _ in range(8):
+        g.insert(empty)
+        g.sectors()
+        g.fade()
+    assert g.dist[1] >= FAR
+    # 往左轉 45° (4 格)：正前方偏左 5° 的物體應移到右邊 40°，距離不變 (不需要新的封包)
+    def at(deg): return _targets([(int(2000 * math.sin(math.radians(deg))), int(2000 * math.cos(math.radians(deg))))])
+    g = PolarGrid()
+    g.rotate_to(0)
+    for _ in range(3): g.insert(at(5))
+    g.sectors()
+    assert g.dist[1] < FAR and g.dist[2] >= FAR
+    for k in range(1, 10): g.rotate_to(int(math.radians(5 * k) * 65536))
+    g.sectors()
+    assert g.dist[2] < FAR and g.dist[1] >= FAR and abs(g.dist[2] - 200) <= 13, list(g.dist)
+    # 同一個物體在新的身體座標裡也落在同一格
+    g.insert(at(-40))
+    assert g.inserted == 4 and max(g.cells) == 48 * 4, max(g.cells)
+    # yaw 只有 AHRS 模式才會更新：沒有 AHRS 的 IMU 不能配佔據格
+    from ld2450 import LD2450_PIO
+    from mpu6050 import MPU6050
+    from navigator import Navigator
+    host_fakes.I2C.devices[(0, 0x68)] = host_fakes.FakeMPU6050()
+    radar = LD2450_PIO(sm_id=19, pin_rx=1)
+    try:
+        Navigator(radar, MPU6050(i2c_bus=0, sda=4, scl=5), grid=PolarGrid())
+        raise AssertionError("grid accepted without AHRS")
+    except ValueError: pass
+    assert Navigator(radar, MPU6050(i2c_bus=0, sda=4, scl=5, ahrs=True), grid=PolarGrid()).grid is not None
+
+def bench_height_gate(frames=1000):
+    # 雷達 (離地 900 mm) 前半段朝下 8°、後半段朝上 15°：朝下時平面在 6.5 m 處碰到地面，朝上時遠處打到天花板
+    # 每個封包：一個 4 m → 1 m 靠近的障礙物 (保留)，加上一個 5.9 m 的地面反射或 4.5 m 的天花板反射 (丟掉)
+    from ld2450 import LD2450_PIO
+    from geometry import HeightGate
+    from tracker import Tracker
+    trace = []
+    for f in range(frames):
+        far = (300, 5900) if f < frames // 2 else (-200, 4500)
+        trace.append(make_frame([(0, int(4000 - 3000 * (f % 50) / 50)), far, (0, 0)]))
+    res = {}
+    for gated in (False, True):
+        radar = LD2450_PIO(sm_id=16 + gated, pin_rx=1)
+        if gated: radar.gate = HeightGate(mount=900, lo=150, hi=2000)
+        trk = Tracker()
+        parse = track = n = 0
+        for f in range(frames):
+            pitch = math.radians(-8 if f < frames // 2 else 15)
+            radar.sm.feed(trace[f] + trace[f][:2])
+            t0 = time.ticks_us()
+            radar.poll(pitch=pitch, roll=0.02)
+            radar.next_frame()
+            t1 = time.ticks_us()
+            trk.update(radar.targets, f * 100000)
+            trk.sectors()
+            t2 = time.ticks_us()
+            parse += time.ticks_diff(t1, t0)
+            track += time.ticks_diff(t2, t1)
+            n += len(radar.targets)
+        res[gated] = (parse, track, n)
+        g = radar.gate
+    print("%-24s parse %5.1f -> %5.1f us/frame  tracker %5.1f -> %5.1f us/frame  targets %d -> %d" % (
+        "height gate", res[False][0] / frames, res[True][0] / frames, res[False][1] / frames,
+        res[True][1] / frames, res[False][2], res[True][2]))
+    print("%-24s passed %d  floor %d  overhead %d" % ("height gate bands", g.passed, g.floor, g.overhead))
+    assert g.floor == frames // 2 and g.overhead == frames - frames // 2 and g.passed == frames
+    assert res[False][2] == 2 * frames and res[True][2] == frames
+    # 錄製資料上的整批掃描 (replay.gate_sweep) 與裝置上逐點的整數判斷一致 (邊界上差幾個 mm 的除外)
+    import os
+    import tempfile
+    from mpu6050 import MPU6050
+    from navigator import Navigator
+    from replay import gate_sweep, replay, numpy
+    path = os.path.join(tempfile.mkdtemp(), 'walk.bin')
+    _record_walk(path, 600)
+    bands = ((150, 2000), (300, 1200), (500, 900))
+    t0 = time.perf_counter()
+    sweep = gate_sweep(path, (300, 900), bands)
+    wall = time.perf_counter() - t0
+    for s in sweep:
+        # 裝置端：同一段錄製資料重播一次，由 LD2450 解碼時的 HeightGate 計數
+        g = HeightGate(s['mount'], s['lo'], s['hi'])
+        radar = LD2450_PIO(sm_id=18, pin_rx=1)
+        radar.gate = g
+        host_fakes.I2C.devices[(0, 0x68)] = host_fakes.FakeMPU6050()
+        host_fakes.set_time_us(0)
+        replay(path, Navigator(radar, MPU6050(i2c_bus=0, sda=4, scl=5)))
+        tol = 1 + s['targets'] // 100
+        assert g.passed + g.floor + g.overhead == s['targets'], (g.counts(), s)
+        assert abs(g.floor - s['floor']) <= tol and abs(g.overhead - s['overhead']) <= tol, (g.counts(), s)
+    print("%-24s %d detections x %d settings in %.2f s (%s)  rejected %s" % (
+        "height gate sweep", sweep[0]['targets'], len(sweep), wall, 'lists' if numpy is None else 'numpy',
+        ' '.join('%d/%d' % (s['floor'], s['overhead']) for s in sweep)))
+
+BENCHES = {
+    'parser': bench_parser,
+    'stream': bench_stream,
+    'tracker': bench_tracker,
+    'geometry': bench_geometry,
+    'replay': bench_replay,
+    'dma': bench_dma,
+    'backends': bench_backends,
+    'imu_fifo': bench_imu_fifo,
+    'imu_core': bench_imu_core,
+    'ahrs': bench_ahrs,
+    'imu_irq': bench_imu_irq,
+    'fixed': bench_fixed,
+    'haptic_bus': bench_haptic_bus,
+    'rtp': bench_rtp,
+    'haptic_sched': bench_haptic_sched,
+    'patterns': bench_patterns,
+    'haptic_array': bench_haptic_array,
+    'adafruit_drv': bench_adafruit_drv,
+    'exchange': bench_exchange,
+    'runtime': bench_runtime,
+    'latency': bench_latency,
+    'pipeline': bench_pipeline,
+    'occupancy': bench_occupancy,
+    'height_gate': bench_height_gate,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHES)
+    for name in names:
+        BENCHES[name]()
@@ -0,0 +1,135 @@
+from micropython import const
+import struct
+import time
+
+# 二進位紀錄格式 (小端序)
+#   檔頭: b'TTUR' + 版本 1 byte (目前為 3；版本 1 沒有 REC_TICK / REC_IMU_FIFO)
+#         版本 3 起接著 IMU 設定 4 bytes：fifo_rate u16、旗標 u8 (IMU_AHRS / IMU_FIXED)、保留 u8
+#         回放要用同樣的 IMU 模式才能重建相同的姿態 (replay.py 依此建立 MPU6050)
+#   每筆紀錄: 種類 u8、長度 u8、ticks_us u32，接著 長度 bytes 的原始資料
+# ticks_us 會在 2^30 繞回，回放時以相鄰紀錄的 ticks_diff 累加還原時間
+MAGIC = b'TTUR\x03'
+IMU_AHRS = const(1)
+IMU_FIXED = const(2)
+_CFG = '<HBB'
+_CFG_LEN = const(4)
+REC_RADAR = const(1)     # LD2450 FIFO 原始位元組 (4 的倍數)
+REC_IMU = const(2)       # MPU6050 0x3B 起的 14 bytes
+REC_HAPTIC = const(3)    # 交給觸覺核心的 8 格序列
+REC_IMU_FIFO = const(4)  # MPU6050 FIFO 一次讀出的樣本，每筆 12 bytes
+REC_TICK = const(5)      # 邏輯週期開始 (無資料)
+_HDR = '<BBI'
+_HDR_LEN = const(6)
+_MAX_PAYLOAD = const(252)
+
+class Recorder:
+    # 計時器回呼裡只寫進 RAM 的雙緩衝區；寫檔由主迴圈呼叫 flush() 完成，不會卡住邏輯計時器
+    # imu：要錄的 mpu6050.MPU6050，它的 fifo_rate / ahrs / fixed 寫進檔頭
+    def __init__(self, path, buf_size=2048, max_bytes=1 << 20, imu=None):
+        self._bufs = (bytearray(buf_size), bytearray(buf_size))
+        self._act = 0
+        self._pos = 0
+        self._pending = -1
+        self._pending_len = 0
+        self.lost = 0          # 兩個緩衝區都滿而丟掉的紀錄
+        self.written = len(MAGIC) + _CFG_LEN
+        self.max_bytes = max_bytes
+        rate = flags = 0
+        if imu is not None:
+            rate = imu.fifo_rate
+            if imu.ahrs is not None: flags |= IMU_AHRS
+            if imu.fixed: flags |= IMU_FIXED
+        self._f = open(path, 'wb')
+        self._f.write(MAGIC)
+        self._f.write(struct.pack(_CFG, rate, flags, 0))
+
+    def _reserve(self, kind, n):
+        # 回傳可寫入資料的位置；沒有空間時回傳 -1
+        need = _HDR_LEN + n
+        buf = self._bufs[self._act]
+        if self._pos + need > len(buf):
+            if self._pending >= 0 or self._pos == 0:
+                self.lost += 1
+                return -1
+            self._pending, self._pending_len = self._act, self._pos
+            self._act ^= 1
+            self._pos = 0
+            buf = self._bufs[self._act]
+        struct.pack_into(_HDR, buf, self._pos, kind, n, time.ticks_us())
+        p = self._pos + _HDR_LEN
+        self._pos = p + n
+        return p
+
+    def log(self, kind, data):
+        # 超過一筆紀錄的長度上限就分成多筆 (_MAX_PAYLOAD 是 4 與 12 的倍數，不會切開樣本)
+        n = len(data)
+        s = 0
+        while True:
+            k = n - s if n - s <= _MAX_PAYLOAD else _MAX_PAYLOAD
+            p = self._reserve(kind, k)
+            if p < 0: return
+            buf = self._bufs[self._act]
+            for i in range(k): buf[p + i] = data[s + i]
+            s += k
+            if s >= n: return
+
+    def log_ring(self, kind, ring, start, n, mask):
+        # 從環形緩衝區複製 n bytes，太長就分成多筆
+        while n > 0:
+            k = n if n <= _MAX_PAYLOAD else _MAX_PAYLOAD
+            p = self._reserve(kind, k)
+            if p < 0: return
+            buf = self._bufs[self._act]
+            for i in range(k): buf[p + i] = ring[(start + i) & mask]
+            start += k
+            n -= k
+
+    def flush(self, force=False):
+        # 在主迴圈呼叫；force=True 連同正在寫的緩衝區一起寫出 (停止錄製時用)
+        if self._f is None: return
+        if self._pending >= 0:
+            self._write(self._bufs[self._pending], self._pending_len)
+            self._pending = -1
+        if force and self._pos:
+            self._write(self._bufs[self._act], self._pos)
+            self._pos = 0
+
+    def _write(self, buf, n):
+        if self.written + n > self.max_bytes:
+            self.close()
+            return
+        self._f.write(memoryview(buf)[:n])
+        self.written += n
+
+    def close(self):
+        if self._f is None: return
+        f, self._f = self._f, None
+        f.close()
+
+def _check(data):
+    if data[:4] != MAGIC[:4] or data[4] > MAGIC[4]: raise ValueError("not a TTUR capture")
+    return len(MAGIC) + (_CFG_LEN if data[4] >= 3 else 0)
+
+def read_header(path):
+    # 回傳 {'version', 'fifo_rate', 'ahrs', 'fixed'}；版本 3 以前沒有 IMU 設定，fifo_rate 為 None
+    with open(path, 'rb') as f:
+        data = f.read(len(MAGIC) + _CFG_LEN)
+    _check(data)
+    if data[4] < 3: return {'version': data[4], 'fifo_rate': None, 'ahrs': False, 'fixed': False}
+    rate, flags, _ = struct.unpack_from(_CFG, data, len(MAGIC))
+    return {'version': data[4], 'fifo_rate': rate, 'ahrs': bool(flags & IMU_AHRS), 'fixed': bool(flags & IMU_FIXED)}
+
+def read_records(path):
+    # 逐筆讀出 (種類, 從開頭起算的 us, 資料)
+    with open(path, 'rb') as f:
+        data = f.read()
+    p = _check(data)
+    t = last = None
+    while p + _HDR_LEN <= len(data):
+        kind, n, ticks = struct.unpack_from(_HDR, data, p)
+        p += _HDR_LEN
+        if p + n > len(data): break
+        t = 0 if last is None else t + time.ticks_diff(ticks, last)
+        last = ticks
+        yield kind, t, data[p:p + n]
+        p += n
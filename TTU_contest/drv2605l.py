@@ -1,20 +1,260 @@
 from machine import Pin, I2C
 
+# 暫存器位址與 adafruit_drv2605.py 的 _DRV2605_REG_* 相同 (const 的底線名稱在板子上無法跨模組匯入)
+_REG_MODE = 0x01
+_REG_RTPIN = 0x02
+_REG_WAVESEQ = 0x04   # 0x04 ~ 0x0B 八格波形序列
+_REG_GO = 0x0C
+_GO = b'\x01'
+_STOP = b'\x00'
+_MODE_INTTRIG = b'\x00'
+_MODE_REALTIME = b'\x05'
+
 class DRV2605L:
+    # play_sequence 記住上一次寫進晶片的序列，只把有變動的連續區段一次 auto-increment 寫出
+    # I2C 位元組數 (含位址與暫存器位元組) 記在 last_bytes / bus_bytes
     def __init__(self, i2c_bus=1, sda=14, scl=15):
         self.i2c = I2C(i2c_bus, sda=Pin(sda), scl=Pin(scl), freq=400000)
         self.addr = 0x5A
         self.active = False
+        self._buf = bytearray(8)
+        mv = memoryview(self._buf)
+        self._views = [[mv[lo:hi + 1] for hi in range(8)] for lo in range(8)]   # 預先切好，寫入時不配置
+        self._known = False     # _buf 是否與晶片內容一致 (寫入失敗後要整段重寫)
+        self.updates = 0
+        self.last_bytes = 0
+        self.bus_bytes = 0
+        self.rtp = False
+        self._rtp = bytearray(1)
+        self._go = bytearray(1)
         try:
-            self.i2c.writeto_mem(self.addr, 0x01, b'\x00') 
-            self.i2c.writeto_mem(self.addr, 0x03, b'\x01') 
+            self.i2c.writeto_mem(self.addr, 0x01, b'\x00')
+            self.i2c.writeto_mem(self.addr, 0x03, b'\x01')
             self.active = True
         except: pass
 
     def play_sequence(self, effects):
         if not self.active: return
+        buf = self._buf
+        lo, hi = 8, -1
+        if self._known:
+            for i in range(8):
+                if buf[i] != effects[i]:
+                    if i < lo: lo = i
+                    hi = i
+                    buf[i] = effects[i]
+        else:
+            for i in range(8): buf[i] = effects[i]
+            lo, hi = 0, 7
+        n = 3                   # GO：位址 + 暫存器 + 1 byte
+        try:
+            if hi >= 0:
+                self.i2c.writeto_mem(self.addr, _REG_WAVESEQ + lo, self._views[lo][hi])
+                n += 2 + hi - lo + 1
+            self.i2c.writeto_mem(self.addr, _REG_GO, _GO)
+            self._known = True
+        except:
+            self._known = False
+        self.updates += 1
+        self.last_bytes = n
+        self.bus_bytes += n
+
+    def stop(self):
+        # GO=0：立刻停止正在播的序列
+        if not self.active: return
+        try:
+            self.i2c.writeto_mem(self.addr, _REG_GO, _STOP)
+            self.bus_bytes += 3
+        except: pass
+
+    def playing(self):
+        # 讀 GO 位元：序列播完後晶片會自己清除；讀取失敗當作已播完，避免排程卡住
+        if not self.active: return False
+        try:
+            self.i2c.readfrom_mem_into(self.addr, _REG_GO, self._go)
+            self.bus_bytes += 4
+        except: return False
+        return self._go[0] & 1 == 1
+
+    def rtp_start(self):
+        # 切到即時播放模式，RTPIN 先歸零；之後用 rtp_write 改變振幅
+        if not self.active: return
+        try:
+            self.i2c.writeto_mem(self.addr, _REG_RTPIN, b'\x00')
+            self.i2c.writeto_mem(self.addr, _REG_MODE, _MODE_REALTIME)
+            self.rtp = True
+            self._rtp[0] = 0
+        except: pass
+
+    def rtp_write(self, amp):
+        # amp：0 ~ 127 (有號格式的正半邊)
+        if not self.rtp: return
+        self._rtp[0] = amp
+        try:
+            self.i2c.writeto_mem(self.addr, _REG_RTPIN, self._rtp)
+            self.last_bytes = 3
+            self.bus_bytes += 3
+        except: pass
+
+    def rtp_stop(self):
+        # 回到內部觸發模式，序列快取不受影響
+        if not self.rtp: return
+        self.rtp = False
+        try:
+            self.i2c.writeto_mem(self.addr, _REG_RTPIN, b'\x00')
+            self.i2c.writeto_mem(self.addr, _REG_MODE, _MODE_INTTRIG)
+        except: pass
+
+class TCA9548A:
+    # I2C 多工器：控制 byte 是通道位元遮罩，可以同時打開好幾個通道 (之後的寫入會廣播到每一個通道)
+    # 記住目前的遮罩，相同就不重送；傳輸失敗後狀態未知，下次一定重送
+    def __init__(self, i2c, addr=0x70):
+        self.i2c = i2c
+        self.addr = addr
+        self._mask = -1
+        self._cmd = bytearray(1)
+        self.selects = 0
+        self.bus_bytes = 0
+
+    def select(self, mask):
+        if mask == self._mask: return
+        self._cmd[0] = mask
+        try:
+            self.i2c.writeto(self.addr, self._cmd)
+            self._mask = mask
+        except:
+            self._mask = -1
+            raise
+        self.selects += 1
+        self.bus_bytes += 2
+
+class DRV2605Array:
+    # 每個方向一顆 DRV2605L (位址都是 0x5A)，接在 TCA9548A 的不同通道上
+    # play(seqs) 一次更新全部馬達：每個通道只寫第一個變動格到 GO (0x04 ~ 0x0C 連續，一段 auto-increment 寫完)，
+    # 要寫的內容完全相同的通道合成一個遮罩廣播，所以同一等級的方向只花一次傳輸
+    # 序列沒變的通道不寫也不重新觸發 (不會把播到一半的序列從頭開始)；何時重播由 haptic_sched.ArrayScheduler 決定
+    def __init__(self, i2c_bus=1, sda=14, scl=15, channels=(0, 1, 2), mux_addr=0x70):
+        self.i2c = I2C(i2c_bus, sda=Pin(sda), scl=Pin(scl), freq=400000)
+        self.mux = TCA9548A(self.i2c, mux_addr)
+        self.addr = 0x5A
+        self.channels = channels
+        self.n = len(channels)
+        self._bufs = []
+        self._views = []
+        for _ in channels:
+            b = bytearray(9)
+            b[8] = 1            # 最後一格就是 GO 暫存器
+            mv = memoryview(b)
+            self._bufs.append(b)
+            self._views.append([mv[lo:] for lo in range(9)])
+        self._known = [False] * self.n
+        self._lo = bytearray(self.n)
+        self._go = bytearray(1)
+        self.active = False
+        self.updates = 0
+        self.last_bytes = 0
+        self.bus_bytes = 0
+        all_mask = 0
+        for ch in channels: all_mask |= 1 << ch
+        try:
+            # 初始化也一起廣播：MODE=內部觸發、LIBRARY=1 (ERM)
+            self.mux.select(all_mask)
+            self.i2c.writeto_mem(self.addr, 0x01, b'\x00')
+            self.i2c.writeto_mem(self.addr, 0x03, b'\x01')
+            self.active = True
+        except: pass
+
+    def play(self, seqs, go=None):
+        # seqs[k]：第 k 個通道的 8 格序列
+        # go：要觸發的通道 (第 k 個位元 = 第 k 個通道)；None = 只觸發序列有變動的通道
+        # 在 go 裡但序列沒變的通道只寫 GO 一個 byte (重播)；不在 go 裡的通道完全不碰
+        if not self.active: return
+        n = self.n
+        lo = self._lo
+        skip = 0
+        for k in range(n):
+            if go is not None and not go >> k & 1:
+                skip |= 1 << k
+                continue
+            buf = self._bufs[k]
+            s = seqs[k]
+            first = 8
+            if self._known[k]:
+                for i in range(8):
+                    if buf[i] != s[i]:
+                        if i < first: first = i
+                        buf[i] = s[i]
+            else:
+                for i in range(8): buf[i] = s[i]
+                first = 0
+            if first == 8 and go is None: skip |= 1 << k
+            lo[k] = first
+        if skip == (1 << n) - 1:
+            self.last_bytes = 0
+            return
+        mux0 = self.mux.bus_bytes
+        nb = 0
+        done = skip
+        for k in range(n):
+            if done >> k & 1: continue
+            l = lo[k]
+            a = self._bufs[k]
+            group = 1 << k
+            mask = 1 << self.channels[k]
+            for j in range(k + 1, n):
+                if done >> j & 1 or lo[j] != l: continue
+                b = self._bufs[j]
+                same = True
+                for i in range(l, 8):
+                    if a[i] != b[i]:
+                        same = False
+                        break
+                if same:
+                    group |= 1 << j
+                    mask |= 1 << self.channels[j]
+            done |= group
+            try:
+                self.mux.select(mask)
+                self.i2c.writeto_mem(self.addr, _REG_WAVESEQ + l, self._views[k][l])
+                nb += 2 + 9 - l
+                for j in range(n):
+                    if group >> j & 1: self._known[j] = True
+            except:
+                for j in range(n):
+                    if group >> j & 1: self._known[j] = False
+        nb += self.mux.bus_bytes - mux0     # 選通道：位址 + 控制 byte
+        self.updates += 1
+        self.last_bytes = nb
+        self.bus_bytes += nb
+
+    def play_state(self, table, state):
+        # table：patterns.ArrayPatternTable
+        self.play(table.seqs[state])
+
+    def playing(self, k):
+        # 第 k 個通道的 GO 位元；讀取失敗當作已播完 (與 DRV2605L.playing 相同)
+        if not self.active: return False
+        mux0 = self.mux.bus_bytes
         try:
-            for i, eff in enumerate(effects):
-                self.i2c.writeto_mem(self.addr, 0x04 + i, bytes([eff]))
-            self.i2c.writeto_mem(self.addr, 0x0C, b'\x01')
-        except: pass
\ No newline at end of file
+            self.mux.select(1 << self.channels[k])
+            self.i2c.readfrom_mem_into(self.addr, _REG_GO, self._go)
+            self.bus_bytes += 4
+            on = self._go[0] & 1 == 1
+        except: on = False
+        self.bus_bytes += self.mux.bus_bytes - mux0
+        return on
+
+    def stop(self, chans=None):
+        # chans：要停的通道 (第 k 個位元 = 第 k 個通道)，None = 全部；一起 GO=0
+        if not self.active: return
+        m = 0
+        for k in range(self.n):
+            if chans is None or chans >> k & 1: m |= 1 << self.channels[k]
+        if not m: return
+        mux0 = self.mux.bus_bytes
+        try:
+            self.mux.select(m)
+            self.i2c.writeto_mem(self.addr, _REG_GO, _STOP)
+            self.bus_bytes += 3
+        except: pass
+        self.bus_bytes += self.mux.bus_bytes - mux0
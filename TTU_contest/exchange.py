@@ -0,0 +1,56 @@
+from array import array
+
+# 兩個核心之間的單一生產者 / 單一消費者交換：雙緩衝 + 序號 (seqlock)，兩邊都不等鎖
+# 序號是偶數時沒有寫入進行中；生產者寫入時先 +1 (奇數)、寫進「後面」那一格、再 +1 發佈
+# 消費者讀「前面」那一格 (序號 >> 1 的奇偶)：生產者只有在讀取期間又發佈一次以上才會寫到同一格，
+# 這時讀取前後的序號差會超過容許範圍，消費者重讀即可 (生產者最快 10 ms 才發佈一次，實際上幾乎不重讀)
+# 序號在 2^29 繞回 (2^29 是 4 的倍數，奇偶與前後格都接得上)，+1 之後也還是 small int；序號一律比較遮罩後的差
+
+_MASK = 0x1FFFFFFF
+
+class SeqBox:
+    # n 個欄位的固定大小紀錄 (typecode 同 array)，發佈與讀取都不配置記憶體
+    def __init__(self, n, typecode='i'):
+        self.n = n
+        self._bufs = (array(typecode, [0] * n), array(typecode, [0] * n))
+        self._seq = 0          # 0 ~ _MASK：姿態每 10 ms 發佈一次 (加 2)，約 31 天繞回一次
+        self._last = 0         # 消費者上一次讀到的序號
+        self.published = 0
+        self.retries = 0       # 讀到一半被覆寫而重讀的次數
+        self.missed = 0        # 還沒讀就被新紀錄取代
+
+    # --- 生產者 (核心 0) ---
+    def begin(self):
+        # 回傳要填的後面那一格；填好後呼叫 commit()
+        s = (self._seq + 1) & _MASK
+        self._seq = s
+        return self._bufs[((s >> 1) + 1) & 1]
+
+    def commit(self):
+        self._seq = (self._seq + 1) & _MASK
+        self.published += 1
+
+    def publish(self, *fields):
+        # 方便用：欄位依序寫入 (呼叫端的 tuple 會配置記憶體，熱路徑請用 begin / commit)
+        buf = self.begin()
+        for i in range(len(fields)): buf[i] = fields[i]
+        self.commit()
+
+    # --- 消費者 (核心 1) ---
+    def read(self, out):
+        # 有新紀錄時複製到 out 並回傳 True；沒有新紀錄回傳 False，不會等待
+        n = self.n
+        while True:
+            s1 = self._seq
+            if s1 & ~1 == self._last: return False
+            buf = self._bufs[(s1 >> 1) & 1]
+            for i in range(n): out[i] = buf[i]
+            s2 = self._seq
+            # 生產者從 (s1 & ~1) + 3 起才會寫到這一格
+            if (s2 - (s1 & ~1)) & _MASK < 3: break
+            self.retries += 1
+        s1 &= ~1
+        d = (s1 - self._last) & _MASK
+        if d > 2: self.missed += d // 2 - 1
+        self._last = s1
+        return True
@@ -0,0 +1,134 @@
+from array import array
+import math
+
+# 預先計算的幾何運算：判斷方向、距離等級與傾斜補償都不需要 sqrt / atan2 / cos / sin
+# (RP2040 沒有 FPU，這裡是最熱的算術路徑)
+
+# 方向：以 +y 為正前方，左右各 15° 以外、165° 以內分別是左 / 右，其餘是中
+# tan(15°) ≈ 1060 / 3956，只用外積的正負號，所以不需要正規化
+_S15 = 1060
+_C15 = 3956
+
+def sector(x, y):
+    # 0 左、1 中、2 右，與 180 - degrees(atan2(x, y)) 的判斷相同
+    a = x * _C15
+    b = y * _S15
+    if a >= b and a > -b: return 0
+    if -a >= b and -a > -b: return 2
+    return 1
+
+def limits_sq(limits):
+    # 距離門檻 (mm) 預先平方
+    return tuple(d * d for d in limits)
+
+def bucket(d2, limits2):
+    # 以距離平方比較門檻，回傳第幾個等級 (0 最近)
+    i = 0
+    for lim in limits2:
+        if d2 < lim: return i
+        i += 1
+    return i
+
+# 傾斜補償：0~90° 每 0.25° 一格的 sin 查表 (Q14)
+Q = 14
+_STEPS = 4
+_IDX = _STEPS * 180 / math.pi
+_SIN = array('h', [int(round(math.sin(math.radians(i / _STEPS)) * (1 << Q))) for i in range(90 * _STEPS + 1)])
+_TOP = 90 * _STEPS
+
+def sin_q(a):
+    # a 為弧度，回傳 Q14 的 sin；超出 ±90° 時夾在 ±90°
+    i = int(abs(a) * _IDX + 0.5)
+    if i > _TOP: i = _TOP
+    return -_SIN[i] if a < 0 else _SIN[i]
+
+def cos_q(a):
+    i = int(abs(a) * _IDX + 0.5)
+    if i > _TOP: i = _TOP
+    return _SIN[_TOP - i]
+
+# 定點版：輸入 Q16 弧度整數，輸出同樣是 Q14；917 / 2^18 ≈ _IDX / 65536
+def sin_q16(a):
+    i = ((a if a >= 0 else -a) * 917 + (1 << 17)) >> 18
+    if i > _TOP: i = _TOP
+    return -_SIN[i] if a < 0 else _SIN[i]
+
+def cos_q16(a):
+    i = ((a if a >= 0 else -a) * 917 + (1 << 17)) >> 18
+    if i > _TOP: i = _TOP
+    return _SIN[_TOP - i]
+
+# 定點反正切：比值 0~1 (0~45°) 每 1/256 一格的 atan 查表 (Q16 弧度)，格間線性內插
+_ATAN = array('H', [int(round(math.atan(i / 256) * 65536)) for i in range(257)])
+_HALF_PI_Q16 = 102944
+_PI_Q16 = 205887
+
+def atan2_q(y, x):
+    # 只用整數，回傳 Q16 弧度 (-π ~ π]；|x|、|y| 必須小於 2^14
+    ax = x if x >= 0 else -x
+    ay = y if y >= 0 else -y
+    if ay <= ax:
+        if not ax: return 0
+        z = (ay << 16) // ax
+    else: z = (ax << 16) // ay
+    i = z >> 8
+    a = _ATAN[i]
+    if i < 256: a += ((_ATAN[i + 1] - a) * (z & 255)) >> 8
+    if ay > ax: a = _HALF_PI_Q16 - a
+    if x < 0: a = _PI_Q16 - a
+    return -a if y < 0 else a
+
+def hypot_q(x, y):
+    # 整數 sqrt(x² + y²)：先用 max + 3/8 min 估計 (誤差 < 7%)，再做兩次 Newton
+    if x < 0: x = -x
+    if y < 0: y = -y
+    n = x * x + y * y
+    r = x + ((y * 3) >> 3) if x >= y else y + ((x * 3) >> 3)
+    if not r: return 0
+    r = (r + n // r) >> 1
+    return (r + n // r) >> 1
+
+class Tilt:
+    # 俯仰 / 翻滾的 Q14 cos/sin 快取，只有角度變化超過 tol (弧度) 才重新查表
+    # fixed=True 時 update() 收 Q16 弧度整數 (MPU6050(fixed=True) 的 pitch_q / roll_q)
+    def __init__(self, tol=0.005, fixed=False):
+        self.fixed = fixed
+        self.tol = int(tol * 65536) if fixed else tol
+        self.cp = self.cr = 1 << Q
+        self.sp = self.sr = 0
+        self._p = self._r = 0 if fixed else 0.0
+
+    def update(self, pitch, roll):
+        if -self.tol <= pitch - self._p <= self.tol and -self.tol <= roll - self._r <= self.tol:
+            return False
+        self._p, self._r = pitch, roll
+        if self.fixed:
+            self.cp, self.sp = cos_q16(pitch), sin_q16(pitch)
+            self.cr, self.sr = cos_q16(roll), sin_q16(roll)
+            return True
+        self.cp, self.sp = cos_q(pitch), sin_q(pitch)
+        self.cr, self.sr = cos_q(roll), sin_q(roll)
+        return True
+
+# 高度閘：LD2450 只回報雷達平面上的 (x, y)，傾斜之後平面上的點離地高度各不相同
+# 與 Tilt 相同的旋轉 (pitch 正 = 雷達朝上)：z = x·sin(roll) + y·sin(pitch)·cos(roll)，離地高度 = 安裝高度 + z
+# 低於 lo 的多半是地面反射，高於 hi 的在頭頂以上，兩者都不會撞到
+def height(x, y, sp, cr, sr, mount):
+    # 浮點版本 (sp / cr / sr 為 sin / cos 值)：只有四則運算，電腦上可以整批丟 numpy 陣列進來調參數
+    return mount + x * sr + y * sp * cr
+
+class HeightGate:
+    # mount：雷達離地高度 (mm)；保留離地 lo ~ hi (mm) 的偵測點
+    # LD2450 解碼時以 Tilt 的 Q14 sin / cos 算 z，直接與 zlo / zhi 比較 (不需要加回安裝高度)
+    def __init__(self, mount=900, lo=150, hi=2000):
+        self.mount, self.lo, self.hi = mount, lo, hi
+        self.zlo, self.zhi = lo - mount, hi - mount
+        self.passed = 0
+        self.floor = 0       # 低於 lo 而丟掉的偵測點
+        self.overhead = 0    # 高於 hi 而丟掉的偵測點
+
+    def counts(self):
+        return {'passed': self.passed, 'floor': self.floor, 'overhead': self.overhead}
+
+    def clear(self):
+        self.passed = self.floor = self.overhead = 0
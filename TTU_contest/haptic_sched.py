@@ -0,0 +1,112 @@
+import time
+from latency import GO
+
+# 核心 1 的觸覺排程：每個待播序列帶緊急程度 (0 遠 ~ levels-1 最近)
+# 播放中收到更緊急的序列就 GO=0 → 改寫 → GO=1 搶先播放；否則等晶片自己清掉 GO 位元 (序列播完) 再播
+# 取代固定 1800 ms 的冷卻計時器；只有在有待播序列時才讀 GO 位元
+class HapticScheduler:
+    def __init__(self, drv, levels=3):
+        self.drv = drv
+        self._seq = bytearray(8)
+        self._pending = False
+        self._urg = 0
+        self._t = 0            # 待播序列的起點時間 (ticks_us；main.py 傳入雷達封包抵達時間)
+        self.running = -1      # 播放中序列的緊急程度，-1 = 沒有在播
+        self.plays = 0
+        self.preemptions = 0
+        self.superseded = 0    # 還沒播就被新的序列取代
+        # 各緊急程度從 t_us 到 GO 的延遲 (us)；hist 是 latency.LatencyHist (核心 1) 時另外記進直方圖
+        self.hist = None
+        self.lat_n = [0] * levels
+        self.lat_sum = [0] * levels
+        self.lat_max = [0] * levels
+
+    def submit(self, seq, urgency, t_us):
+        # 由核心 1 在讀到新紀錄後呼叫 (main.py 的 SeqBox)；只複製，不碰 I2C
+        if self._pending: self.superseded += 1
+        s = self._seq
+        for i in range(8): s[i] = seq[i]
+        self._urg = urgency
+        self._t = t_us
+        self._pending = True
+
+    def poll(self):
+        if not self._pending: return
+        drv = self.drv
+        if self.running >= 0:
+            if drv.playing():
+                if self._urg <= self.running: return
+                drv.stop()
+                self.preemptions += 1
+        drv.play_sequence(self._seq)
+        self._pending = False
+        u = self._urg
+        self.running = u
+        self.plays += 1
+        lat = time.ticks_diff(time.ticks_us(), self._t)
+        self.lat_n[u] += 1
+        self.lat_sum[u] += lat
+        if lat > self.lat_max[u]: self.lat_max[u] = lat
+        if self.hist is not None: self.hist.record(GO, self._t)
+
+    def stats(self):
+        # 各緊急程度的 (次數, 平均 ms, 最大 ms)，給除錯輸出用
+        return {'plays': self.plays, 'preemptions': self.preemptions, 'superseded': self.superseded,
+                'latency_ms': [(n, s / n / 1000 if n else 0.0, m / 1000)
+                               for n, s, m in zip(self.lat_n, self.lat_sum, self.lat_max)]}
+
+class ArrayScheduler:
+    # drv2605l.DRV2605Array 的排程：規則與 HapticScheduler 相同，但每個通道 (方向) 各自判斷
+    # 通道正在播且新序列不比較緊急就等它播完；播完 (GO 清除) 或更緊急 (先 GO=0) 才觸發
+    # 同一輪要觸發的通道交給 DRV2605Array.play 一起寫 (只寫變動的格，內容相同的通道廣播)，其餘通道不碰
+    def __init__(self, arr, levels=3):
+        n = arr.n
+        self.arr = arr
+        self.n = n
+        self._seqs = [bytearray(8) for _ in range(n)]
+        self._urg = bytearray(n)
+        self._pending = 0      # 有待播序列的通道 (位元遮罩)
+        self._t = 0
+        self.running = [-1] * n
+        self.plays = 0         # 觸發過的通道次數
+        self.preemptions = 0
+        self.superseded = 0
+        self.hist = None       # latency.LatencyHist (核心 1)：每一輪觸發記一次 GO
+
+    def submit(self, seqs, urgencies, t_us):
+        # seqs / urgencies：patterns.ArrayPatternTable 的 seqs[state] / urgencies[state]
+        for k in range(self.n):
+            if self._pending >> k & 1: self.superseded += 1
+            d, s = self._seqs[k], seqs[k]
+            for i in range(8): d[i] = s[i]
+            self._urg[k] = urgencies[k]
+        self._pending = (1 << self.n) - 1
+        self._t = t_us
+
+    def poll(self):
+        p = self._pending
+        if not p: return
+        arr = self.arr
+        go = stop = 0
+        for k in range(self.n):
+            if not p >> k & 1: continue
+            r = self.running[k]
+            if r >= 0 and arr.playing(k):
+                if self._urg[k] <= r: continue
+                stop |= 1 << k
+            go |= 1 << k
+        if not go: return
+        if stop:
+            arr.stop(stop)
+            for k in range(self.n):
+                if stop >> k & 1: self.preemptions += 1
+        arr.play(self._seqs, go)
+        for k in range(self.n):
+            if go >> k & 1:
+                self.running[k] = self._urg[k]
+                self.plays += 1
+        self._pending = p & ~go
+        if self.hist is not None: self.hist.record(GO, self._t)
+
+    def stats(self):
+        return {'plays': self.plays, 'preemptions': self.preemptions, 'superseded': self.superseded}
@@ -0,0 +1,389 @@
+# 主機端 (Linux / CPython) 假硬體
+# 先呼叫 install()，再 import 驅動模組，就能在電腦上跑基準測試與回放
+import sys
+import time
+import types
+import ctypes
+from collections import deque
+
+_T0 = time.perf_counter_ns()
+_virtual = None
+
+def set_time_us(t):
+    # 回放時改用虛擬時鐘 (us)；None 恢復真實時間
+    global _virtual
+    _virtual = t
+
+def ticks_us():
+    if _virtual is not None: return _virtual & 0x3FFFFFFF
+    return ((time.perf_counter_ns() - _T0) // 1000) & 0x3FFFFFFF
+
+def ticks_ms():
+    if _virtual is not None: return (_virtual // 1000) & 0x3FFFFFFF
+    return ((time.perf_counter_ns() - _T0) // 1000000) & 0x3FFFFFFF
+
+def sleep_ms(ms):
+    # 虛擬時鐘下直接往前推，不真的等待
+    global _virtual
+    if _virtual is not None: _virtual += ms * 1000
+    else: time.sleep(ms / 1000)
+
+def ticks_diff(a, b): return ((a - b + 0x20000000) & 0x3FFFFFFF) - 0x20000000
+def ticks_add(a, b): return (a + b) & 0x3FFFFFFF
+
+# --- rp2 ---
+class PIO:
+    SHIFT_LEFT = 0
+    SHIFT_RIGHT = 1
+    JOIN_NONE = 0
+    JOIN_TX = 1
+    JOIN_RX = 2
+
+def asm_pio(**kw):
+    return lambda f: f
+
+class StateMachine:
+    # PIO 狀態機替身：feed() 送進的位元組以每 4 bytes 一個字組推入 RX FIFO
+    instances = {}
+
+    def __init__(self, sm_id, prog=None, freq=0, **kw):
+        self.id = sm_id
+        self.fifo = deque()
+        self.depth = None      # None = 無上限；設 8 可模擬真實 RX FIFO
+        self.overflow = 0
+        self._part = bytearray()
+        StateMachine.instances[sm_id] = self
+
+    def active(self, v=None): return 1
+
+    def feed(self, data):
+        self._part.extend(data)
+        n = len(self._part) & ~3
+        for i in range(0, n, 4):
+            if self.depth is not None and len(self.fifo) >= self.depth:
+                self.overflow += 1
+                continue
+            self.fifo.append(int.from_bytes(self._part[i:i + 4], 'little'))
+        del self._part[:n]
+
+    def rx_fifo(self): return len(self.fifo)
+
+    def get(self, buf=None, shift=0):
+        if buf is None: return self.fifo.popleft() >> shift
+        for i in range(len(buf)): buf[i] = self.fifo.popleft() >> shift
+
+def _rx_fifo_addr(sm_id):
+    # RP2040 記憶體映射：PIO0 / PIO1 的 RXF0 在 0x50200020 / 0x50300020
+    return (0x50300000 if sm_id >= 4 else 0x50200000) + 0x20 + 4 * (sm_id & 3)
+
+class DMA:
+    # DMA 替身：讀取 count / write 時，把來源 FIFO 現有的字組寫到目的位址 (真實的主機記憶體位址)
+    def __init__(self):
+        self._on = False
+        self._count = 0
+        self._src = self._dst = 0
+        self._ctrl = {}
+
+    def pack_ctrl(self, **kw): return kw
+
+    def config(self, read=None, write=None, count=None, ctrl=None, trigger=False):
+        self._src, self._dst, self._count = read, write, count
+        self._ctrl = ctrl or {}
+        self._on = bool(trigger)
+
+    def active(self, v=None):
+        if v is None: return self._on
+        self._on = bool(v)
+
+    @property
+    def count(self):
+        self._run()
+        return self._count
+
+    @property
+    def write(self):
+        self._run()
+        return self._dst
+
+    def _run(self):
+        if not self._on: return
+        sm = None
+        for s in StateMachine.instances.values():
+            if _rx_fifo_addr(s.id) == self._src: sm = s
+        if sm is None: return
+        ring = self._ctrl.get('ring_size', 0)
+        size = 1 << ring if ring and self._ctrl.get('ring_sel') else 0
+        while self._count and sm.fifo:
+            ctypes.memmove(self._dst, sm.fifo.popleft().to_bytes(4, 'little'), 4)
+            nxt = self._dst + 4
+            if size: nxt = (self._dst & ~(size - 1)) | (nxt & (size - 1))
+            self._dst = nxt
+            self._count -= 1
+        if not self._count: self._on = False
+
+# --- machine ---
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    instances = {}
+
+    def __init__(self, id, mode=-1, pull=-1):
+        self.id = id
+        self._v = 0
+        self._handler = None
+        Pin.instances[id] = self
+
+    def value(self, v=None):
+        if v is None: return self._v
+        self._v = v
+
+    def irq(self, handler=None, trigger=0, hard=False): self._handler = handler
+
+    def fire(self):
+        # 假中斷來源：模擬一次上升緣
+        self._v = 1
+        if self._handler is not None: self._handler(self)
+        self._v = 0
+
+class I2C:
+    # I2C 替身：transaction 轉給 I2C.devices[(bus, addr)] 的假裝置，沒有裝置就 ENODEV
+    # 找不到直接掛在匯流排上的裝置時，交給同一條匯流排上 FakeTCA9548A 目前選取的通道；
+    # 多個通道同時選取時寫入會廣播到每一顆，讀取則以第一顆為準
+    devices = {}
+
+    def __init__(self, id, sda=None, scl=None, freq=400000):
+        self.id = id
+
+    def _devs(self, addr):
+        dev = I2C.devices.get((self.id, addr))
+        if dev is not None: devs = [dev]
+        else:
+            devs = []
+            for (bus, _), mux in list(I2C.devices.items()):
+                if bus == self.id and isinstance(mux, FakeTCA9548A): devs += mux.route(addr)
+            if not devs: raise OSError(19)
+        for dev in devs:
+            if dev.fail:
+                # 模擬匯流排雜訊：接下來 fail 次 transaction 失敗
+                dev.fail -= 1
+                raise OSError(5)
+        return devs
+
+    def _dev(self, addr): return self._devs(addr)[0]
+
+    def writeto(self, addr, buf):
+        dev = self._dev(addr)
+        dev.count(1 + len(buf))
+        dev.command(bytes(buf))
+
+    def writeto_mem(self, addr, reg, buf):
+        for i, dev in enumerate(self._devs(addr)):
+            if not i: dev.count(2 + len(buf))
+            dev.write(reg, bytes(buf))
+
+    def readfrom_mem(self, addr, reg, n):
+        dev = self._dev(addr)
+        dev.count(3 + n)
+        return dev.read(reg, n)
+
+    def readfrom_mem_into(self, addr, reg, buf):
+        dev = self._dev(addr)
+        dev.count(3 + len(buf))
+        buf[:] = dev.read(reg, len(buf))
+
+class RegDevice:
+    # 以 256 bytes 暫存器檔模擬的 I2C 裝置，位址自動遞增
+    def __init__(self):
+        self.regs = bytearray(256)
+        self.fail = 0
+        self.transactions = 0
+        self.bus_bytes = 0     # 位址、暫存器與資料位元組 (讀取多一個重複起始的位址)
+
+    def count(self, n):
+        self.transactions += 1
+        self.bus_bytes += n
+
+    def write(self, reg, data): self.regs[reg:reg + len(data)] = data
+    def read(self, reg, n): return bytes(self.regs[reg:reg + n])
+
+class FakeMPU6050(RegDevice):
+    # push() 排入的 14 bytes 會在下一次讀 0x3B 時出現
+    # FIFO：USER_CTRL (0x6A) 的 FIFO_EN / FIFO_RESET、FIFO_COUNT (0x72)、FIFO_R_W (0x74)
+    # 與溢位時 INT_STATUS (0x3A) 的 FIFO_OFLOW；超過 1024 bytes 時像真的晶片一樣覆蓋最舊的資料
+    # push_ready()：更新資料暫存器並在 INT_ENABLE (0x38) 開啟時拉動 int_pin
+    FIFO_SIZE = 1024
+
+    def __init__(self):
+        super().__init__()
+        self.bursts = deque()
+        self.fifo = bytearray()
+        self.int_pin = None    # host_fakes.Pin，接到驅動程式設定的 INT 腳
+
+    def push(self, burst): self.bursts.append(bytes(burst))
+
+    def push_fifo(self, data):
+        if not self.regs[0x6A] & 0x40: return
+        self.fifo.extend(data)
+        if len(self.fifo) > self.FIFO_SIZE:
+            del self.fifo[:len(self.fifo) - self.FIFO_SIZE]
+            self.regs[0x3A] |= 0x10
+
+    def push_sample(self, ax, ay, az, gx, gy, gz):
+        self.push_fifo(b''.join(v.to_bytes(2, 'big', signed=True) for v in (ax, ay, az, gx, gy, gz)))
+
+    def push_ready(self, ax, ay, az, gx, gy, gz):
+        # 新樣本進資料暫存器 (0x3B)；DATA_RDY_EN 開啟且接了 int_pin 時觸發中斷
+        self.regs[0x3B:0x3B + 14] = b''.join(v.to_bytes(2, 'big', signed=True) for v in (ax, ay, az, 0, gx, gy, gz))
+        if self.regs[0x38] & 0x01 and self.int_pin is not None: self.int_pin.fire()
+
+    def write(self, reg, data):
+        super().write(reg, data)
+        if reg == 0x6A and data[0] & 0x04:
+            self.fifo = bytearray()
+            self.regs[0x6A] &= ~0x04
+
+    def read(self, reg, n):
+        if reg == 0x3B and self.bursts: self.regs[0x3B:0x3B + 14] = self.bursts.popleft()
+        if reg == 0x72:
+            c = len(self.fifo)
+            return bytes((c >> 8, c & 0xFF))[:n]
+        if reg == 0x74:
+            out = bytes(self.fifo[:n]) + bytes(max(0, n - len(self.fifo)))
+            del self.fifo[:n]
+            return out
+        if reg == 0x3A:
+            out = super().read(reg, n)
+            self.regs[0x3A] &= ~0x10
+            return out
+        return super().read(reg, n)
+
+class FakeDRV2605(RegDevice):
+    # DRV2605 替身：STATUS 的裝置 ID 為 7 (DRV2605L)；每次寫入以 (ticks_us, 暫存器, 資料) 記在 log
+    # GO (0x0C) 寫 1 後依序列長度自動清除：每個效果 EFFECT_MS，暫停格 (bit7) 為 (值 & 0x7F) × 10 ms；寫 0 立即停止
+    EFFECT_MS = 200
+
+    def __init__(self):
+        super().__init__()
+        self.regs[0x00] = 7 << 5
+        self.log = []
+        self._end = None
+
+    def write(self, reg, data):
+        super().write(reg, data)
+        self.log.append((ticks_us(), reg, bytes(data)))
+        if reg <= 0x0C < reg + len(data):
+            if self.regs[0x0C] & 1:
+                ms = 0
+                for v in self.regs[0x04:0x0C]:
+                    if not v: break
+                    ms += (v & 0x7F) * 10 if v & 0x80 else self.EFFECT_MS
+                self._end = ticks_us() + ms * 1000
+            else: self._end = None
+
+    def read(self, reg, n):
+        if self._end is not None and ticks_diff(ticks_us(), self._end) >= 0:
+            self.regs[0x0C] &= ~1
+            self._end = None
+        return super().read(reg, n)
+
+class FakeTCA9548A(RegDevice):
+    # TCA9548A 多工器替身：writeto 的最後一個 byte 是通道遮罩；channels[ch] 是 {位址: 假裝置}
+    def __init__(self):
+        super().__init__()
+        self.mask = 0
+        self.channels = [{} for _ in range(8)]
+        self.selects = 0
+
+    def command(self, data):
+        self.mask = data[-1]
+        self.selects += 1
+
+    def route(self, addr):
+        return [ch[addr] for i, ch in enumerate(self.channels) if self.mask >> i & 1 and addr in ch]
+
+class UART:
+    # 硬體 UART 替身：feed() 的資料進入 rxbuf (滿了就丟並計數)，然後像 IRQ_RXIDLE 一樣呼叫 handler
+    IRQ_RXIDLE = 4096
+
+    def __init__(self, id, baudrate=9600, tx=None, rx=None, rxbuf=256, timeout=0, **kw):
+        self.id = id
+        self.rxbuf = rxbuf
+        self._rx = bytearray()
+        self.overflow = 0
+        self._handler = None
+
+    def irq(self, handler=None, trigger=0, hard=False): self._handler = handler
+
+    def feed(self, data):
+        room = self.rxbuf - len(self._rx)
+        self.overflow += max(0, len(data) - room)
+        self._rx.extend(data[:max(0, room)])
+        if self._handler is not None: self._handler(self)
+
+    def any(self): return len(self._rx)
+
+    def readinto(self, buf, nbytes=None):
+        n = min(len(buf) if nbytes is None else nbytes, len(self._rx))
+        if not n: return None
+        buf[:n] = self._rx[:n]
+        del self._rx[:n]
+        return n
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1): pass
+    def init(self, **kw): pass
+    def deinit(self): pass
+
+_scheduled = deque()
+SCHEDULE_DEPTH = 8
+
+def schedule(func, arg):
+    # micropython.schedule 替身：與板子上一樣最多排 8 個，由 run_scheduled() (或 idle()) 執行
+    if len(_scheduled) >= SCHEDULE_DEPTH: raise RuntimeError("schedule queue full")
+    _scheduled.append((func, arg))
+
+def run_scheduled():
+    n = 0
+    while _scheduled:
+        func, arg = _scheduled.popleft()
+        func(arg)
+        n += 1
+    return n
+
+def idle(): run_scheduled()
+
+def const(x): return x
+
+def install():
+    if 'machine' in sys.modules: return
+    for name in ('ticks_us', 'ticks_ms', 'ticks_diff', 'ticks_add', 'sleep_ms'):
+        if not hasattr(time, name): setattr(time, name, globals()[name])
+    rp2 = types.ModuleType('rp2')
+    rp2.PIO, rp2.asm_pio, rp2.StateMachine, rp2.DMA = PIO, asm_pio, StateMachine, DMA
+    machine = types.ModuleType('machine')
+    machine.Pin, machine.I2C, machine.UART, machine.Timer, machine.idle = Pin, I2C, UART, Timer, idle
+    upy = types.ModuleType('micropython')
+    upy.const, upy.schedule = const, schedule
+    sys.modules.update(rp2=rp2, machine=machine, micropython=upy)
+
+# --- 測試資料 ---
+def _sm16(v):
+    # 與 LD2450_PIO 相同的正負號約定：最高位元為 1 代表負值
+    return (0x8000 | -v) if v < 0 else v
+
+def make_frame(targets):
+    # targets: 最多 3 個 (x, y) 或 (x, y, speed, res)，產生一個 30 bytes 的 LD2450 封包
+    f = bytearray(b'\xAA\xFF\x03\x00') + bytearray(24) + bytearray(b'\x55\xCC')
+    for i, t in enumerate(targets[:3]):
+        x, y, v, r = (tuple(t) + (0, 0))[:4]
+        o = 4 + i * 8
+        f[o:o + 8] = b''.join(_sm16(a).to_bytes(2, 'little') for a in (x, y, v)) + r.to_bytes(2, 'little')
+    return bytes(f)
@@ -0,0 +1,142 @@
+import struct
+import time
+from array import array
+
+# 障礙物到震動的延遲量測：每個階段記錄「從雷達封包抵達 (LD2450 frame_time) 到這個階段」的累計 us
+#   parse   ：封包交給追蹤器 (核心 0，Navigator.ingest)
+#   decide  ：判定出新序列 (核心 0，Navigator.decide)
+#   handoff ：觸覺核心讀到這筆紀錄 (核心 1，SeqBox.read 之後)
+#   go      ：寫 GO 暫存器 (核心 1，HapticScheduler.poll)
+# 每個核心各有一份固定大小的直方圖，只由自己的核心寫入，不需要同步
+# 抵達時間：LD2450_UART 用 RXIDLE 中斷的時間；PIO / DMA 後端只能以搬移 FIFO 的時間回推，FIFO 裡的等待不計
+#
+# 分桶：0~63 ms 每 1 ms 一格，64~2111 ms 每 32 ms 一格，最後一格是更大的值
+# 傾印格式 (小端序)：b'TTUL' 版本 u8、核心 u8、階段數 u8、格數 u8，
+#   每個階段：名稱 8 bytes (補 0)、次數 u32、最大 us u32、格數 × u32
+MAGIC = b'TTUL'
+VERSION = 1
+BINS = 129
+_FINE = 64
+_COARSE_MS = 32
+_HDR = '<4sBBBB'
+_STAGE = '<8sII'
+CMD_DUMP = b'L'      # 裝置端：USB 序列埠收到這個 byte 就把兩個核心的直方圖寫出去 (main.py 的 console 任務)
+
+# 各核心的階段與編號
+CORE0_STAGES = ('parse', 'decide')
+CORE1_STAGES = ('handoff', 'go')
+PARSE, DECIDE = 0, 1
+HANDOFF, GO = 0, 1
+
+def bin_of(us):
+    ms = us // 1000
+    if ms < _FINE: return ms
+    b = _FINE + (ms - _FINE) // _COARSE_MS
+    return b if b < BINS - 1 else BINS - 1
+
+def bin_ms(b):
+    # 一格代表的延遲 (ms)：細格取下緣，粗格取中點，最後一格取下緣
+    if b < _FINE: return b
+    if b == BINS - 1: return _FINE + (BINS - 1 - _FINE) * _COARSE_MS
+    return _FINE + (b - _FINE) * _COARSE_MS + _COARSE_MS // 2
+
+class LatencyHist:
+    # stages：階段名稱 (每個最多 8 個字元)；record() 不配置記憶體
+    def __init__(self, core, stages):
+        self.core = core
+        self.stages = stages
+        self.bins = [array('I', [0] * BINS) for _ in stages]
+        self.count = array('I', [0] * len(stages))
+        self.max = array('I', [0] * len(stages))
+
+    def record(self, stage, t0):
+        # stage：階段編號；t0：封包抵達的 ticks_us
+        us = time.ticks_diff(time.ticks_us(), t0)
+        if us < 0: us = 0
+        self.bins[stage][bin_of(us)] += 1
+        self.count[stage] += 1
+        if us > self.max[stage]: self.max[stage] = us
+
+    def clear(self):
+        for i in range(len(self.stages)):
+            b = self.bins[i]
+            for j in range(BINS): b[j] = 0
+            self.count[i] = self.max[i] = 0
+
+    def dump(self):
+        # 整份直方圖的二進位表示 (傾印時才配置)
+        out = [struct.pack(_HDR, MAGIC, VERSION, self.core, len(self.stages), BINS)]
+        for i, name in enumerate(self.stages):
+            out.append(struct.pack(_STAGE, name.encode(), self.count[i], self.max[i]))
+            out.append(struct.pack('<%dI' % BINS, *self.bins[i]))
+        return b''.join(out)
+
+def dump_size(n_stages):
+    return struct.calcsize(_HDR) + n_stages * (struct.calcsize(_STAGE) + 4 * BINS)
+
+# --- 主機端解碼 ---
+def decode(data):
+    # 從一段位元組 (可能混著 REPL 的文字輸出) 找出所有傾印，回傳 [(核心, {階段: (次數, 最大 us, 各格)})]
+    res = []
+    pos = data.find(MAGIC)
+    while pos >= 0:
+        _, ver, core, n, nb = struct.unpack_from(_HDR, data, pos)
+        p = pos + struct.calcsize(_HDR)
+        if ver != VERSION or p + n * (struct.calcsize(_STAGE) + 4 * nb) > len(data): break
+        stages = {}
+        for _ in range(n):
+            name, cnt, mx = struct.unpack_from(_STAGE, data, p)
+            p += struct.calcsize(_STAGE)
+            stages[name.rstrip(b'\x00').decode()] = (cnt, mx, struct.unpack_from('<%dI' % nb, data, p))
+            p += 4 * nb
+        res.append((core, stages))
+        pos = data.find(MAGIC, p)
+    return res
+
+def percentile(bins, p):
+    # p：0 ~ 100；回傳該百分位所在格的延遲 (ms)
+    total = sum(bins)
+    if not total: return 0
+    need = total * p / 100
+    acc = 0
+    for b, c in enumerate(bins):
+        acc += c
+        if acc >= need: return bin_ms(b)
+    return bin_ms(len(bins) - 1)
+
+def report(dumps):
+    for core, stages in dumps:
+        for name, (cnt, mx, bins) in stages.items():
+            print("core %d %-8s n %6d  p50 %5d ms  p95 %5d ms  p99 %5d ms  max %7.1f ms" % (
+                core, name, cnt, percentile(bins, 50), percentile(bins, 95), percentile(bins, 99), mx / 1000))
+
+def _read_serial(path, timeout=2.0):
+    # 送出傾印指令 (CMD_DUMP) 並收集回應；tty 先切成 raw，避免換行轉換弄壞二進位資料
+    import os
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+    try:
+        try:
+            import tty
+            tty.setraw(fd)
+        except (ImportError, OSError): pass
+        os.write(fd, CMD_DUMP)
+        import select
+        buf = b''
+        end = time.time() + timeout
+        while time.time() < end:
+            r, _, _ = select.select([fd], [], [], 0.1)
+            if r: buf += os.read(fd, 4096)
+        return buf
+    finally:
+        os.close(fd)
+
+if __name__ == '__main__':
+    # python latency.py 傾印檔 | /dev/ttyACM0
+    import sys
+    path = sys.argv[1]
+    if path.startswith('/dev/'): data = _read_serial(path)
+    else:
+        with open(path, 'rb') as f: data = f.read()
+    dumps = decode(data)
+    if not dumps: sys.exit("no latency dump found")
+    report(dumps)
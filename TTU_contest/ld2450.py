@@ -1,7 +1,27 @@
 import rp2
-from machine import Pin
-import struct
-import math
+from machine import Pin, UART
+from micropython import const
+from array import array
+import time
+from geometry import Tilt
+from capture import REC_RADAR
+
+try:
+    import uctypes
+    _addr = uctypes.addressof
+    def _byte_view(arr, n): return uctypes.bytearray_at(uctypes.addressof(arr), n)
+except ImportError:
+    import ctypes
+    def _addr(buf): return ctypes.addressof(ctypes.c_char.from_buffer(buf))
+    def _byte_view(arr, n): return memoryview(arr).cast('B')
+
+_RING_BITS = const(10)
+_RING = const(1024)   # 環形緩衝區大小 (必須是 2 的次方，DMA ring 模式也用它)
+_MASK = const(1023)
+_FRAME = const(30)    # 一個完整封包長度
+_QLEN = const(8)      # 封包佇列長度 (約 8 個 100 ms 之間的封包)
+_Q = const(14)        # 傾斜補償的定點數位數 (與 geometry.Q 相同)
+_REC = const(12)      # 每個封包 3 個目標 × (x, y, 速度, 解析度)
 
 # PIO UART 接收暫存器定義
 @rp2.asm_pio(in_shiftdir=rp2.PIO.SHIFT_RIGHT, fifo_join=rp2.PIO.JOIN_RX, autopush=True, push_thresh=32)
@@ -15,37 +35,329 @@ def pio_uart_rx():
     wait(1, pin, 0)
     jmp("start")
 
-class LD2450_PIO:
+class TargetTable:
+    # 唯讀目標表：x, y (mm，已傾斜補償)、徑向速度 (cm/s，負值代表靠近)、距離解析度 (mm)
+    def __init__(self):
+        self._d = array('h', [0] * _REC)
+        self._n = 0
+
+    def __len__(self): return self._n
+    def x(self, i): return self._d[i * 4]
+    def y(self, i): return self._d[i * 4 + 1]
+    def speed(self, i): return self._d[i * 4 + 2]
+    def resolution(self, i): return self._d[i * 4 + 3]
+
+class FrameQueue:
+    # 兩核心管線：核心 1 解出的封包經這個單一生產者 / 單一消費者佇列交給核心 0
+    # _w 只由生產者 (push_all)、_r 只由消費者 (pop) 前進，兩者都是累計數；先寫資料再前進 _w，讀完再前進 _r
+    # 滿了就丟掉新的封包 (生產者不能動 _r)，計數在 dropped
+    # slots 必須是 2 的次方：累計數在 2^30 繞回，格子用 & (slots - 1) 取才會在繞回時接得上
+    def __init__(self, slots=_QLEN):
+        if slots < 1 or slots & (slots - 1): raise ValueError("slots must be a power of 2")
+        self.slots = slots
+        self._mask = slots - 1
+        self._rec = array('h', [0] * (_REC * slots))
+        self._n = bytearray(slots)
+        self._t = array('i', [0] * slots)
+        self._w = self._r = 0
+        self.pushed = 0
+        self.dropped = 0
+        # 消費者端的結果：最近取出的封包
+        self.targets = TargetTable()
+        self.frame_time = 0
+
+    def free(self): return self.slots - ((self._w - self._r) & 0x3FFFFFFF)
+
+    def push_all(self, radar):
+        # 把 radar 佇列裡的封包全部搬進來，回傳搬入的數量
+        got = 0
+        while radar.next_frame() is not None:
+            if not self.free():
+                self.dropped += 1
+                continue
+            w = self._w
+            slot = w & self._mask
+            base = slot * _REC
+            d, q = radar.targets._d, self._rec
+            for i in range(_REC): q[base + i] = d[i]
+            self._n[slot] = radar.n_targets
+            self._t[slot] = radar.frame_time
+            self._w = (w + 1) & 0x3FFFFFFF
+            self.pushed += 1
+            got += 1
+        return got
+
+    def pop(self):
+        # 取出最舊的封包到 self.targets / self.frame_time，回傳目標數；空的回傳 None
+        r = self._r
+        if r == self._w: return None
+        slot = r & self._mask
+        base = slot * _REC
+        d, q = self.targets._d, self._rec
+        for i in range(_REC): d[i] = q[base + i]
+        n = self.targets._n = self._n[slot]
+        self.frame_time = self._t[slot]
+        self._r = (r + 1) & 0x3FFFFFFF
+        return n
+
+class LD2450_Base:
+    # 與接收方式無關的部分：環形緩衝區、封包解碼、封包佇列與統計計數
+    # 子類別只要實作 _drain()，把新資料放進 self._ring 並更新 _rd / _fill
+    def __init__(self, baud=460800):
+        self.HEADER = b'\xAA\xFF\x03\x00'
+        # 預先配置所有緩衝區，穩定狀態下 poll() 不產生任何新物件
+        self._ring = bytearray(_RING)
+        self._rd = self._fill = 0
+        self._wr = 0         # 外部寫入者 (DMA / UART IRQ) 用的寫入位置
+        # 結果緩衝區：最近取出的封包
+        self.targets = TargetTable()
+        self.n_targets = 0
+        self.frame_time = 0
+        # 封包佇列：每格存 3 筆目標紀錄、目標數與抵達時間 (ticks_us)
+        self._q_rec = array('h', [0] * (_REC * _QLEN))
+        self._q_n = bytearray(_QLEN)
+        self._q_t = array('i', [0] * _QLEN)
+        self._q_rd = self._q_len = 0
+        self._byte_us = 10000000 // baud
+        self._t_drain = 0
+        self._sync = True
+        # 統計計數
+        self.decoded = 0     # 成功解出的封包
+        self.dropped = 0     # 佇列滿了被丟棄的封包
+        self.overrun = 0     # 環形緩衝區滿了被丟棄的位元組
+        self.tail_err = 0    # 表頭正確但結尾不是 55 CC
+        self.resyncs = 0     # 為了重新對齊表頭而跳過資料的次數
+        self.rec = None      # capture.Recorder，錄下 FIFO 原始資料
+        self.tilt = Tilt()
+        self.gate = None     # geometry.HeightGate：依傾斜後的離地高度丟掉地面與頭頂以上的偵測點
+        # profile=True 時累計接收與解析花掉的 CPU 時間
+        self.profile = False
+        self.cpu_us = 0
+
+    def _advance(self, n):
+        # 外部寫入者已在 _wr 之後寫入 n bytes；超過環形緩衝區的空位就是溢位
+        wr = (self._wr + n) & _MASK
+        self._wr = wr
+        fill = self._fill + n
+        if fill > _RING:
+            self.overrun += fill - _RING
+            self._rd = wr
+            fill = _RING
+        self._fill = fill
+        self._t_drain = time.ticks_us()
+        if self.rec is not None and n:
+            if n > _RING: n = _RING
+            self.rec.log_ring(REC_RADAR, self._ring, (wr - n) & _MASK, n, _MASK)
+
+    def _decode(self, p, slot):
+        # 每個目標 8 bytes：x, y, 速度為 sign-magnitude (最高位元代表負)，解析度為無號數
+        ring, t = self._ring, self._q_rec
+        tilt, gate = self.tilt, self.gate
+        cp, sp, cr, sr = tilt.cp, tilt.sp, tilt.cr, tilt.sr
+        n = 0
+        base = slot * _REC
+        for i in range(3):
+            o = p + 4 + i * 8
+            x = ring[o & _MASK] | (ring[(o + 1) & _MASK] << 8)
+            y = ring[(o + 2) & _MASK] | (ring[(o + 3) & _MASK] << 8)
+            xr = -(x & 0x7FFF) if x & 0x8000 else (x & 0x7FFF)
+            yr = -(y & 0x7FFF) if y & 0x8000 else (y & 0x7FFF)
+            if xr == 0 and yr == 0: continue
+            if gate is not None:
+                # 離地高度 - 安裝高度 (mm)
+                z = (xr * sr + ((yr * sp) >> _Q) * cr) >> _Q
+                if z < gate.zlo:
+                    gate.floor += 1
+                    continue
+                if z > gate.zhi:
+                    gate.overhead += 1
+                    continue
+                gate.passed += 1
+            v = ring[(o + 4) & _MASK] | (ring[(o + 5) & _MASK] << 8)
+            r = ring[(o + 6) & _MASK] | (ring[(o + 7) & _MASK] << 8)
+            k = base + n * 4
+            t[k] = (xr * cr - ((yr * sp) >> _Q) * sr) >> _Q
+            t[k + 1] = (yr * cp) >> _Q
+            t[k + 2] = -(v & 0x7FFF) if v & 0x8000 else (v & 0x7FFF)
+            t[k + 3] = r if r < 0x8000 else 0x7FFF
+            n += 1
+        self._q_n[slot] = n
+
+    def _push(self, p, arrival):
+        # 佇列滿了就丟掉最舊的封包
+        if self._q_len == _QLEN:
+            self._q_rd = (self._q_rd + 1) % _QLEN
+            self._q_len -= 1
+            self.dropped += 1
+        slot = (self._q_rd + self._q_len) % _QLEN
+        self._decode(p, slot)
+        self._q_t[slot] = arrival
+        self._q_len += 1
+        self.decoded += 1
+
+    def _scan(self):
+        # 依序走過所有完整封包並放進佇列
+        ring = self._ring
+        rd, fill = self._rd, self._fill
+        found = 0
+        while fill >= _FRAME:
+            if (ring[rd] == 0xAA and ring[(rd + 1) & _MASK] == 0xFF
+                    and ring[(rd + 2) & _MASK] == 0x03 and ring[(rd + 3) & _MASK] == 0x00):
+                if ring[(rd + 28) & _MASK] == 0x55 and ring[(rd + 29) & _MASK] == 0xCC:
+                    # 抵達時間 = 搬移時間 - 封包之後還有幾個位元組的傳輸時間
+                    self._push(rd, time.ticks_add(self._t_drain, -(fill - _FRAME) * self._byte_us))
+                    self._sync = True
+                    found += 1
+                    rd = (rd + _FRAME) & _MASK
+                    fill -= _FRAME
+                    continue
+                self.tail_err += 1
+            if self._sync:
+                self._sync = False
+                self.resyncs += 1
+            rd = (rd + 1) & _MASK
+            fill -= 1
+        self._rd, self._fill = rd, fill
+        return found
+
+    def poll(self, pitch=0, roll=0):
+        # 搬移 FIFO 並解出所有完整封包，回傳這次新增的封包數
+        if self.profile: t0 = time.ticks_us()
+        self._drain()
+        self.tilt.update(pitch, roll)
+        found = self._scan()
+        if self.profile: self.cpu_us += time.ticks_diff(time.ticks_us(), t0)
+        return found
+
+    def next_frame(self):
+        # 依抵達順序取出一個封包到 self.targets / self.frame_time；佇列空了回傳 None
+        if not self._q_len: return None
+        slot = self._q_rd
+        base = slot * _REC
+        t, q = self.targets._d, self._q_rec
+        for i in range(_REC): t[i] = q[base + i]
+        self.n_targets = self.targets._n = self._q_n[slot]
+        self.frame_time = self._q_t[slot]
+        self._q_rd = (slot + 1) % _QLEN
+        self._q_len -= 1
+        return self.n_targets
+
+    def parse(self, pitch=0, roll=0):
+        # 只取最新一個封包：回傳目標數量 (結果在 self.targets)；沒有新封包時回傳 None
+        self.poll(pitch, roll)
+        n = None
+        while self._q_len: n = self.next_frame()
+        return n
+
+class LD2450_PIO(LD2450_Base):
     def __init__(self, sm_id=0, pin_rx=1, baud=460800):
-        self.raw_data = bytearray()
+        super().__init__(baud)
         self.pin_rx = Pin(pin_rx, Pin.IN, Pin.PULL_UP)
         self.sm = rp2.StateMachine(sm_id, pio_uart_rx, freq=8 * baud, in_base=self.pin_rx)
         self.sm.active(1)
-        self.HEADER = b'\xAA\xFF\x03\x00'
+        self._word = array('I', [0])
+        self._wb = _byte_view(self._word, 4)
 
-    def parse(self, pitch=0, roll=0):
-        while self.sm.rx_fifo():
-            self.raw_data.extend(struct.pack('<I', self.sm.get()))
-        if len(self.raw_data) > 256: self.raw_data = self.raw_data[-128:]
-        
-        head = self.raw_data.rfind(self.HEADER)
-        if head == -1 or len(self.raw_data) - head < 30: return None
-        
-        packet = self.raw_data[head : head + 30]
-        self.raw_data = self.raw_data[head + 30:]
-        if packet[28:30] != b'\x55\xCC': return None
-        
-        targets = []
-        cp, sp = math.cos(pitch), math.sin(pitch)
-        cr, sr = math.cos(roll), math.sin(roll)
-        
-        for i in range(3):
-            off = 4 + (i * 8)
-            x_raw, y_raw = struct.unpack('<hh', packet[off:off+4])
-            xr = -(x_raw & 0x7FFF) if x_raw & 0x8000 else (x_raw & 0x7FFF)
-            yr = -(y_raw & 0x7FFF) if y_raw & 0x8000 else (y_raw & 0x7FFF)
-            if xr != 0 or yr != 0:
-                yf = yr * cp
-                xf = xr * cr - (yr * sp) * sr
-                targets.append((xf, yf))
-        return targets
\ No newline at end of file
+    def _drain(self):
+        # 將 PIO FIFO 的字組搬進環形緩衝區，滿了就丟掉最舊的位元組
+        sm, word, wb, ring = self.sm, self._word, self._wb, self._ring
+        rd, fill = self._rd, self._fill
+        wr = (rd + fill) & _MASK
+        got = 0
+        while sm.rx_fifo():
+            sm.get(word)
+            ring[wr] = wb[0]
+            ring[(wr + 1) & _MASK] = wb[1]
+            ring[(wr + 2) & _MASK] = wb[2]
+            ring[(wr + 3) & _MASK] = wb[3]
+            wr = (wr + 4) & _MASK
+            fill += 4
+            got += 4
+            if fill > _RING:
+                self.overrun += fill - _RING
+                rd = (rd + fill - _RING) & _MASK
+                fill = _RING
+        self._t_drain = time.ticks_us()
+        self._rd, self._fill = rd, fill
+        if self.rec is not None and got:
+            if got > _RING: got = _RING
+            self.rec.log_ring(REC_RADAR, ring, (wr - got) & _MASK, got, _MASK)
+
+# --- DMA 接收 ---
+_DMA_COUNT = const(0x3FFFFFFF)   # 傳輸次數上限 (維持在 small int 範圍，讀取時不配置記憶體)
+_DMA_REARM = const(0x100000)     # 剩下這麼多次時重新啟動 DMA
+
+def _rx_fifo_addr(sm_id):
+    # PIO0 0x50200000 / PIO1 0x50300000，RXF0 在 0x20，每個狀態機 4 bytes
+    return (0x50300000 if sm_id >= 4 else 0x50200000) + 0x20 + 4 * (sm_id & 3)
+
+def _rx_dreq(sm_id):
+    # DREQ_PIO0_RX0 = 4、DREQ_PIO1_RX0 = 12
+    return (12 if sm_id >= 4 else 4) + (sm_id & 3)
+
+class LD2450_DMA(LD2450_PIO):
+    # PIO RX FIFO 由 DMA 直接搬進環形緩衝區，CPU 只讀 DMA 的剩餘傳輸次數來得知寫入位置
+    # 對外介面與 LD2450_PIO 相同 (poll / next_frame / parse / 統計計數)
+    def __init__(self, sm_id=0, pin_rx=1, baud=460800, dma=None):
+        super().__init__(sm_id, pin_rx, baud)
+        # DMA ring 模式要求緩衝區對齊到自身大小，所以多配置一倍再挑對齊的位置
+        self._raw = bytearray(2 * _RING)
+        off = -_addr(self._raw) & _MASK
+        self._ring = memoryview(self._raw)[off:off + _RING]
+        self._base = _addr(self._raw) + off
+        self.rearms = 0
+        self.dma = dma or rp2.DMA()
+        self._ctrl = self.dma.pack_ctrl(size=2, inc_read=False, inc_write=True,
+                                        ring_size=_RING_BITS, ring_sel=True, treq_sel=_rx_dreq(sm_id))
+        self._fifo = _rx_fifo_addr(sm_id)
+        self._start(0)
+
+    def _start(self, wr):
+        self.dma.active(0)
+        self.dma.config(read=self._fifo, write=self._base + wr, count=_DMA_COUNT, ctrl=self._ctrl, trigger=True)
+        self._left = _DMA_COUNT
+
+    def _drain(self):
+        # 由 DMA 已完成的字組數推算新資料量
+        left = self.dma.count
+        self._advance((self._left - left) * 4)
+        self._left = left
+        if left < _DMA_REARM:
+            self.rearms += 1
+            self._start(self._wr)
+
+# --- 硬體 UART 接收 ---
+class LD2450_UART(LD2450_Base):
+    # 使用 RP2040 的硬體 UART (自帶 FIFO 與 RX IRQ)，不佔用 PIO 狀態機
+    # IRQ 把 rxbuf 內的資料搬進環形緩衝區後只增加 _in 計數；poll() 讀計數得知新資料量，兩邊不用上鎖
+    def __init__(self, uart_id=0, pin_rx=1, pin_tx=0, baud=460800, rxbuf=2048):
+        super().__init__(baud)
+        self.uart = UART(uart_id, baudrate=baud, rx=Pin(pin_rx), tx=Pin(pin_tx), rxbuf=rxbuf, timeout=0)
+        self._chunk = bytearray(64)
+        self._iw = 0         # IRQ 端的寫入位置
+        self._in = 0         # IRQ 端累計寫入的 bytes (30-bit 繞回)
+        self._seen = 0
+        self._t_rx = 0       # 最近一次 IRQ 的時間：RXIDLE 在一串資料收完後觸發，就是最後一個 byte 的抵達時間
+        self.uart.irq(self._on_rx, UART.IRQ_RXIDLE)
+
+    def _on_rx(self, uart):
+        if self.profile: t0 = time.ticks_us()
+        buf, ring = self._chunk, self._ring
+        self._t_rx = time.ticks_us()
+        n = uart.readinto(buf)
+        while n:
+            iw = self._iw
+            for i in range(n): ring[(iw + i) & _MASK] = buf[i]
+            self._iw = (iw + n) & _MASK
+            self._in = (self._in + n) & 0x3FFFFFFF
+            n = uart.readinto(buf)
+        if self.profile: self.cpu_us += time.ticks_diff(time.ticks_us(), t0)
+
+    def _drain(self):
+        t = self._t_rx       # 先讀時間：中間又來一次 IRQ 時寧可高估延遲
+        inn = self._in
+        n = (inn - self._seen) & 0x3FFFFFFF
+        self._advance(n)
+        # 以 IRQ 時間回推封包抵達時間，poll() 之前在緩衝區裡等待的時間也算進延遲
+        if n: self._t_drain = t
+        self._seen = inn
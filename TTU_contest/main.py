@@ -1,93 +1,191 @@
-from machine import Timer, idle
-import time
-import math
+import sys
+import select
 import _thread
 import gc
+from array import array
 
 # 引入自訂模組
-from ld2450 import LD2450_PIO
-from drv2605l import DRV2605L
+from ld2450 import LD2450_DMA, FrameQueue
+from drv2605l import DRV2605L, DRV2605Array
 from mpu6050 import MPU6050
+from navigator import Navigator
+from geometry import HeightGate
+from occupancy import PolarGrid
+from capture import Recorder
+from rtp import RTPTable, RTPStreamer
+from haptic_sched import HapticScheduler, ArrayScheduler
+from patterns import PatternTable, ArrayPatternTable
+from exchange import SeqBox
+from runtime import Task, Runtime, CoreLoad, nav_tasks, haptic_task, asyncio
+from latency import LatencyHist, CORE0_STAGES, CORE1_STAGES, HANDOFF, CMD_DUMP
+
+# 觸覺模式：False = ROM 效果序列 + 1800 ms 冷卻；True = RTP 連續震動，強度跟著距離 / 碰撞時間
+HAPTIC_RTP = False
+RTP_PERIOD = 20   # 核心 1 更新 RTPIN 的週期 (ms)
+# 多顆馬達：每個方向一顆 DRV2605L 接在 TCA9548A 的通道 0~2，三個方向同時震動 (不再依序播放)
+HAPTIC_ARRAY = False
 
 # --- 全域共享變數 ---
-pending_seq = [8, 178, 8, 178, 8, 178, 0, 0] 
-lock = _thread.allocate_lock()
-haptic_busy = False
-new_data_available = False
-temp_min_dists = [800.0, 800.0, 800.0]
-
-# --- Core 1: 觸覺回饋執行緒 ---
-def core1_task():
-    global haptic_busy, new_data_available
+# 核心 0 發佈 (狀態編號, 緊急程度, 雷達封包抵達的 ticks_us)，核心 1 讀取；兩邊都不等鎖，序列由狀態編號查表
+MSG_STATE, MSG_URGENCY, MSG_T = 0, 1, 2
+box = SeqBox(3)
+patterns = PatternTable()
+rtp_target = 0   # 核心 0 寫、核心 1 讀的單一整數，不需要鎖
+# 封包抵達 → parse / decide (核心 0)、→ handoff / GO (核心 1) 的延遲直方圖，各由自己的核心寫入
+lat0 = LatencyHist(0, CORE0_STAGES)
+lat1 = LatencyHist(1, CORE1_STAGES)
+
+# 兩核心管線：True = 核心 1 負責雷達接收與封包解碼 (經 FrameQueue 交出)，核心 0 做 IMU 融合、判定與觸覺
+# False = 核心 0 做雷達與判定、核心 1 只負責觸覺
+PIPELINE = False
+
+# --- 觸覺任務 (PIPELINE 時在核心 0，否則在核心 1) ---
+sched = None     # 觸覺排程 (HapticScheduler / ArrayScheduler)；report() 印出它的 stats()，RTP 模式沒有
+def make_haptic():
+    global sched
+    msg = array('i', [0] * 3)    # 消費者自己的一份，讀取時複製進來
+    if HAPTIC_ARRAY:
+        # 每個方向各自等自己的序列播完 (或有更緊急的) 才重新觸發，沒變的通道不碰
+        sched = ArrayScheduler(DRV2605Array(i2c_bus=1, sda=14, scl=15, channels=(0, 1, 2)))
+        sched.hist = lat1
+        table = ArrayPatternTable()
+        def play_array():
+            if box.read(msg):
+                lat1.record(HANDOFF, msg[MSG_T])
+                s = msg[MSG_STATE]
+                sched.submit(table.seqs[s], table.urgencies[s], msg[MSG_T])
+            sched.poll()
+        return Task('haptic', 20, play_array)
     drv = DRV2605L(i2c_bus=1, sda=14, scl=15)
-    tim_haptic_poll = Timer(-1)
-    tim_cooldown = Timer(-1)
-
-    def unlock_haptic(t):
-        global haptic_busy
-        haptic_busy = False
-
-    def haptic_poll_callback(t):
-        global haptic_busy, new_data_available
-        if not haptic_busy and new_data_available:
-            with lock:
-                drv.play_sequence(pending_seq)
-                new_data_available = False
-            haptic_busy = True
-            tim_cooldown.init(period=1800, mode=Timer.ONE_SHOT, callback=unlock_haptic)
+    if HAPTIC_RTP:
+        stream = RTPStreamer(drv)
+        return Task('haptic', RTP_PERIOD, lambda: stream.tick(rtp_target))
+    # 更緊急的序列會打斷正在播的；其餘等 GO 位元清除 (序列播完) 才播下一個
+    sched = HapticScheduler(drv)
+    return haptic_task(sched, box, patterns, msg, hist=lat1)
+
+# --- 感測器 ---
+radar = LD2450_DMA(sm_id=0, pin_rx=1)
+# 高度閘：依安裝高度 (mm) 與融合後的 pitch / roll 推算偵測點離地高度，只保留 GATE_BAND 之內的
+# 範圍 (例如 (150, 2000)) 可先用 python replay.py --gate 安裝高度 walk.bin 以錄製資料調整；None = 不過濾
+MOUNT_MM = 900
+GATE_BAND = None
+if GATE_BAND is not None: radar.gate = HeightGate(MOUNT_MM, *GATE_BAND)
+# MPU6050 的 INT 腳接上 GPIO 後填入腳位編號，改由 data-ready 中斷取樣；None 時用內建 FIFO
+IMU_INT_PIN = None
+# 佔據格：True = 各方向距離由累積多個封包的極座標格子決定 (雷達漏掉幾個封包時震動不會中斷)，並隨 IMU yaw 旋轉
+# (yaw 只有 AHRS 模式才有，所以開啟時 IMU 改用 Mahony 濾波)
+OCCUPANCY = False
+imu = MPU6050(i2c_bus=0, sda=4, scl=5, fifo_rate=200, ahrs=OCCUPANCY, int_pin=IMU_INT_PIN, int_rate=200)
+# 陀螺儀偏差：有校正檔就直接載入；沒有就開機靜置約 1 秒量測並存檔 (有移動則跳過，交給靜止偵測慢慢修正)
+if not imu.load_calibration() and imu.calibrate(): imu.save_calibration()
+nav = Navigator(radar, imu, rtp=RTPTable() if HAPTIC_RTP else None, patterns=patterns,
+                grid=PolarGrid() if OCCUPANCY else None)
+nav.lat = lat0
+frames = FrameQueue()
+attitude = SeqBox(2, 'i' if imu.fixed else 'f')   # 核心 0 → 核心 1：傾斜補償用的 pitch / roll
+
+# 錄製實地資料：設為 True 後會寫入 REC_PATH，回到電腦用 replay.py 重播 (錄製時不用兩核心管線)
+RECORD = False
+REC_PATH = 'walk.bin'
+rec = None
+if RECORD:
+    rec = Recorder(REC_PATH, imu=imu)
+    radar.rec = imu.rec = nav.rec = rec
+
+# --- Core 1 ---
+# 核心 1 沒有 asyncio，以 runtime.Task 的阻塞迴圈執行，週期 / 抖動統計與核心 0 的任務相同
+core1 = None
 
-    tim_haptic_poll.init(period=20, mode=Timer.PERIODIC, callback=haptic_poll_callback)
-    
-    while True:
-        idle()
+def core1_task():
+    global core1
+    if PIPELINE and not RECORD:
+        att = array('i' if imu.fixed else 'f', [0] * 2)
+        def radar_ingest():
+            attitude.read(att)     # 沒有新的姿態就沿用上一次的
+            radar.poll(pitch=att[0], roll=att[1])
+            frames.push_all(radar)
+        core1 = Task('radar', 20, radar_ingest)
+    else:
+        core1 = make_haptic()
+    core1.run_blocking()
 
-# 啟動第二核心
 _thread.stack_size(4096)
 _thread.start_new_thread(core1_task, ())
 
 # --- Core 0: 主邏輯與判定 ---
-radar = LD2450_PIO(sm_id=0, pin_rx=1)
-imu = MPU6050(i2c_bus=0, sda=4, scl=5)
-
-def logic_timer_callback(t):
-    global new_data_available
-    p, r = imu.get_fusion_data()
-    targets = radar.parse(pitch=p, roll=r)
-    
-    for i in range(3): temp_min_dists[i] = 800.0
-
-    if targets:
-        for tx, ty in targets:
-            dist = math.sqrt(tx*tx + ty*ty) / 10.0
-            angle = math.degrees(math.atan2(tx, ty))
-            angle1 = 180 - angle
-
-            idx = 1 # 中
-            if 15 < angle1 <= 165:      idx = 0 # 左
-            elif 195 <= angle1 < 345:   idx = 2 # 右
-            
-            if dist < temp_min_dists[idx]:
-                temp_min_dists[idx] = dist
-
-        with lock:
-            for i in range(3):
-                d = temp_min_dists[i]
-                if d < 300:    code = 16
-                elif d < 600:  code = 47
-                else:          code = 8
-                pending_seq[i * 2] = code
-            new_data_available = True
-
-tim_logic = Timer(-1)
-tim_logic.init(period=100, mode=Timer.PERIODIC, callback=logic_timer_callback)
-
-# --- 記憶體回收定時器 ---
-def gc_timer_callback(t):
-    gc.collect()
-
-Timer(-1).init(period=2000, mode=Timer.PERIODIC, callback=gc_timer_callback)
-
-print("系統啟動：全模組化事件驅動架構")
-
-while True:
-    idle()
\ No newline at end of file
+def publish():
+    global rtp_target
+    if HAPTIC_RTP:
+        rtp_target = nav.amp
+        return
+    msg = box.begin()
+    msg[MSG_STATE] = nav.state
+    msg[MSG_URGENCY] = nav.urgency
+    msg[MSG_T] = nav.frame_t
+    box.commit()
+
+if RECORD:
+    # 錄製時維持單一 100 ms 週期 (與 replay.py 的 step() 一一對應)，並由另一個任務把緩衝區寫進 flash
+    def logic():
+        if nav.step() or HAPTIC_RTP: publish()
+    tasks = [Task('logic', 100, logic), Task('flush', 200, rec.flush)]
+elif PIPELINE:
+    def sense():
+        nav.sense()
+        a = attitude.begin()
+        if imu.fixed: a[0], a[1] = imu.pitch_q, imu.roll_q
+        else: a[0], a[1] = imu.pitch, imu.roll
+        attitude.commit()
+    def decide():
+        nav.consume(frames)
+        if nav.decide() or HAPTIC_RTP: publish()
+    tasks = [Task('imu', 10, sense), Task('decision', 100, decide), make_haptic()]
+else:
+    tasks = nav_tasks(nav, publish)
+    if HAPTIC_RTP:
+        # RTP 每個判定週期都更新目標振幅 (沒有目標時也要降到 0)
+        def decide_rtp():
+            nav.decide()
+            publish()
+        tasks[-1] = Task('decision', 100, decide_rtp)
+
+# USB 序列埠收到 CMD_DUMP ('L') 時輸出兩個核心的延遲直方圖 (二進位)，電腦端用 python latency.py /dev/ttyACM0 解碼
+console = select.poll()
+console.register(sys.stdin, select.POLLIN)
+def console_poll():
+    if console.poll(0) and sys.stdin.buffer.read(1) == CMD_DUMP:
+        sys.stdout.buffer.write(lat0.dump())
+        sys.stdout.buffer.write(lat1.dump())
+tasks.append(Task('console', 100, console_poll))
+
+# 每 STATS_MS 印出各任務的週期、抖動與超時，以及兩個核心的使用率；0 = 不印
+STATS_MS = 10000
+rt = Runtime(tasks)
+load0 = CoreLoad(0, tasks)
+load1 = None
+def report():
+    global load1
+    rt.report()
+    if sched is not None:
+        st = sched.stats()
+        print("haptic plays %d  preemptions %d  superseded %d" % (st['plays'], st['preemptions'], st['superseded']))
+        # 各緊急程度從雷達封包抵達到 GO 的延遲 (單一馬達；陣列只記在 lat1 直方圖)
+        for u, (n, avg, mx) in enumerate(st.get('latency_ms', ())):
+            print("  urgency %d: %d plays  avg %.1f ms  max %.1f ms" % (u, n, avg, mx))
+    if core1 is None: return
+    Runtime([core1]).report()
+    if load1 is None: load1 = CoreLoad(1, [core1])
+    print("load core0 %.1f%%  core1 %.1f%%  frames dropped %d  heap free %d" % (
+        load0.percent(), load1.percent(), frames.dropped, gc.mem_free()))
+    g = radar.gate
+    if g is not None: print("height gate passed %d  floor %d  overhead %d" % (g.passed, g.floor, g.overhead))
+    load0.reset()
+    load1.reset()
+if STATS_MS: tasks.append(Task('stats', STATS_MS, report))
+
+# 穩定狀態的解析 / 追蹤 / 判定路徑不配置記憶體 (bench.py parser)，不再需要每 2 秒的 gc.collect 任務；
+# 啟動時把建立物件留下的垃圾清一次，剩下的少量配置 (統計輸出等) 交給 MicroPython 在堆積用完時自動回收
+gc.collect()
+print("系統啟動：asyncio 週期任務" + (" + 核心 1 雷達管線" if PIPELINE else " + 核心 1 觸覺"))
+asyncio.run(rt.run())
@@ -1,34 +1,357 @@
 from machine import Pin, I2C
+from micropython import const, schedule
+from array import array
 import time
 import math
-import struct
+import json
+from ahrs import Mahony
+from geometry import atan2_q, hypot_q
+from capture import REC_IMU, REC_IMU_FIFO
+
+_REG_SMPLRT_DIV = const(0x19)
+_REG_CONFIG = const(0x1A)
+_REG_FIFO_EN = const(0x23)
+_REG_INT_PIN_CFG = const(0x37)
+_REG_INT_ENABLE = const(0x38)
+_REG_INT_STATUS = const(0x3A)
+_REG_ACCEL = const(0x3B)
+_REG_USER_CTRL = const(0x6A)
+_REG_PWR_MGMT_1 = const(0x6B)
+_REG_FIFO_COUNT = const(0x72)
+_REG_FIFO_RW = const(0x74)
+_SAMPLE = const(12)        # FIFO 每筆：加速度 6 bytes + 陀螺儀 6 bytes (不含溫度)
+_FIFO_FULL = const(1020)   # 1024 bytes 的 FIFO 最多放 85 筆完整資料，超過代表已溢位
+_FIFO_OFLOW = const(0x10)  # INT_STATUS 的 FIFO_OFLOW_INT：讀取後清除
+_MAX_BURST = const(84)     # 一次最多讀幾筆
+_SLOTS = const(32)         # 中斷模式的環形緩衝區 (200 Hz 時約 160 ms)，必須是 2 的次方
+_WRAP = const(63)          # 讀寫索引在 0 ~ 2*_SLOTS-1 間循環，才分得出全空與全滿
+
+_GYRO_SCALE = 0.01745 / 131.0   # ±250°/s 量程：LSB → rad/s
+_GYRO_SCALE8 = _GYRO_SCALE / 256        # 扣掉偏差後的陀螺儀值是 Q8 (1/256 LSB)
+_GYRO_SCALE8_US = _GYRO_SCALE8 / 1e6
+_GD = const(114550)             # 定點：(1/16 LSB)·(16 us) → Q16 弧度的除數 = 1 / (_GYRO_SCALE·1e-6·65536)
+_GD4 = const(1790)              # 同上，(4 LSB)·(16 us) 為單位 (_GD / 64)，給長間隔用
+_D_FINE = const(1024)           # 間隔 < 16 ms：|gx >> 4| < 2^19.1，乘積 < 2^29.1
+_D_MAX = const(65535)           # 長間隔 (輪詢) 改用 gx >> 10 (< 2^13.1)，間隔上限約 1 s，乘積 < 2^29.1
+_TAU = 2.4                      # 互補濾波時間常數 (s)，等同 100 ms 週期時 alpha 0.96
+
+CAL_PATH = 'imu_cal.json'       # 陀螺儀偏差校正檔 (LSB)
+_STILL_G = const(33280)         # 靜止門檻：各軸角速度 (扣掉偏差，Q8) 小於 130 LSB ≈ 1°/s
+_STILL_A_LO = const(3785360)    # (|a| >> 3)² 落在 0.95 g² ~ 1.05 g² 之間
+_STILL_A_HI = const(4624220)
+_STILL_N = const(50)            # 連續靜止這麼多筆才開始修正偏差
+_BIAS_K = const(41)             # 靜止時偏差的追蹤速度：每筆 41/4096 ≈ 0.01
 
 class MPU6050:
-    def __init__(self, i2c_bus=0, sda=4, scl=5):
+    # fifo_rate=0：每次呼叫讀一筆 (舊行為)
+    # fifo_rate=N：感測器以 N Hz 取樣存進內建 FIFO，每次呼叫一次讀完並逐筆融合
+    # 讀取使用預先配置的緩衝區，時間用 ticks_us；I2C 出錯時計數並保留上一次的正確角度
+    # ahrs=True：改用 ahrs.Mahony 四元數濾波，多提供 yaw (沒有磁力計，只靠陀螺儀積分)
+    # 陀螺儀偏差由 calibrate() / load_calibration() 設定，靜止時再慢慢自動修正
+    # int_pin=GPIO：感測器以 int_rate Hz 取樣，INT 腳 (data ready) 觸發中斷，把每筆資料連同
+    # 中斷當下的 ticks_us 放進環形緩衝區；update() 再以實際取樣間隔逐筆融合 (優先於 fifo_rate)
+    # fixed=True：互補濾波全部用 small int (角度為 Q16 弧度，存在 pitch_q / roll_q)，融合時不產生浮點物件；
+    # pitch / roll 只在每次 update() 結束時換算一次 (不能與 ahrs 同時使用)
+    def __init__(self, i2c_bus=0, sda=4, scl=5, fifo_rate=0, ahrs=False, int_pin=None, int_rate=200, fixed=False):
+        if ahrs and fixed: raise ValueError("AHRS mode has no fixed-point path")
         self.i2c = I2C(i2c_bus, sda=Pin(sda), scl=Pin(scl), freq=400000)
         self.addr = 0x68
-        self.pitch = self.roll = 0.0
-        self.last_time = time.ticks_ms()
+        self.pitch = self.roll = self.yaw = 0.0
+        self.pitch_q = self.roll_q = 0
+        self.yaw_q = 0                # AHRS 模式的 yaw (Q16 弧度)，給 occupancy.PolarGrid 以整數旋轉
+        self.fixed = fixed
+        self.ahrs = Mahony() if ahrs else None
+        self._bq = [0, 0, 0]          # 陀螺儀 X/Y/Z 偏差 (Q8)
+        self.stationary = False
+        self._still = 0
+        self.last_time = time.ticks_us()
+        self.rec = None   # capture.Recorder，錄下每次讀到的原始資料
+        self.fifo_rate = fifo_rate
+        self.samples = 0          # 融合過的樣本數
+        self.errors = 0           # I2C 讀取失敗次數
+        self.fifo_overflows = 0
+        self.irq_missed = 0       # 來不及讀而被下一筆蓋掉的樣本
+        self.overrun = 0          # 環形緩衝區滿了而丟掉的樣本
+        self._ring = None
+        self._raw = bytearray(14)
+        self._alpha = 0.96
+        self._beta = 1 - self._alpha
+        self._cq = 1311               # 定點的 (1 - alpha)，Q15
         try:
-            self.i2c.writeto_mem(self.addr, 0x6B, b'\x00')
+            self.i2c.writeto_mem(self.addr, _REG_PWR_MGMT_1, b'\x00')
+            if int_pin is not None:
+                self.fifo_rate = 0
+                self._setup_irq(int_pin, int_rate)
+            elif fifo_rate: self._setup_fifo(fifo_rate)
             self.active = True
-        except: self.active = False
+        except OSError: self.active = False
 
-    def get_fusion_data(self):
-        if not self.active: return 0.0, 0.0
+    def _set_rate(self, rate):
+        # DLPF_CFG=1 (184 Hz) 時陀螺儀輸出 1 kHz，取樣率 = 1000 / (1 + SMPLRT_DIV)；回傳實際取樣率
+        div = 1000 // rate - 1
+        if div < 0: div = 0
+        if div > 255: div = 255
+        rate = 1000 // (1 + div)
+        self._dt_us = 1000000 // rate
+        self._alpha = _TAU / (_TAU + 1.0 / rate)
+        self._beta = 1 - self._alpha
+        self._cq = int(self._beta * 32768 + 0.5)
+        w = self.i2c.writeto_mem
+        w(self.addr, _REG_CONFIG, b'\x01')
+        w(self.addr, _REG_SMPLRT_DIV, bytes([div]))
+        return rate
+
+    def _setup_fifo(self, rate):
+        self.fifo_rate = self._set_rate(rate)
+        self._buf = bytearray(_SAMPLE * _MAX_BURST)
+        mv = memoryview(self._buf)
+        self._views = [mv[:_SAMPLE * k] for k in range(_MAX_BURST + 1)]
+        self._cnt = bytearray(2)
+        self._ist = bytearray(1)
+        self.i2c.writeto_mem(self.addr, _REG_FIFO_EN, b'\x78')       # XG, YG, ZG, ACCEL
+        self.i2c.writeto_mem(self.addr, _REG_INT_ENABLE, b'\x10')    # FIFO_OFLOW_EN：溢位時設 INT_STATUS 旗標
+        self._reset_fifo()
+
+    def _setup_irq(self, pin, rate):
+        # 單一生產者 (中斷) / 單一消費者 (update)：_iw 只由 _grab 前進、_ir 只由 update 前進，不需要鎖
+        self.int_rate = self._set_rate(rate)
+        self._ring = bytearray(14 * _SLOTS)
+        mv = memoryview(self._ring)
+        self._slots = [mv[i * 14:i * 14 + 14] for i in range(_SLOTS)]
+        self._ts = array('i', bytes(4 * _SLOTS))
+        self._iw = self._ir = 0
+        self._edge = 0        # 最近一次中斷的 ticks_us
+        self._edges = 0       # 上次讀取後累積的中斷次數
+        self._pending = False # 已經排了一次 _grab 還沒執行：同時最多排一個，排程佇列 (深度 8) 不會滿
+        self._grab_ref = self._grab   # 先做好 bound method，硬中斷裡不能配置記憶體
+        w = self.i2c.writeto_mem
+        w(self.addr, _REG_INT_PIN_CFG, b'\x10')   # INT_RD_CLEAR：任何讀取都清除中斷狀態
+        w(self.addr, _REG_INT_ENABLE, b'\x01')    # DATA_RDY_EN
+        self.int_pin = Pin(pin, Pin.IN)
+        self.int_pin.irq(handler=self._on_ready, trigger=Pin.IRQ_RISING, hard=True)
+
+    def _on_ready(self, pin):
+        # 硬中斷：只記下時間，I2C 讀取交給 schedule 在主程式的空檔執行
+        # 丟出 / 接住例外都會配置記憶體，所以不靠 schedule 的 RuntimeError，而是已經排過就不再排
+        self._edge = time.ticks_us()
+        self._edges += 1
+        if not self._pending:
+            self._pending = True
+            schedule(self._grab_ref, 0)
+
+    def _reset_fifo(self):
+        # FIFO_OFLOW 旗標要讀 INT_STATUS 才會清除：清空 FIFO 後一起讀掉，否則下一次 _read_fifo 又當成溢位
+        w = self.i2c.writeto_mem
+        w(self.addr, _REG_USER_CTRL, b'\x04')     # FIFO_RESET
+        w(self.addr, _REG_USER_CTRL, b'\x40')     # FIFO_EN
+        self.i2c.readfrom_mem_into(self.addr, _REG_INT_STATUS, self._ist)
+
+    @property
+    def bias(self):
+        # 陀螺儀 X/Y/Z 偏差 (LSB)
+        return [v / 256 for v in self._bq]
+
+    def _fuse(self, b, o, g, dt_us):
+        # b[o:o+6] 為加速度、b[g:g+6] 為陀螺儀 X/Y/Z (大端序 int16)；直接從位元組組出整數，不產生 tuple
+        ax = (b[o] << 8) | b[o + 1]
+        ay = (b[o + 2] << 8) | b[o + 3]
+        az = (b[o + 4] << 8) | b[o + 5]
+        gx = (b[g] << 8) | b[g + 1]
+        gy = (b[g + 2] << 8) | b[g + 3]
+        gz = (b[g + 4] << 8) | b[g + 5]
+        if ax > 32767: ax -= 65536
+        if ay > 32767: ay -= 65536
+        if az > 32767: az -= 65536
+        if gx > 32767: gx -= 65536
+        if gy > 32767: gy -= 65536
+        if gz > 32767: gz -= 65536
+        # 扣掉偏差後以 Q8 表示，偏差追蹤與定點路徑都不需要浮點
+        bq = self._bq
+        gx = (gx << 8) - bq[0]
+        gy = (gy << 8) - bq[1]
+        gz = (gz << 8) - bq[2]
+        # 靜止偵測：三軸角速度都很小、加速度大小接近 1 g，連續 _STILL_N 筆後把剩下的角速度當成偏差慢慢吸收
+        a2 = (ax >> 3) * (ax >> 3) + (ay >> 3) * (ay >> 3) + (az >> 3) * (az >> 3)
+        if -_STILL_G < gx < _STILL_G and -_STILL_G < gy < _STILL_G and -_STILL_G < gz < _STILL_G \
+                and _STILL_A_LO < a2 < _STILL_A_HI:
+            if self._still < _STILL_N: self._still += 1
+            else:
+                bq[0] += (gx * _BIAS_K + 2048) >> 12
+                bq[1] += (gy * _BIAS_K + 2048) >> 12
+                bq[2] += (gz * _BIAS_K + 2048) >> 12
+        else: self._still = 0
+        if self.fixed:
+            # 加速度先右移 2 位，平方和與查表的比值都留在 small int 範圍 (< 2^30)
+            ax >>= 2
+            ay >>= 2
+            az >>= 2
+            acc_p = atan2_q(ay, hypot_q(ax, az))
+            acc_r = atan2_q(-ax, az)
+            # 兩個步驟都加半格再取整，否則 floor 的偏差會累積成約 0.004 rad 的固定誤差
+            # 角速度 × 間隔必須留在 small int 範圍 (< 2^30)：間隔長時角速度先 (四捨五入) 多右移 6 位
+            d = (dt_us + 8) >> 4
+            if d < _D_FINE:
+                wx = (gx >> 4) * d
+                wy = (gy >> 4) * d
+                k = _GD
+            else:
+                if d > _D_MAX: d = _D_MAX
+                wx = ((gx + 512) >> 10) * d
+                wy = ((gy + 512) >> 10) * d
+                k = _GD4
+            c = self._cq
+            p = self.pitch_q + (wx + (k >> 1)) // k
+            self.pitch_q = p + (((acc_p - p) * c + 16384) >> 15)
+            r = self.roll_q + (wy + (k >> 1)) // k
+            self.roll_q = r + (((acc_r - r) * c + 16384) >> 15)
+            return
+        if self.ahrs is not None:
+            k = _GYRO_SCALE8
+            self.ahrs.update(gx * k, gy * k, gz * k, ax, ay, az, dt_us / 1000000)
+            return
+        acc_p = math.atan2(ay, math.sqrt(ax * ax + az * az))
+        acc_r = math.atan2(-ax, az)
+        k = _GYRO_SCALE8_US * dt_us
+        a, c = self._alpha, self._beta
+        self.pitch = a * (self.pitch + gx * k) + c * acc_p
+        self.roll = a * (self.roll + gy * k) + c * acc_r
+
+    def _read_fifo(self):
+        # 三次 transaction：讀溢位旗標、FIFO 數量，再一次讀完所有樣本
+        # 只看數量不夠：溢位後已經讀掉一部分時數量會小於 _FIFO_FULL，但剩下的資料照樣錯位
+        i2c, c = self.i2c, self._cnt
+        i2c.readfrom_mem_into(self.addr, _REG_INT_STATUS, self._ist)
+        i2c.readfrom_mem_into(self.addr, _REG_FIFO_COUNT, c)
+        count = (c[0] << 8) | c[1]
+        if self._ist[0] & _FIFO_OFLOW or count > _FIFO_FULL:
+            # 溢位後資料已錯位，只能清空重來
+            self.fifo_overflows += 1
+            self._reset_fifo()
+            return
+        n = count // _SAMPLE
+        if n > _MAX_BURST: n = _MAX_BURST
+        if not n: return
+        buf = self._views[n]
+        i2c.readfrom_mem_into(self.addr, _REG_FIFO_RW, buf)
+        if self.rec is not None: self.rec.log(REC_IMU_FIFO, buf)
+        b, dt = self._buf, self._dt_us
+        for k in range(n):
+            o = k * _SAMPLE
+            self._fuse(b, o, o + 6, dt)
+        self.samples += n
+
+    def _grab(self, _):
+        # 先清 _pending：讀計數之前又來的中斷會再排一次，那一次看到 0 筆就直接結束
+        self._pending = False
+        n, t = self._edges, self._edge
+        self._edges = 0
+        if not n: return
+        if n > 1: self.irq_missed += n - 1
+        w = self._iw
+        if ((w - self._ir) & _WRAP) >= _SLOTS:
+            self.overrun += 1
+            return
+        i = w & (_SLOTS - 1)
+        try: self.i2c.readfrom_mem_into(self.addr, _REG_ACCEL, self._slots[i])
+        except OSError:
+            self.errors += 1
+            return
+        self._ts[i] = t
+        self._iw = (w + 1) & _WRAP
+
+    def _read_ring(self):
+        # dt 取自中斷時間戳，不受呼叫時機影響
+        r, w = self._ir, self._iw
+        ts, slots, last = self._ts, self._slots, self.last_time
+        n = 0
+        while r != w:
+            i = r & (_SLOTS - 1)
+            t = ts[i]
+            self._fuse(slots[i], 0, 8, time.ticks_diff(t, last))
+            last = t
+            r = (r + 1) & _WRAP
+            n += 1
+        self._ir = r
+        self.last_time = last
+        self.samples += n
+
+    def _read_one(self):
+        d = self._raw
+        self.i2c.readfrom_mem_into(self.addr, _REG_ACCEL, d)
+        if self.rec is not None: self.rec.log(REC_IMU, d)
+        now = time.ticks_us()
+        dt = time.ticks_diff(now, self.last_time)
+        self.last_time = now
+        self._fuse(d, 0, 8, dt)
+        self.samples += 1
+
+    def update(self):
+        # 更新 self.pitch / self.roll (/ self.yaw)；失敗時保留上一次的值
+        if not self.active: return
+        try:
+            if self._ring is not None: self._read_ring()
+            elif self.fifo_rate: self._read_fifo()
+            else: self._read_one()
+        except OSError:
+            self.errors += 1
+            return
+        self.stationary = self._still >= _STILL_N
+        if self.fixed:
+            self.pitch = self.pitch_q / 65536
+            self.roll = self.roll_q / 65536
+            return
+        f = self.ahrs
+        if f is not None:
+            # 四元數每筆都更新，尤拉角只在每次呼叫結束時換算一次
+            self.pitch = f.pitch
+            self.roll = f.roll
+            self.yaw = f.yaw
+            self.yaw_q = int(self.yaw * 65536)
+
+    def calibrate(self, n=200, spread=200):
+        # 開機時靜置量測 n 筆陀螺儀平均當作偏差；任一軸最大最小差超過 spread (LSB) 視為有移動，回傳 False
+        if not self.active: return False
+        d = self._raw
+        s = [0, 0, 0]
+        lo = [32767, 32767, 32767]
+        hi = [-32768, -32768, -32768]
         try:
-            d = self.i2c.readfrom_mem(self.addr, 0x3B, 14)
-            v = struct.unpack('>hhhhhhh', d)
-            now = time.ticks_ms()
-            dt = time.ticks_diff(now, self.last_time) / 1000.0
-            self.last_time = now
-            
-            acc_p = math.atan2(v[1], math.sqrt(v[0]**2 + v[2]**2))
-            acc_r = math.atan2(-v[0], v[2])
-            gy_p, gy_r = (v[4]/131.0)*0.01745, (v[5]/131.0)*0.01745
-            
-            alpha = 0.96
-            self.pitch = alpha * (self.pitch + gy_p * dt) + (1 - alpha) * acc_p
-            self.roll = alpha * (self.roll + gy_r * dt) + (1 - alpha) * acc_r
-            return self.pitch, self.roll
-        except: return 0.0, 0.0
\ No newline at end of file
+            for _ in range(n):
+                self.i2c.readfrom_mem_into(self.addr, _REG_ACCEL, d)
+                for i in range(3):
+                    v = (d[8 + i * 2] << 8) | d[9 + i * 2]
+                    if v > 32767: v -= 65536
+                    s[i] += v
+                    if v < lo[i]: lo[i] = v
+                    if v > hi[i]: hi[i] = v
+                time.sleep_ms(5)
+            if self.fifo_rate: self._reset_fifo()
+            if self._ring is not None: self._ir = self._iw   # 校正期間收到的樣本不再融合
+        except OSError:
+            self.errors += 1
+            return False
+        for i in range(3):
+            if hi[i] - lo[i] > spread: return False
+        for i in range(3): self._bq[i] = (s[i] * 256 + n // 2) // n
+        if self.ahrs is not None: self.ahrs.reset()
+        self.last_time = time.ticks_us()
+        return True
+
+    def save_calibration(self, path=CAL_PATH):
+        with open(path, 'w') as f:
+            json.dump({'gyro_bias': self.bias}, f)
+
+    def load_calibration(self, path=CAL_PATH):
+        # 沒有校正檔或內容不對時回傳 False，偏差維持原值
+        try:
+            with open(path) as f:
+                b = json.load(f)['gyro_bias']
+            q = [int(round(float(b[i]) * 256)) for i in range(3)]
+        except (OSError, ValueError, KeyError, IndexError, TypeError):
+            return False
+        for i in range(3): self._bq[i] = q[i]
+        return True
+
+    def get_fusion_data(self):
+        self.update()
+        return self.pitch, self.roll
@@ -0,0 +1,96 @@
+from tracker import Tracker, FAR
+from geometry import limits_sq, bucket, Tilt
+from capture import REC_HAPTIC, REC_TICK
+from patterns import PatternTable, SPEC
+from latency import PARSE, DECIDE
+
+TTC_NEAR = 1.5   # 碰撞時間小於此秒數時，不論距離都當作近距離
+CODES = SPEC['codes']               # 近 / 中 / 遠 的震動效果
+
+class Navigator:
+    # 一個邏輯週期：讀 IMU → 解析雷達 → 追蹤 → 產生觸覺序列
+    # 與硬體無關，裝置上由 main.py 的計時器呼叫，電腦上由 replay.py 以假硬體呼叫
+    # rtp：rtp.RTPTable，給定時每個週期另外算出連續震動的目標振幅 self.amp
+    # patterns：patterns.PatternTable，等級數必須是 len(limits) + 1、方向數與追蹤器相同 (3)
+    # limits：距離等級的門檻 (mm)，預設 300 / 600 cm
+    # grid：occupancy.PolarGrid，給定時各方向距離改由佔據格 (累積多個封包、依 IMU yaw 旋轉) 決定，碰撞時間仍來自追蹤器
+    # (yaw 只有 AHRS 模式才會更新，所以 imu 必須以 ahrs=True 建立)
+    def __init__(self, radar, imu, tracker=None, rtp=None, limits=(3000, 6000), patterns=None, grid=None):
+        self.radar, self.imu = radar, imu
+        # 定點 IMU 直接把 Q16 角度交給雷達的整數傾斜補償
+        if imu.fixed: radar.tilt = Tilt(fixed=True)
+        self.tracker = tracker or Tracker(max_tracks=6)
+        self.limits2 = limits_sq(limits)
+        self.patterns = patterns or PatternTable(CODES)
+        if self.patterns.levels != len(limits) + 1 or self.patterns.sectors != 3:
+            raise ValueError("pattern table does not match distance limits / sectors")
+        if grid is not None and imu.ahrs is None: raise ValueError("occupancy grid needs an AHRS IMU for yaw")
+        self.state = self.patterns.size - 1          # 全部都是最遠
+        self.seq = self.patterns.seqs[self.state]    # 編好的暫存器內容 (bytes，不可變，可直接交給核心 1)
+        self.dist = [FAR, FAR, FAR]
+        self.rtp = rtp
+        self.grid = grid
+        self.amp = 0
+        self.urgency = 0  # 這次序列的緊急程度：等級數 - 1 為有近距離 (或快撞上)、0 為只有遠的
+        self.rec = None   # capture.Recorder，錄下週期起點與送出的觸覺序列
+        self.lat = None   # latency.LatencyHist (核心 0)，記錄封包抵達到 parse / decide 的延遲
+        self.frame_t = 0  # 最新一個交給追蹤器的封包抵達時間 (ticks_us)，跟著序列一路傳到 GO
+
+    def step(self):
+        # 有新的觸覺序列時回傳 True (結果在 self.seq)
+        if self.rec is not None: self.rec.log(REC_TICK, b'')
+        self.sense()
+        self.ingest()
+        return self.decide()
+
+    # 以下三段也可以分開以各自的週期呼叫 (runtime.py 的非同步任務)
+    def sense(self):
+        self.imu.update()
+
+    def ingest(self):
+        # 用目前的姿態解析雷達，把收到的每一個封包依序交給追蹤器
+        radar, imu = self.radar, self.imu
+        if imu.fixed: radar.poll(pitch=imu.pitch_q, roll=imu.roll_q)
+        else: radar.poll(pitch=imu.pitch, roll=imu.roll)
+        while radar.next_frame() is not None: self.track(radar.targets, radar.frame_time)
+
+    def consume(self, q):
+        # 兩核心管線：雷達由核心 1 解析，這裡只從 ld2450.FrameQueue 取出封包交給追蹤器
+        while q.pop() is not None: self.track(q.targets, q.frame_time)
+
+    def track(self, targets, t):
+        self.tracker.update(targets, t)
+        g = self.grid
+        if g is not None:
+            g.rotate_to(self.imu.yaw_q)
+            g.insert(targets)
+        self.frame_t = t
+        if self.lat is not None: self.lat.record(PARSE, t)
+
+    def decide(self):
+        trk = self.tracker
+        trk.sectors()
+        src = trk
+        if self.grid is not None:
+            src = self.grid
+            src.sectors()
+            src.fade()
+        if self.rtp is not None: self.amp = self.rtp.level_max(src.dist, trk.ttc)
+
+        seen = False
+        for i in range(3):
+            self.dist[i] = src.dist[i]
+            if self.dist[i] < FAR: seen = True
+        if not seen: return False
+
+        pt, lim = self.patterns, self.limits2
+        s = 0
+        for i in range(3):
+            b = 0 if trk.ttc[i] < TTC_NEAR else bucket(src.d2[i], lim)
+            s = s * pt.levels + b
+        self.state = s
+        self.seq = pt.seqs[s]
+        self.urgency = pt.urgency[s]
+        if self.rec is not None: self.rec.log(REC_HAPTIC, self.seq)
+        if self.lat is not None: self.lat.record(DECIDE, self.frame_t)
+        return True
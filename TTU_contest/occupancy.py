@@ -0,0 +1,108 @@
+from array import array
+import math
+from geometry import atan2_q, hypot_q, sector
+from tracker import FAR
+
+# 極座標佔據格：以使用者為中心的 360° 格子 (角度格 × 距離格，一格一個 byte)
+# 每個雷達偵測點把所在格加 hit，每個判定週期所有格乘上 decay/256 慢慢淡出；
+# 某一格超過 threshold 才算有東西：預設連續兩個封包看到才成立，之後漏掉約 5 個封包才消失
+# insert 每個封包呼叫一次、fade 每個判定週期一次 (雷達與判定都是 10 Hz 時兩者一比一)
+# 角度格以環狀索引存放：IMU yaw 改變時只移動起點 (_off)，不搬資料；
+# pitch / roll 已由 LD2450 的傾斜補償 (geometry.Tilt) 在進格子之前處理，格子本身是水平面
+# 全部預先配置，insert / fade / rotate_to / sectors 都不配置記憶體：yaw 以 Q16 弧度整數傳入、累積也用整數，
+# 輸出的浮點數 (距離格中心的 cm) 事先做成物件放在 tuple 裡，寫進 array 時不會產生新的浮點物件
+
+_PI_Q16 = 205887
+_TWO_PI_Q16 = 411774
+_TWO_PI = 2 * math.pi
+
+class PolarGrid:
+    # angle_bins：整圈的角度格數；range_bins：0 ~ max_range (mm) 的距離格數
+    # fov：雷達視野 (度)，只有視野內的角度格會算進各方向距離
+    def __init__(self, angle_bins=32, range_bins=24, max_range=6000, hit=48, decay=208, threshold=64, fov=120):
+        self.na, self.nr = angle_bins, range_bins
+        self.max_range = max_range
+        self.hit, self.threshold = hit, threshold
+        self.cells = bytearray(angle_bins * range_bins)   # 第 (起點 + 角度格) % na 列、第 距離格 欄
+        self._off = 0
+        self._acc = 0           # 還不到一格的 yaw 累積 (格 × _TWO_PI_Q16)
+        self._yaw = None
+        self._fade = bytes([v * decay >> 8 for v in range(256)])
+        self._add = bytes([min(255, v + hit) for v in range(256)])
+        # 角度格 → 方向 (geometry.sector，視野外為 255)；距離格中心的 cm 與 mm²
+        self._sec = bytearray(angle_bins)
+        half = math.radians(fov) / 2
+        for b in range(angle_bins):
+            a = -math.pi + (b + 0.5) * _TWO_PI / angle_bins
+            self._sec[b] = sector(int(10000 * math.sin(a)), int(10000 * math.cos(a))) if abs(a) <= half else 255
+        step = max_range / range_bins
+        self._cm = tuple((r + 0.5) * step / 10 for r in range(range_bins))
+        self._d2 = array('i', [int(((r + 0.5) * step) ** 2) for r in range(range_bins)])
+        # 各方向輸出：與 tracker.Tracker 相同的單位
+        self.d2 = array('f', [FAR * FAR * 100] * 3)
+        self.dist = array('f', [FAR] * 3)
+        self._best = bytearray(3)
+        self._far2 = FAR * FAR * 100
+        self.inserted = 0
+
+    def insert(self, targets):
+        # targets：ld2450.TargetTable (已傾斜補償，mm)
+        na, nr, cells, add = self.na, self.nr, self.cells, self._add
+        lim = self.max_range
+        for k in range(len(targets)):
+            x, y = targets.x(k), targets.y(k)
+            if x == 0 and y == 0: continue
+            r = hypot_q(x, y)
+            if r >= lim: continue
+            # atan2(x, y)：0 = 正前方，-π ~ π 對應角度格 0 ~ na-1
+            b = (atan2_q(x, y) + _PI_Q16) * na // (2 * _PI_Q16 + 1)
+            i = ((b + self._off) % na) * nr + r * nr // lim
+            cells[i] = add[cells[i]]
+            self.inserted += 1
+
+    def rotate_to(self, yaw_q):
+        # yaw_q：IMU 的 yaw (Q16 弧度，逆時針為正，mpu6050.MPU6050.yaw_q)
+        # 往左轉時，世界中的物體在身體座標裡往右 (x 變小、角度格變小) 移
+        if self._yaw is None:
+            self._yaw = yaw_q
+            return
+        d = yaw_q - self._yaw
+        self._yaw = yaw_q
+        if d > _PI_Q16: d -= _TWO_PI_Q16
+        elif d < -_PI_Q16: d += _TWO_PI_Q16
+        acc = self._acc + d * self.na
+        k = (acc + (_TWO_PI_Q16 >> 1)) // _TWO_PI_Q16      # 四捨五入到整格
+        self._acc = acc - k * _TWO_PI_Q16
+        if k: self._off = (self._off + k) % self.na
+
+    def fade(self):
+        cells, f = self.cells, self._fade
+        for i in range(len(cells)): cells[i] = f[cells[i]]
+
+    def sectors(self):
+        # 各方向 (視野內) 最近一個超過門檻的格子；沒有就是 FAR
+        na, nr, cells, th = self.na, self.nr, self.cells, self.threshold
+        best = self._best
+        best[0] = best[1] = best[2] = nr
+        for b in range(na):
+            s = self._sec[b]
+            if s == 255: continue
+            base = ((b + self._off) % na) * nr
+            top = best[s]
+            for r in range(top):
+                if cells[base + r] >= th:
+                    best[s] = r
+                    break
+        far2 = self._far2
+        for s in range(3):
+            r = best[s]
+            if r < nr:
+                self.d2[s] = self._d2[r]
+                self.dist[s] = self._cm[r]
+            else:
+                self.d2[s] = far2
+                self.dist[s] = FAR
+
+    def clear(self):
+        cells = self.cells
+        for i in range(len(cells)): cells[i] = 0
@@ -0,0 +1,63 @@
+# 觸覺樣式編譯：開機時把每一種 (各方向距離等級) 組合先編成 DRV2605 波形暫存器 0x04~0x0B 的內容
+# 邏輯週期只要算出狀態編號，直接交出編好的 bytes，不用每次重組序列
+
+# 預設規格：左 / 中 / 右 依序各播一個效果，後面接一段暫停
+SPEC = {
+    'codes': (16, 47, 8),    # 各距離等級 (0 最近) 的 ROM 效果
+    'sectors': 3,
+    'gap': 178,              # 每個效果後的暫停 (bit7 = 等待，0x32 × 10 ms = 500 ms)，0 表示不暫停
+}
+_SLOTS = 8
+
+class PatternTable:
+    # 狀態編號 = Σ 等級[i] × 等級數^(sectors-1-i)，左邊是最高位；等級數與方向數可調，表格大小跟著變
+    def __init__(self, codes=SPEC['codes'], sectors=SPEC['sectors'], gap=SPEC['gap']):
+        per = 2 if gap else 1
+        if sectors * per > _SLOTS: raise ValueError("pattern needs more than 8 waveform slots")
+        self.levels = len(codes)
+        self.sectors = sectors
+        self.size = self.levels ** sectors
+        self.seqs = []
+        self.urgency = bytearray(self.size)   # 最近的等級換成緊急程度 (levels-1 最急)
+        b = [0] * sectors
+        for state in range(self.size):
+            s = state
+            for i in range(sectors - 1, -1, -1):
+                b[i] = s % self.levels
+                s //= self.levels
+            seq = bytearray(_SLOTS)
+            for i in range(sectors):
+                seq[i * per] = codes[b[i]]
+                if gap: seq[i * per + 1] = gap
+            self.seqs.append(bytes(seq))
+            self.urgency[state] = self.levels - 1 - min(b)
+
+    def state(self, buckets):
+        # buckets：各方向的距離等級 (左到右)
+        s = 0
+        for b in buckets: s = s * self.levels + b
+        return s
+
+class ArrayPatternTable:
+    # 每個方向一顆馬達 (drv2605l.DRV2605Array)：狀態編號與 PatternTable 相同，
+    # seqs[state] 是各通道的 8 格序列 (同一等級共用同一個 bytes)，每顆馬達把該等級的效果連播 repeat 次
+    def __init__(self, codes=SPEC['codes'], sectors=SPEC['sectors'], repeat=1):
+        if not 1 <= repeat <= _SLOTS: raise ValueError("repeat must be 1-8")
+        self.levels = len(codes)
+        self.sectors = sectors
+        self.size = self.levels ** sectors
+        per_level = [bytes([c] * repeat + [0] * (_SLOTS - repeat)) for c in codes]
+        self.seqs = []
+        self.urgency = bytearray(self.size)
+        self.urgencies = []       # 各通道自己的緊急程度 (bytes)，給 haptic_sched.ArrayScheduler 逐通道判斷
+        for state in range(self.size):
+            s = state
+            b = [0] * sectors
+            for i in range(sectors - 1, -1, -1):
+                b[i] = s % self.levels
+                s //= self.levels
+            self.seqs.append(tuple(per_level[x] for x in b))
+            self.urgency[state] = self.levels - 1 - min(b)
+            self.urgencies.append(bytes(self.levels - 1 - x for x in b))
+
+    state = PatternTable.state
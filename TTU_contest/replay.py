@@ -0,0 +1,232 @@
+# 在電腦上重播 capture.Recorder 錄下的資料：python replay.py walk.bin
+# python replay.py --pipeline walk.bin：以兩個執行緒跑兩核心管線 (核心 1 雷達解碼 / 核心 0 追蹤判定)
+# python replay.py --gate 900 walk.bin：安裝高度 900 mm 時，各組高度閘範圍各會丟掉多少偵測點
+# IMU 模式與 FIFO 取樣率取自檔頭 (capture.Recorder 錄製時寫入)；--fifo-rate N 可覆蓋 (例如沒有檔頭設定的舊檔)
+# 以假硬體跑完整的 Navigator 流程，比對產生的觸覺序列與錄製當時是否相同
+import sys
+import time
+
+import host_fakes
+host_fakes.install()
+
+from capture import read_header, read_records, REC_RADAR, REC_IMU, REC_HAPTIC, REC_IMU_FIFO, REC_TICK
+from ld2450 import LD2450_PIO
+from mpu6050 import MPU6050
+from navigator import Navigator
+from geometry import height
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# 版本 3 以前的檔案沒有 IMU 設定：有 FIFO 紀錄就當作 main.py 的取樣率
+FIFO_RATE = 200
+
+def _imu(path, fifo_rate=None):
+    # 以錄製時的 IMU 模式建立 MPU6050；fifo_rate 不是 None 時覆蓋檔頭
+    h = read_header(path)
+    if fifo_rate is None: fifo_rate = h['fifo_rate']
+    if fifo_rate is None: fifo_rate = FIFO_RATE if any(k == REC_IMU_FIFO for k, _, _ in read_records(path)) else 0
+    return MPU6050(i2c_bus=0, sda=4, scl=5, fifo_rate=fifo_rate, ahrs=h['ahrs'], fixed=h['fixed'])
+
+def load_ticks(path):
+    # 依邏輯週期分組：每個週期以 REC_TICK 開始 (版本 1 的檔案沒有它，改以 IMU 紀錄分段)
+    # 每組為 [搬移時間, IMU 14 bytes, 雷達資料, 觸覺序列, IMU FIFO 資料]
+    ticks = []
+    cur = None
+    for kind, t, data in read_records(path):
+        if kind == REC_TICK or (kind == REC_IMU and (cur is None or cur[1] is not None)):
+            cur = [t, None, [], [], []]
+            ticks.append(cur)
+        if cur is None:
+            continue
+        if kind == REC_IMU:
+            cur[1] = data
+        elif kind == REC_IMU_FIFO:
+            cur[4].append(data)
+        elif kind == REC_RADAR:
+            # 雷達的抵達時間以搬移 FIFO 的時間為準
+            cur[0] = t
+            cur[2].append(data)
+        elif kind == REC_HAPTIC:
+            cur[3].append(bytes(data))
+    return ticks
+
+def replay(path, nav=None, fifo_rate=None):
+    # nav 為 None 時建立與 main.py 相同的 Navigator (IMU 依檔頭設定)；回傳統計資料
+    mpu = host_fakes.FakeMPU6050()
+    host_fakes.I2C.devices[(0, 0x68)] = mpu
+    host_fakes.set_time_us(0)
+    if nav is None:
+        nav = Navigator(LD2450_PIO(sm_id=0, pin_rx=1), _imu(path, fifo_rate))
+    ticks = load_ticks(path)
+    stats = {'ticks': len(ticks), 'match': 0, 'mismatch': 0, 'extra': 0, 'missing': 0}
+    t_wall = time.perf_counter()
+    for t, burst, chunks, haptic, fifo in ticks:
+        for c in chunks: nav.radar.sm.feed(c)
+        if burst is not None: mpu.push(burst)
+        for c in fifo: mpu.push_fifo(c)
+        host_fakes.set_time_us(t)
+        out = bytes(nav.seq) if nav.step() else None
+        want = haptic[-1] if haptic else None
+        if out == want:
+            if out is not None: stats['match'] += 1
+        elif want is None: stats['extra'] += 1
+        elif out is None: stats['missing'] += 1
+        else: stats['mismatch'] += 1
+    host_fakes.set_time_us(None)
+    wall = time.perf_counter() - t_wall
+    stats['seconds'] = ticks[-1][0] / 1e6 if ticks else 0.0
+    stats['wall'] = wall
+    stats['frames'] = nav.radar.decoded
+    stats['speedup'] = stats['seconds'] / wall if wall else 0.0
+    return stats
+
+def replay_pipeline(path, fifo_rate=None):
+    # 兩核心管線的主機版本：生產者執行緒 (核心 1) 依錄製的週期把雷達資料送進假 PIO、解碼後放進 FrameQueue，
+    # 消費者執行緒 (核心 0) 取出封包追蹤、每個封包後判定一次；結果與單執行緒逐封包判定比對
+    # 姿態先依錄製的 IMU 資料逐週期算好：核心 0 → 核心 1 的姿態交換在執行緒上不具決定性
+    import threading
+    from ld2450 import FrameQueue
+    ticks = load_ticks(path)
+    mpu = host_fakes.FakeMPU6050()
+    host_fakes.I2C.devices[(0, 0x68)] = mpu
+    host_fakes.set_time_us(0)
+    imu = _imu(path, fifo_rate)
+    att = []
+    for t, burst, chunks, haptic, fifo in ticks:
+        if burst is not None: mpu.push(burst)
+        for c in fifo: mpu.push_fifo(c)
+        host_fakes.set_time_us(t)
+        imu.update()
+        att.append((imu.pitch_q, imu.roll_q) if imu.fixed else (imu.pitch, imu.roll))
+
+    def feed(radar, i):
+        for c in ticks[i][2]: radar.sm.feed(c)
+        host_fakes.set_time_us(ticks[i][0])
+        radar.poll(*att[i])
+
+    # 單執行緒對照
+    nav = Navigator(LD2450_PIO(sm_id=0, pin_rx=1), imu)
+    want = []
+    t_wall = time.perf_counter()
+    for i in range(len(ticks)):
+        feed(nav.radar, i)
+        while nav.radar.next_frame() is not None:
+            nav.track(nav.radar.targets, nav.radar.frame_time)
+            want.append(nav.state if nav.decide() else -1)
+    ref_wall = time.perf_counter() - t_wall
+
+    # 兩個執行緒
+    nav = Navigator(LD2450_PIO(sm_id=1, pin_rx=1), imu)
+    q = FrameQueue()
+    got = []
+    done = [False]
+    busy = [0.0, 0.0]
+    def core1():
+        for i in range(len(ticks)):
+            # 比對需要每一個封包：等消費者取完再放 (裝置上滿了會丟並計數)
+            while q.free() < q.slots: time.sleep(0)
+            t0 = time.perf_counter()
+            feed(nav.radar, i)
+            q.push_all(nav.radar)
+            busy[1] += time.perf_counter() - t0
+        done[0] = True
+    def core0():
+        while True:
+            fin = done[0]
+            t0 = time.perf_counter()
+            if q.pop() is None:
+                if fin: break
+                time.sleep(0)
+                continue
+            nav.track(q.targets, q.frame_time)
+            got.append(nav.state if nav.decide() else -1)
+            busy[0] += time.perf_counter() - t0
+    t_wall = time.perf_counter()
+    th = [threading.Thread(target=core0), threading.Thread(target=core1)]
+    for x in th: x.start()
+    for x in th: x.join()
+    wall = time.perf_counter() - t_wall
+    host_fakes.set_time_us(None)
+    return {'frames': len(got), 'match': got == want, 'dropped': q.dropped, 'wall': wall, 'ref_wall': ref_wall,
+            'load0': busy[0] / wall, 'load1': busy[1] / wall}
+
+def load_detections(path, fifo_rate=None):
+    # 錄製資料裡每一個偵測點的原始雷達平面座標 (不做傾斜補償) 與當時的 pitch / roll (弧度)
+    # 與 Navigator.step() 相同的順序：先更新 IMU，再以這個姿態解碼這個週期的雷達資料
+    ticks = load_ticks(path)
+    mpu = host_fakes.FakeMPU6050()
+    host_fakes.I2C.devices[(0, 0x68)] = mpu
+    host_fakes.set_time_us(0)
+    imu = _imu(path, fifo_rate)
+    radar = LD2450_PIO(sm_id=0, pin_rx=1)
+    xs, ys, ps, rs = [], [], [], []
+    for t, burst, chunks, haptic, fifo in ticks:
+        if burst is not None: mpu.push(burst)
+        for c in fifo: mpu.push_fifo(c)
+        host_fakes.set_time_us(t)
+        imu.update()
+        for c in chunks: radar.sm.feed(c)
+        radar.poll()
+        while radar.next_frame() is not None:
+            tg = radar.targets
+            for k in range(len(tg)):
+                xs.append(tg.x(k))
+                ys.append(tg.y(k))
+                ps.append(imu.pitch)
+                rs.append(imu.roll)
+    host_fakes.set_time_us(None)
+    return xs, ys, ps, rs
+
+def gate_sweep(path, mounts=(900,), bands=((150, 2000),), fifo_rate=None):
+    # 以錄製資料調高度閘參數：偵測點只解碼一次，每組 (安裝高度, lo, hi) 整批算離地高度 (geometry.height)
+    # 有 numpy 時以陣列運算；回傳 [{'mount', 'lo', 'hi', 'targets', 'floor', 'overhead'}]
+    xs, ys, ps, rs = load_detections(path, fifo_rate)
+    res = []
+    if numpy is not None:
+        x, y, p, r = (numpy.asarray(v, dtype=float) for v in (xs, ys, ps, rs))
+        sp, cr, sr = numpy.sin(p), numpy.cos(r), numpy.sin(r)
+        for m in mounts:
+            h = height(x, y, sp, cr, sr, m)
+            for lo, hi in bands:
+                res.append({'mount': m, 'lo': lo, 'hi': hi, 'targets': len(xs),
+                            'floor': int((h < lo).sum()), 'overhead': int((h > hi).sum())})
+        return res
+    import math
+    sp, cr, sr = [math.sin(v) for v in ps], [math.cos(v) for v in rs], [math.sin(v) for v in rs]
+    for m in mounts:
+        h = [height(xs[i], ys[i], sp[i], cr[i], sr[i], m) for i in range(len(xs))]
+        for lo, hi in bands:
+            res.append({'mount': m, 'lo': lo, 'hi': hi, 'targets': len(xs),
+                        'floor': sum(1 for v in h if v < lo), 'overhead': sum(1 for v in h if v > hi)})
+    return res
+
+if __name__ == '__main__':
+    rate = None
+    if '--fifo-rate' in sys.argv:
+        i = sys.argv.index('--fifo-rate')
+        rate = int(sys.argv[i + 1])
+        del sys.argv[i:i + 2]
+    if sys.argv[1:2] == ['--gate']:
+        mount = int(sys.argv[2])
+        bands = [(lo, hi) for lo in (0, 100, 150, 200, 300) for hi in (1800, 2000, 2200)]
+        for path in sys.argv[3:]:
+            for s in gate_sweep(path, (mount,), bands, rate):
+                n = s['targets'] or 1
+                print("%s: mount %d band %4d~%4d mm  floor %6d (%4.1f%%)  overhead %6d (%4.1f%%)  of %d" % (
+                    path, s['mount'], s['lo'], s['hi'], s['floor'], 100 * s['floor'] / n,
+                    s['overhead'], 100 * s['overhead'] / n, s['targets']))
+        sys.exit()
+    if sys.argv[1:2] == ['--pipeline']:
+        for path in sys.argv[2:]:
+            s = replay_pipeline(path, rate)
+            print("%s: %d frames through the two-core pipeline, match=%s dropped=%d, load core0 %.0f%% core1 %.0f%%" % (
+                path, s['frames'], s['match'], s['dropped'], s['load0'] * 100, s['load1'] * 100))
+        sys.exit()
+    for path in sys.argv[1:]:
+        s = replay(path, fifo_rate=rate)
+        print("%s: %.1f s recorded, %d ticks, %d frames, %.0fx real time" % (
+            path, s['seconds'], s['ticks'], s['frames'], s['speedup']))
+        print("  haptic match=%d mismatch=%d extra=%d missing=%d" % (
+            s['match'], s['mismatch'], s['extra'], s['missing']))
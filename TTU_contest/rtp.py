@@ -0,0 +1,67 @@
+from tracker import NO_TTC
+
+# RTP (real-time playback) 連續震動：距離 / 碰撞時間 → 振幅的查表，與核心 1 上固定週期的輸出
+# 振幅是 DRV2605 RTPIN 的有號 8 位元值 (ERM 開迴路 0 ~ 127)
+
+class RTPTable:
+    # near 以內最強、far 以外不震；中間依 (剩餘比例)² 遞減，但不低於 floor (ERM 太小的值感覺不到)
+    # 碰撞時間小於 ttc_near 秒時，振幅至少為 ttc 表的值 (0 s → max_amp，ttc_near → max_amp / 2)
+    def __init__(self, near=50, far=600, step=10, max_amp=127, floor=24, ttc_near=1.5):
+        self.step = step
+        n = far // step + 1
+        self._dist = bytearray(n + 1)      # 最後一格給 far 以外
+        for i in range(n):
+            d = i * step
+            if d <= near: a = max_amp
+            elif d >= far: a = 0
+            else:
+                r = (far - d) / (far - near)
+                a = floor + int((max_amp - floor) * r * r + 0.5)
+            self._dist[i] = a
+        self._top = n
+        self._ttc = bytearray(int(ttc_near * 10) + 1)   # 每 0.1 s 一格
+        k = len(self._ttc)
+        for i in range(k):
+            self._ttc[i] = max_amp - (max_amp // 2) * i // (k - 1)
+
+    def level(self, dist, ttc=NO_TTC):
+        # dist：cm；ttc：秒
+        i = int(dist) // self.step
+        if i > self._top: i = self._top
+        elif i < 0: i = 0
+        a = self._dist[i]
+        if ttc < NO_TTC:
+            j = int(ttc * 10)
+            if j < len(self._ttc) and self._ttc[j] > a: a = self._ttc[j]
+        return a
+
+    def level_max(self, dist, ttc):
+        # 單一馬達：取三個方向裡最強的
+        a = 0
+        for i in range(len(dist)):
+            v = self.level(dist[i], ttc[i])
+            if v > a: a = v
+        return a
+
+class RTPStreamer:
+    # 核心 1 的計時器每 period_ms 呼叫 tick(target)：變強立即跟上，變弱每次最多降 release
+    # 只有數值改變時才寫 RTPIN (一次 3 bytes 的 transaction)
+    def __init__(self, drv, release=16):
+        self.drv = drv
+        self.release = release
+        self.amp = 0
+        drv.rtp_start()
+
+    def tick(self, target):
+        a = self.amp
+        if target >= a: a = target
+        else:
+            a -= self.release
+            if a < target: a = target
+        if a != self.amp:
+            self.amp = a
+            self.drv.rtp_write(a)
+
+    def stop(self):
+        self.amp = 0
+        self.drv.rtp_stop()
@@ -0,0 +1,137 @@
+import time
+from latency import HANDOFF
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+# 協作式執行環境：每個工作以 asyncio 任務按宣告的週期執行，取代在 Timer 回呼裡做全部的事
+# 排定時間以 ticks_us 累加 (不會因為執行時間而漂移)；統計每次開始的抖動 (實際開始 - 排定時間)
+# 執行完已超過下一次排定時間就算超時 (overrun)，錯過的週期直接跳過，不連續補跑
+
+_sleep_ms = getattr(asyncio, 'sleep_ms', None)
+
+async def _sleep_until(due):
+    ms = time.ticks_diff(due, time.ticks_us()) // 1000
+    if ms < 0: ms = 0
+    # ms = 0 時仍讓出一次，其它任務才有機會執行
+    if _sleep_ms is not None: await _sleep_ms(ms)
+    else: await asyncio.sleep(ms / 1000)
+
+class Task:
+    # fn()：一個週期的工作，不可阻塞；period_ms：宣告的週期 (也是期限)
+    def __init__(self, name, period_ms, fn):
+        self.name = name
+        self.period_ms = period_ms
+        self.fn = fn
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0       # 因超時而跳過的週期
+        self.jitter_sum = 0    # us
+        self.jitter_max = 0
+        self.exec_max = 0      # us
+        self.busy_us = 0       # 累計執行時間，給 CoreLoad 算使用率
+        self._due = None
+
+    def _tick(self):
+        # 執行一次並更新統計，回傳下一次的排定時間
+        p = self.period_ms * 1000
+        start = time.ticks_us()
+        if self._due is None: self._due = start
+        late = time.ticks_diff(start, self._due)
+        if late < 0: late = 0
+        self.jitter_sum += late
+        if late > self.jitter_max: self.jitter_max = late
+        self.fn()
+        end = time.ticks_us()
+        ex = time.ticks_diff(end, start)
+        if ex > self.exec_max: self.exec_max = ex
+        self.busy_us += ex
+        self.runs += 1
+        due = time.ticks_add(self._due, p)
+        if time.ticks_diff(end, due) > 0:
+            self.overruns += 1
+            while time.ticks_diff(end, due) > 0:
+                due = time.ticks_add(due, p)
+                self.skipped += 1
+        self._due = due
+        return due
+
+    async def run(self):
+        while True: await _sleep_until(self._tick())
+
+    def run_blocking(self):
+        # 給沒有 asyncio 的執行緒 (核心 1)：同樣的排程與統計，以 sleep_ms 等待
+        while True:
+            ms = time.ticks_diff(self._tick(), time.ticks_us()) // 1000
+            if ms > 0: time.sleep_ms(ms)
+
+    def met(self):
+        # 期限都有達成：沒有超時，而且開始的抖動不超過一個週期
+        return self.overruns == 0 and self.jitter_max < self.period_ms * 1000
+
+    def stats(self):
+        n = self.runs or 1
+        return {'runs': self.runs, 'period_ms': self.period_ms, 'jitter_avg_us': self.jitter_sum // n,
+                'jitter_max_us': self.jitter_max, 'exec_max_us': self.exec_max,
+                'overruns': self.overruns, 'skipped': self.skipped}
+
+class Runtime:
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+    async def run(self, duration_ms=None):
+        # duration_ms：None 表示永遠執行 (裝置上)；主機模式跑一段時間後回傳
+        running = [asyncio.create_task(t.run()) for t in self.tasks]
+        if duration_ms is None:
+            while True: await asyncio.sleep(3600)
+        if _sleep_ms is not None: await _sleep_ms(duration_ms)
+        else: await asyncio.sleep(duration_ms / 1000)
+        for r in running: r.cancel()
+
+    def report(self):
+        ok = True
+        for t in self.tasks:
+            s = t.stats()
+            print("%-10s %4d ms  runs %6d  jitter avg %6d us max %6d us  exec max %6d us  overruns %d%s" % (
+                t.name, t.period_ms, s['runs'], s['jitter_avg_us'], s['jitter_max_us'], s['exec_max_us'],
+                s['overruns'], '' if t.met() else '  MISSED'))
+            if not t.met(): ok = False
+        return ok
+
+class CoreLoad:
+    # 一個核心的使用率：該核心上所有任務的執行時間總和 / 經過時間 (不含 asyncio 本身與中斷)
+    def __init__(self, core, tasks):
+        self.core = core
+        self.tasks = tasks
+        self.reset()
+
+    def reset(self):
+        self._t0 = time.ticks_us()
+        self._b0 = 0
+        for t in self.tasks: self._b0 += t.busy_us
+
+    def percent(self):
+        busy = -self._b0
+        for t in self.tasks: busy += t.busy_us
+        dt = time.ticks_diff(time.ticks_us(), self._t0)
+        return 100 * busy / dt if dt > 0 else 0.0
+
+def nav_tasks(nav, on_decision, radar_ms=50, imu_ms=10, decide_ms=100):
+    # Navigator 拆成三個週期任務；on_decision() 在有新序列時呼叫 (例如發佈給觸覺任務)
+    def decide():
+        if nav.decide(): on_decision()
+    return [Task('radar', radar_ms, nav.ingest),
+            Task('imu', imu_ms, nav.sense),
+            Task('decision', decide_ms, decide)]
+
+def haptic_task(sched, box, patterns, msg, period_ms=20, hist=None):
+    # box：exchange.SeqBox (狀態編號, 緊急程度, 封包抵達 ticks_us)；msg：消費者自己的紀錄緩衝
+    # hist：latency.LatencyHist (核心 1)，記錄讀到紀錄 (handoff) 與寫 GO 的延遲
+    sched.hist = hist
+    def poll():
+        if box.read(msg):
+            if hist is not None: hist.record(HANDOFF, msg[2])
+            sched.submit(patterns.seqs[msg[0]], msg[1], msg[2])
+        sched.poll()
+    return Task('haptic', period_ms, poll)
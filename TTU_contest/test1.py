@@ -3,54 +3,12 @@ import time
 import math
 import struct
 import _thread
-import rp2
 import gc
 
-# --- 1. PIO UART 接收 (LD2450 資料流) ---
-@rp2.asm_pio(in_shiftdir=rp2.PIO.SHIFT_RIGHT, fifo_join=rp2.PIO.JOIN_RX, autopush=True, push_thresh=32)
-def pio_uart_rx():
-    label("start")
-    wait(0, pin, 0)
-    set(x, 7) [10]
-    label("bitloop")
-    in_(pins, 1)
-    jmp(x_dec, "bitloop") [6]
-    wait(1, pin, 0)
-    jmp("start")
+# --- 1. LD2450 接收與解析 (PIO + 環形緩衝區) ---
+from ld2450 import LD2450_PIO
 
 # --- 2. 硬體類別定義 ---
-class LD2450_PIO:
-    def __init__(self, sm_id=0, pin_rx=1, baud=460800):
-        self.raw_data = bytearray()
-        self.pin_rx = Pin(pin_rx, Pin.IN, Pin.PULL_UP)
-        self.sm = rp2.StateMachine(sm_id, pio_uart_rx, freq=8 * baud, in_base=self.pin_rx)
-        self.sm.active(1)
-        self.HEADER = b'\xAA\xFF\x03\x00'
-
-    def parse(self, pitch=0, roll=0):
-        while self.sm.rx_fifo():
-            self.raw_data.extend(struct.pack('<I', self.sm.get()))
-        if len(self.raw_data) > 256: self.raw_data = self.raw_data[-128:]
-        head = self.raw_data.rfind(self.HEADER)
-        if head == -1 or len(self.raw_data) - head < 30: return None
-        packet = self.raw_data[head : head + 30]
-        self.raw_data = self.raw_data[head + 30:]
-        if packet[28:30] != b'\x55\xCC': return None
-        
-        targets = []
-        cp, sp = math.cos(pitch), math.sin(pitch)
-        cr, sr = math.cos(roll), math.sin(roll)
-        for i in range(3):
-            off = 4 + (i * 8)
-            x_raw, y_raw = struct.unpack('<hh', packet[off:off+4])
-            xr = -(x_raw & 0x7FFF) if x_raw & 0x8000 else (x_raw & 0x7FFF)
-            yr = -(y_raw & 0x7FFF) if y_raw & 0x8000 else (y_raw & 0x7FFF)
-            if xr != 0 or yr != 0:
-                yf = yr * cp
-                xf = xr * cr - (yr * sp) * sr
-                targets.append((xf, yf))
-        return targets
-
 class DRV2605L:
     def __init__(self, i2c_bus=1, sda=14, scl=15):
         self.i2c = I2C(i2c_bus, sda=Pin(sda), scl=Pin(scl), freq=400000)
@@ -142,13 +100,15 @@ imu = MPU6050(i2c_bus=0, sda=4, scl=5)
 def logic_timer_callback(t):
     global new_data_available
     p, r = imu.get_fusion_data()
-    targets = radar.parse(pitch=p, roll=r)
+    n = radar.parse(pitch=p, roll=r)
     
     # 重置最近距離
     for i in range(3): temp_min_dists[i] = 800.0
 
-    if targets:
-        for tx, ty in targets:
+    if n:
+        t = radar.targets
+        for k in range(n):
+            tx, ty = t.x(k), t.y(k)
             dist = math.sqrt(tx*tx + ty*ty) / 10.0
             angle = math.degrees(math.atan2(tx, ty))
             angle1 = 180 - angle
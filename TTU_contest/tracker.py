@@ -0,0 +1,106 @@
+from array import array
+import math
+import time
+from geometry import sector
+
+# 多目標追蹤器：放在 LD2450_PIO 與觸覺編碼之間
+# 跨封包配對偵測點、維持固定的追蹤 ID，用 alpha-beta 濾波估速度，再算各方向的碰撞時間
+NO_TTC = 99.0     # 沒有靠近中的物體
+FAR = 800.0       # 沒有物體時的距離 (cm)
+
+class Tracker:
+    def __init__(self, max_tracks=6, gate=600, alpha=0.5, beta=0.2, min_hits=2, max_miss=3):
+        self.n = max_tracks
+        self.gate2 = gate * gate          # 配對門檻 (mm²)
+        self.alpha, self.beta = alpha, beta
+        self.min_hits, self.max_miss = min_hits, max_miss
+        # 追蹤狀態全部放在固定大小的陣列裡 (位置 mm、速度 mm/s)
+        self.x = array('f', [0.0] * max_tracks)
+        self.y = array('f', [0.0] * max_tracks)
+        self.vx = array('f', [0.0] * max_tracks)
+        self.vy = array('f', [0.0] * max_tracks)
+        self.ids = array('H', [0] * max_tracks)
+        self.hits = bytearray(max_tracks)
+        self.miss = bytearray(max_tracks)
+        self.alive = bytearray(max_tracks)
+        self._used = bytearray(max_tracks)
+        self._next_id = 1
+        self._last_t = None
+        # 各方向輸出：最近距離平方 (mm²)、最近距離 (cm) 與碰撞時間 (s)
+        self.d2 = array('f', [FAR * FAR * 100] * 3)
+        self.dist = array('f', [FAR] * 3)
+        self.ttc = array('f', [NO_TTC] * 3)
+
+    def _spawn(self, x, y):
+        for i in range(self.n):
+            if not self.alive[i]:
+                self.x[i], self.y[i] = x, y
+                self.vx[i] = self.vy[i] = 0.0
+                self.ids[i] = self._next_id
+                self._next_id = self._next_id % 65535 + 1
+                self.hits[i], self.miss[i], self.alive[i] = 1, 0, 1
+                return i
+        return -1
+
+    def update(self, targets, t_us):
+        # targets: ld2450.TargetTable；t_us: 封包抵達時間 (ticks_us)
+        if self._last_t is None: dt = 0.1
+        else: dt = time.ticks_diff(t_us, self._last_t) / 1000000
+        self._last_t = t_us
+        if dt < 0.01: dt = 0.01
+        elif dt > 0.5: dt = 0.5
+        n, x, y, vx, vy = self.n, self.x, self.y, self.vx, self.vy
+        alive, used = self.alive, self._used
+        # 預測
+        for i in range(n):
+            used[i] = 0
+            if alive[i]:
+                x[i] += vx[i] * dt
+                y[i] += vy[i] * dt
+        # 最近鄰配對 + alpha-beta 更新
+        a, b = self.alpha, self.beta / dt
+        for k in range(len(targets)):
+            tx, ty = targets.x(k), targets.y(k)
+            best, best_d = -1, self.gate2
+            for i in range(n):
+                if alive[i] and not used[i]:
+                    dx, dy = tx - x[i], ty - y[i]
+                    d = dx * dx + dy * dy
+                    if d < best_d: best, best_d = i, d
+            if best < 0:
+                best = self._spawn(tx, ty)
+                if best >= 0: used[best] = 1
+                continue
+            rx, ry = tx - x[best], ty - y[best]
+            x[best] += a * rx
+            y[best] += a * ry
+            vx[best] += b * rx
+            vy[best] += b * ry
+            used[best] = 1
+            if self.hits[best] < 255: self.hits[best] += 1
+            self.miss[best] = 0
+        # 沒配到的追蹤先滑行，太久沒看到才刪除
+        for i in range(n):
+            if alive[i] and not used[i]:
+                self.miss[i] += 1
+                if self.miss[i] > self.max_miss: alive[i] = 0
+
+    def sectors(self):
+        # 從已確認的追蹤計算各方向最近距離與最短碰撞時間
+        # 碰撞時間 = r / (-(p·v) / r) = r² / -(p·v)，每個追蹤都不用開根號
+        d2, dist, ttc = self.d2, self.dist, self.ttc
+        far2 = FAR * FAR * 100
+        for s in range(3):
+            d2[s] = far2
+            ttc[s] = NO_TTC
+        x, y, vx, vy = self.x, self.y, self.vx, self.vy
+        for i in range(self.n):
+            if not self.alive[i] or self.hits[i] < self.min_hits: continue
+            xi, yi = x[i], y[i]
+            r2 = xi * xi + yi * yi
+            s = sector(xi, yi)
+            if r2 < d2[s]: d2[s] = r2
+            pv = xi * vx[i] + yi * vy[i]
+            if pv < 0 and r2 < -pv * ttc[s]: ttc[s] = r2 / -pv
+        for s in range(3):
+            dist[s] = math.sqrt(d2[s]) / 10.0